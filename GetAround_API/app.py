@@ -1,13 +1,20 @@
-import pickle
-import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, UploadFile, File, Header, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel  # This is used for classes and data verification
 from typing import Literal, List, Union    # these are used for validating the entry during the post
-import numpy as np
-import pandas as pd
-import joblib # to import both the scaler and our chosen model
+import hmac
 import os
-from sklearn.metrics import accuracy_score, f1_score, ConfusionMatrixDisplay, RocCurveDisplay
+import shutil
+import tempfile
+# only what the inference needs is imported here: the scaler / model loading (joblib, sklearn)
+# and pandas are imported on demand, and not at all when the exported linear scorer is used
+from registry import registry, artifact_path, DEFAULT_SCALER_PATH, DEFAULT_MODEL_PATH, DEFAULT_LINEAR_MODEL_PATH
+from batcher import MicroBatcher, BATCHING_ENABLED
+from executor import InferenceExecutor, ExecutorSaturated
+from cache import PredictionCache, features_key
+from tracing import TracingMiddleware, tracer, handler_started, handler_done
+import bulk
 
 
 ## configurations
@@ -17,6 +24,30 @@ kindly ass in the features that you like to estimate the price,
 """
 app = FastAPI(title="Rental cost estimator",description = description)
 
+# a sample of the /predict requests is timed stage by stage (TRACE_SAMPLE_RATE, 0 = off),
+# the latency histograms are served by /metrics
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
+
+# the predictions (pandas + sklearn work) run in a thread or process pool
+# so the event loop stays free for the other requests, e.g. the "/" health check
+inference = InferenceExecutor(registry)
+
+# the concurrent /predict requests are grouped and predicted together
+# (the model taken at each flush is the current one of the registry)
+batcher = MicroBatcher(inference.predict)
+
+# the same listing is priced many times a day with the same features,
+# the predictions are kept per model version
+cache = PredictionCache()
+
+
+# too many predictions waiting in the pool => ask the client to come back later
+@app.exception_handler(ExecutorSaturated)
+async def saturated_handler(request: Request, error: ExecutorSaturated):
+    return JSONResponse(status_code=503, content={"detail": "Too many predictions in progress, retry later"},
+                        headers={"Retry-After": "1"})
+
 class CarFeatures(BaseModel):
     name:   str
     mileage:     int     
@@ -35,60 +66,31 @@ class CarFeatures(BaseModel):
 class Test(BaseModel):
     title:str
 
-# This function is to treat the incomming data i.e. the recieved features
+# the paths are inside the artifact folder (MODEL_ARTIFACTS_DIR), absolute or relative to it
+class ModelVersion(BaseModel):
+    scaler_path:       str = DEFAULT_SCALER_PATH
+    model_path:        str = DEFAULT_MODEL_PATH
+    linear_model_path: Union[str, None] = DEFAULT_LINEAR_MODEL_PATH   # the table of scorer.py, for the slim start
+    version:           Union[str, None] = None
 
-def prepare_input_to_df(car: CarFeatures):
-
-    # define the columns/fields of the dataframe series
-    # there is no unnammed value and no label ofcourse
-    df = pd.DataFrame(columns=['name','mileage', 'engine_power', 'fuel',
-       'paint_color', 'car_type', 'private_parking_available', 'has_gps',
-       'has_air_conditioning', 'automatic_car', 'has_getaround_connect',
-       'has_speed_regulator', 'winter_tires'],
-      )
-    
-    print('dataframe defined:')
-    print(df)
-    
-    
-    # set the entity values 
-    entity = {'name' : car.name,
-        'mileage' : car.mileage,
-        'engine_power' : car.engine_power,
-        'fuel': car.fuel,
-        'paint_color': car.paint_color,
-        'car_type' : car.car_type,
-        'private_parking_available' : int(car.private_parking_available),
-        'has_gps' : int(car.has_gps),
-        'has_air_conditioning': int(car.has_air_conditioning),
-        'automatic_car' : int(car.automatic_car),
-        'has_getaround_connect' : int(car.has_getaround_connect),
-        'has_speed_regulator' : int(car.has_speed_regulator),
-        'winter_tires' : int(car.winter_tires) }
-
-      
-    # add the record
-    df.loc[df.shape[0],:] = entity
-    print(df)
-
-    # Transfer the boolean field
-    bool_list = ['private_parking_available','has_gps','has_air_conditioning','automatic_car',
-                 'has_getaround_connect',
-                 'has_speed_regulator','winter_tires','engine_power','mileage']
-    
-    for property in bool_list:
-        #df[property] = df[property].apply(lambda x : 1 if x == True else 0)
-        df[property] = df[property].astype(int)
+       
+### define the enpoints
 
-    
-    
-    print(df)
 
-    return df
+# load the scaler and our chosen model only once, when the worker starts
+# instead of reading them from the disk at each request
+@app.on_event("startup")
+async def load_model():
+    if not registry.is_loaded:
+        registry.load()
+    if BATCHING_ENABLED:
+        await batcher.start()
 
 
-       
-### define the enpoints
+@app.on_event("shutdown")
+async def stop_inference():
+    await batcher.stop()
+    inference.shutdown()
 
 
 @app.get("/")
@@ -111,47 +113,161 @@ async def index():
 @app.post("/predict")
 async def predict( features_recieved : CarFeatures):    # define an asynchro function that inherits from CarType class
     
+    handler_started()   # the body is read and validated (tracing)
 
-    #1) Transform the input into pandas dataframe
+    #1) already predicted with this model version?
+    version = registry.current.version
+    key = features_key(features_recieved)
+    prediction = cache.get(key, version)
 
-    print('preparing:')
-    df_input = prepare_input_to_df(features_recieved)
-    
+    if prediction is None:
+        #2) with the micro-batching, the car waits a few milliseconds to be predicted
+        # together with the other cars recieved at the same time
+        if batcher.running:
+            prediction = await batcher.submit(features_recieved)
 
-    #2)  load the scaler and our chosen model
+        else:
+            #3) Encoding + Scaling (Transform) & Predict, in the inference pool
+            # with the scaler and our chosen model already loaded in memory
+            prediction = (await inference.predict([features_recieved]))[0]
 
-    print('importing scaler and regressor')
-    
-    scaler = joblib.load('scaler_v3.joblib')
-    print('imported')
+        cache.put(key, version, prediction)
 
-    # model = joblib.load('regressor_ridge_v3.joblib')
+    #4) Format and return response
+    response =  {"prediction": prediction}
 
+    handler_done()
+    return response
 
-    #3) Scaling (Transform)
-    print('Scaling:')
-    scaled_X = scaler.transform(df_input)
-    print(scaled_X)
-    
-
-    # 4) IMport model
-    model = pickle.load(open('model.pkl', 'rb'))
-    
-    
-    #4) Predict
-    print('predicting')
-    y_pred = model.predict(scaled_X)
 
-    #5) Format and return response
-    print(y_pred.tolist())
-    response =  {"prediction": y_pred.tolist()[0]}
+# POST API for many cars at once (e.g. the nightly repricing)
+# the cars not in the cache go to the inference pool together: one pass of the scorer
+# (or of the encoder and model.predict) for the whole list
+@app.post("/predict/batch")
+async def predict_batch( cars_recieved : List[CarFeatures]):
+
+    handler_started()
+
+    if len(cars_recieved) == 0:
+        handler_done()
+        return {"predictions": []}
+
+    # only the cars not in the cache are sent to the model
+    version = registry.current.version
+    keys = [features_key(car) for car in cars_recieved]
+    predictions = [cache.get(key, version) for key in keys]
+    missing = [i for i, prediction in enumerate(predictions) if prediction is None]
+
+    if missing:
+        computed = await inference.predict([cars_recieved[i] for i in missing])
+        for i, prediction in zip(missing, computed):
+            predictions[i] = prediction
+            cache.put(keys[i], version, prediction)
+
+    handler_done()
+    return {"predictions": predictions}
+
+
+# POST API for a whole file shaped like get_around_pricing_project.csv (CSV or NDJSON)
+# the file is read, scored and sent back chunk by chunk, it is never loaded in memory as a whole
+@app.post("/predict/file")
+async def predict_file( file : UploadFile = File(...), output : Union[Literal['csv', 'ndjson'], None] = None):
+
+    fmt = bulk.guess_format(file.filename, file.content_type)
+    output = output or ('ndjson' if fmt == 'ndjson' else 'csv')
+    formatter = bulk.format_ndjson if output == 'ndjson' else bulk.format_csv
+
+    # keep our own disk copy of the upload, it is closed by FastAPI once this function returns
+    # while the response is still being streamed
+    spool = tempfile.TemporaryFile()
+    await run_in_threadpool(shutil.copyfileobj, file.file, spool, 1024 * 1024)
+    spool.seek(0)
+
+    bundle = registry.current
+    chunks = bulk.read_chunks(spool, fmt)
+    stream = bulk.score_stream(bundle, chunks)
+
+    def close():
+        # the reader first, it still reads from the spool
+        stream.close()
+        chunks.close()
+        spool.close()
+
+    # score the first chunk before answering, so a wrong file gets a proper 400 error
+    try:
+        first = await run_in_threadpool(next, stream, None)
+    except ValueError as error:   # includes the pandas EmptyDataError / ParserError
+        close()
+        raise HTTPException(status_code=400, detail=f'Cannot read the {fmt} file: {error}')
+
+    def generate():
+        try:
+            if first is None:
+                return
+            yield formatter(*first, header=True)
+            for chunk_result in stream:
+                yield formatter(*chunk_result)
+        finally:
+            close()
+
+    return StreamingResponse(generate(), media_type='application/x-ndjson' if output == 'ndjson' else 'text/csv',
+                             headers={"X-Model-Version": bundle.version})
+
+
+# the counters used to size the gunicorn workers against the inference workers
+@app.get("/metrics")
+async def metrics():
+
+    return {"model_version": registry.current.version if registry.is_loaded else None,
+            "executor": inference.stats(),
+            "batcher": batcher.stats(),
+            "cache": cache.stats(),
+            "latency": tracer.stats()}
+
+
+# the reload unpickles files: it is disabled unless MODEL_RELOAD_TOKEN is set, the caller sends
+# it in the X-Reload-Token header, and the files must be in the artifact folder
+RELOAD_TOKEN = os.environ.get('MODEL_RELOAD_TOKEN')
+
+
+# swap the model to a new version without restarting the workers
+# the requests in progress finish with the version they started with
+# the swap is PER WORKER: under gunicorn only the worker that got the request changes its model,
+# the others keep theirs (call it once per worker, or set the paths and restart the workers)
+@app.post("/model/reload")
+async def reload_model(new_version : ModelVersion, x_reload_token : Union[str, None] = Header(None)):
+
+    if not RELOAD_TOKEN:
+        raise HTTPException(status_code=403, detail="Model reload is disabled (MODEL_RELOAD_TOKEN is not set)")
+    if x_reload_token is None or not hmac.compare_digest(x_reload_token.encode(), RELOAD_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Reload-Token")
+
+    try:
+        scaler_path = artifact_path(new_version.scaler_path)
+        model_path = artifact_path(new_version.model_path)
+        linear_model_path = artifact_path(new_version.linear_model_path) if new_version.linear_model_path else None
+    except PermissionError as error:
+        raise HTTPException(status_code=403, detail=str(error))
+
+    # the loading (I/O + unpickling) runs in a thread, the event loop keeps serving
+    try:
+        previous = await run_in_threadpool(registry.load, scaler_path, model_path, new_version.version,
+                                           linear_model_path)
+    except FileNotFoundError as error:
+        raise HTTPException(status_code=404, detail=f"Artifact not found: {error.filename}")
+    except Exception as error:   # a file that is not a scaler / model (unpickling, wrong type...)
+        raise HTTPException(status_code=400, detail=f"Cannot load the model: {error}")
+    cache.invalidate(registry.current.version)
+
+    return {"previous_version": previous.version if previous is not None else None,
+            "current_version": registry.current.version,
+            "worker_pid": os.getpid()}
 
-    return response
- 
 
 
 # Execute if running as a main file
 if __name__=="__main__":  
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=4000) # The FastAPI instance will use host IP (0.0.0.0) and port (4000)
 
 # snap of results for car:
@@ -0,0 +1,149 @@
+import asyncio
+import inspect
+import os
+
+from tracing import current_trace, group_traces
+
+
+# configuration, can be changed per deployment with environment variables
+BATCHING_ENABLED = os.environ.get('PREDICT_BATCHING', '1') == '1'
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', '64'))
+BATCH_WINDOW_MS = float(os.environ.get('BATCH_WINDOW_MS', '2'))
+
+
+class MicroBatcher:
+    """Groups the concurrent single-car requests into one vectorized prediction.
+
+    Each request puts its car in a queue and waits on a future. A background task takes the
+    first car, keeps collecting for `max_wait_ms` (or until `max_batch_size` cars), calls
+    `predict_fn` once for the group and resolves every future with its own result.
+    The trace of each request goes with its car, the stages of the group are added to them.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_WINDOW_MS):
+        self.predict_fn = predict_fn          # list of cars -> list of predictions, same order (can be async)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._task = None
+        self._inflight = set()   # batches being predicted while the next one is collected
+
+        # counters, to see how well the requests are grouped
+        self.batches = 0
+        self.items = 0
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        # the queue and the task must belong to the event loop of the worker
+        if not self.running:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    async def submit(self, car):
+        """Queue one car and wait for its prediction."""
+
+        if not self.running:
+            raise RuntimeError('The batcher is not started')
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((car, future, current_trace.get()))
+        return await future
+
+    async def _collect(self):
+        # wait for the first car, then fill the batch until the window closes or it is full
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _predict(self, cars, traces):
+        # the call is timed for the traced requests among `traces` (this task has its own context)
+        token = current_trace.set(group_traces(traces))
+        try:
+            result = self.predict_fn(cars)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        finally:
+            current_trace.reset(token)
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # a caller that gave up (disconnected) does not need a result anymore
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            # the group is predicted in its own task, so the next group can already be collected
+            task = asyncio.get_running_loop().create_task(self._process(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _process(self, batch):
+        cars = [car for car, _, _ in batch]
+        try:
+            predictions = await self._predict(cars, [trace for _, _, trace in batch])
+        except ValueError as error:
+            if len(batch) == 1:
+                self._resolve(batch[0][1], error=error)
+                return
+            # one invalid car (e.g. an unknown category) must not fail the whole group,
+            # retry them one by one so only the faulty requests get the error
+            for car, future, trace in batch:
+                try:
+                    self._resolve(future, (await self._predict([car], [trace]))[0])
+                except Exception as single_error:
+                    self._resolve(future, error=single_error)
+            return
+        except Exception as error:
+            for _, future, _ in batch:
+                self._resolve(future, error=error)
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        for (_, future, _), prediction in zip(batch, predictions):
+            self._resolve(future, prediction)
+
+    @staticmethod
+    def _resolve(future, result=None, error=None):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def stats(self):
+        return {"batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "queued": self._queue.qsize() if self._queue is not None else 0}
@@ -0,0 +1,47 @@
+"""Compare N single /predict calls with one /predict/batch call of N cars.
+
+Only the inference path is timed (encoding + transform + predict), the HTTP layer is left out.
+
+    python benchmarks/bench_batch.py --sizes 1 10 100 1000 10000
+"""
+import argparse
+import time
+
+import payloads  # noqa: F401  (puts the API folder on sys.path)
+from payloads import sample_cars
+
+from registry import registry
+
+
+def time_single_calls(bundle, cars):
+    start = time.perf_counter()
+    for car in cars:
+        bundle.predict_records([car])
+    return time.perf_counter() - start
+
+
+def time_batch_call(bundle, cars):
+    start = time.perf_counter()
+    bundle.predict_records(cars)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    registry.load()
+    bundle = registry.current
+
+    print(f"{'cars':>8} {'single calls (s)':>18} {'one batch (s)':>15} {'speedup':>9}")
+    for n in args.sizes:
+        cars = sample_cars(n, bundle.scaler, seed=args.seed)
+        single = time_single_calls(bundle, cars)
+        batch = time_batch_call(bundle, cars)
+        print(f"{n:>8} {single:>18.4f} {batch:>15.4f} {single / batch:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
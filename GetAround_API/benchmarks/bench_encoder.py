@@ -0,0 +1,70 @@
+"""Compare the compiled FeatureEncoder with the pandas + scaler.transform path.
+
+Checks first that both give exactly the same matrix on the sampled cars, then times them.
+
+    python benchmarks/bench_encoder.py --cars 2000
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import payloads  # noqa: F401  (puts the API folder on sys.path)
+from payloads import sample_cars
+
+from registry import registry
+from features import records_to_frame
+
+
+def dense(X):
+    return X.toarray() if hasattr(X, 'toarray') else X
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cars', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    registry.load(linear_model_path=None)   # the sklearn artifacts, not the exported table
+    bundle = registry.current
+    if bundle.encoder is None:
+        sys.exit('the scaler of this model version could not be compiled into an encoder')
+
+    cars = sample_cars(args.cars, bundle.scaler, seed=args.seed)
+
+    # 1) bit-identical output
+    expected = dense(bundle.scaler.transform(records_to_frame(cars)))
+    encoded = bundle.encoder.encode(cars)
+    if not np.array_equal(encoded, expected):
+        sys.exit('MISMATCH between the encoder and scaler.transform')
+    print(f'identical output on {len(cars)} cars ({encoded.shape[1]} features)')
+
+    # 2) one car per call, like /predict
+    start = time.perf_counter()
+    for car in cars:
+        bundle.scaler.transform(records_to_frame([car]))
+    pandas_single = (time.perf_counter() - start) / len(cars)
+
+    start = time.perf_counter()
+    for car in cars:
+        bundle.encoder.encode([car])
+    encoder_single = (time.perf_counter() - start) / len(cars)
+
+    # 3) all the cars in one call, like /predict/batch
+    start = time.perf_counter()
+    bundle.scaler.transform(records_to_frame(cars))
+    pandas_batch = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bundle.encoder.encode(cars)
+    encoder_batch = time.perf_counter() - start
+
+    print(f"{'':<24} {'pandas + transform':>20} {'encoder':>12} {'speedup':>9}")
+    print(f"{'single car (us/car)':<24} {pandas_single * 1e6:>20.1f} {encoder_single * 1e6:>12.1f} {pandas_single / encoder_single:>8.1f}x")
+    print(f"{'batch (s)':<24} {pandas_batch:>20.4f} {encoder_batch:>12.4f} {pandas_batch / encoder_batch:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Throughput and p99 latency of /predict under concurrent load, with and without micro-batching.
+
+The requests are simulated in-process by `--concurrency` coroutines sending `--requests` cars
+each, the same way the uvicorn worker runs the `predict` coroutines.
+
+    python benchmarks/bench_microbatch.py --concurrency 64 --requests 50 --window-ms 2 --max-batch 64
+"""
+import argparse
+import asyncio
+import time
+
+import payloads  # noqa: F401  (puts the API folder on sys.path)
+from payloads import sample_cars
+from stats import summarize
+
+from registry import registry
+from batcher import MicroBatcher
+
+
+async def run_clients(cars, concurrency, send):
+    latencies = []
+
+    async def client(k):
+        for car in cars[k::concurrency]:
+            start = time.perf_counter()
+            await send(car)
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0)   # let the other clients send in between
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(k) for k in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def without_batching(cars, concurrency):
+    bundle = registry.current
+
+    async def send(car):
+        return bundle.predict_records([car]).tolist()[0]
+
+    return await run_clients(cars, concurrency, send)
+
+
+async def with_batching(cars, concurrency, window_ms, max_batch):
+    batcher = MicroBatcher(lambda group: registry.current.predict_records(group).tolist(),
+                           max_batch_size=max_batch, max_wait_ms=window_ms)
+    await batcher.start()
+    try:
+        result = await run_clients(cars, concurrency, batcher.submit)
+    finally:
+        await batcher.stop()
+    result.update(mean_batch_size=batcher.stats()['mean_batch_size'])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=50, help='requests per client')
+    parser.add_argument('--window-ms', type=float, default=2.0)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    registry.load()
+    cars = sample_cars(args.concurrency * args.requests, registry.current.scaler, seed=args.seed)
+
+    results = {
+        'no batching': asyncio.run(without_batching(cars, args.concurrency)),
+        'micro-batching': asyncio.run(with_batching(cars, args.concurrency, args.window_ms, args.max_batch)),
+    }
+
+    print(f"{'':<16} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'batch':>7}")
+    for name, r in results.items():
+        print(f"{name:<16} {r['throughput_rps']:>10.0f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r.get('mean_batch_size', 1.0):>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""The Ridge path (one SVD per fold) against GridSearchCV refitting every alpha, and the time of each.
+
+The alphas are the notebook grid plus `--alphas` more. The script exits with an error when
+the selected alpha, the cv scores or the coefficients differ from GridSearchCV (k-fold), or
+when the leave-one-out errors differ from RidgeCV.
+
+Without --data, the prices are those of the deployed model on generated cars, plus noise.
+
+    python benchmarks/bench_ridge_path.py --alphas 200
+    python benchmarks/bench_ridge_path.py --data get_around_pricing_project.csv --alphas 500
+"""
+import argparse
+import time
+
+import numpy as np
+
+import payloads  # noqa: F401  (puts the API folder on sys.path)
+from payloads import sample_cars
+
+from features import records_to_frame
+from registry import registry
+from ridge_path import RidgePath, RidgePathCV, as_dense
+from train import CV, load_dataset, make_preprocessor, ridge_grid, split
+
+
+def synthetic_dataset(n, seed):
+    registry.load()
+    cars = sample_cars(n, registry.current.scaler, seed=seed)
+    prices = registry.current.predict_records(cars)
+    return records_to_frame(cars), prices + np.random.default_rng(seed).normal(0, 15, n)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=None, help='get_around_pricing_project.csv, else generated cars')
+    parser.add_argument('--rows', type=int, default=5000, help='generated cars, without --data')
+    parser.add_argument('--alphas', type=int, default=200, help='alphas added to the notebook grid')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from sklearn.linear_model import Ridge, RidgeCV
+    from sklearn.model_selection import GridSearchCV
+
+    X, y = load_dataset(args.data) if args.data else synthetic_dataset(args.rows, args.seed)
+    X_train, _, y_train, _ = split(X, y)
+    # dense, so that sklearn solves each fit exactly (cholesky) like the SVD does
+    X_train = as_dense(make_preprocessor().fit_transform(X_train))
+    y_train = np.asarray(y_train, dtype=np.float64)
+    alphas = ridge_grid(args.alphas)
+    failures = []
+
+    start = time.perf_counter()
+    grid = GridSearchCV(Ridge(), param_grid={'alpha': alphas}, cv=CV).fit(X_train, y_train)
+    t_grid = time.perf_counter() - start
+
+    start = time.perf_counter()
+    path = RidgePathCV(alphas, cv=CV).fit(X_train, y_train)
+    t_path = time.perf_counter() - start
+
+    print(f"{len(alphas)} alphas, {X_train.shape[0]} rows x {X_train.shape[1]} features, cv={CV}")
+    print(f"  GridSearchCV : {t_grid:8.3f}s  alpha={grid.best_params_['alpha']:.4g}  R2={grid.best_score_:.6f}")
+    print(f"  RidgePathCV  : {t_path:8.3f}s  alpha={path.best_params_['alpha']:.4g}  R2={path.best_score_:.6f}"
+          f"   x{t_grid / t_path:.1f}")
+
+    if path.best_params_ != grid.best_params_:
+        failures.append(f"best alpha {path.best_params_} != {grid.best_params_}")
+    score_diff = np.max(np.abs(path.cv_results_['mean_test_score'] - grid.cv_results_['mean_test_score']))
+    if score_diff > 1e-8:
+        failures.append(f"cv scores differ by {score_diff:.3g}")
+
+    # the closed form coefficients of the selected alpha against the refitted Ridge
+    intercepts, W = RidgePath(X_train, y_train).coefs([grid.best_params_['alpha']])
+    coef_diff = np.max(np.abs(W[:, 0] - grid.best_estimator_.coef_))
+    if coef_diff > 1e-6 or abs(intercepts[0] - grid.best_estimator_.intercept_) > 1e-6:
+        failures.append(f"coefficients differ by {coef_diff:.3g}")
+
+    # leave-one-out: RidgeCV needs alpha > 0
+    positive = [alpha for alpha in alphas if alpha > 0]
+    start = time.perf_counter()
+    ridge_cv = RidgeCV(alphas=positive, store_cv_values=True).fit(X_train, y_train)
+    t_ridge_cv = time.perf_counter() - start
+    start = time.perf_counter()
+    loo = RidgePath(X_train, y_train).loo_mse(positive)
+    t_loo = time.perf_counter() - start
+    print(f"  RidgeCV (LOO): {t_ridge_cv:8.3f}s  alpha={ridge_cv.alpha_:.4g}")
+    print(f"  RidgePath LOO: {t_loo:8.3f}s  alpha={positive[int(np.argmin(loo))]:.4g}")
+    loo_diff = np.max(np.abs(loo - ridge_cv.cv_values_.mean(axis=0)) / ridge_cv.cv_values_.mean(axis=0))
+    if loo_diff > 1e-6:
+        failures.append(f"leave-one-out errors differ by {loo_diff:.3g} (relative)")
+
+    if failures:
+        raise SystemExit('MISMATCH: ' + '; '.join(failures))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Compare the numpy LinearScorer with the sklearn path (scaler.transform + model.predict).
+
+Checks that the predictions agree within the tolerance, then times a single car and a batch.
+
+    python benchmarks/bench_scorer.py --cars 5000 --tolerance 1e-9
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import payloads  # noqa: F401  (puts the API folder on sys.path)
+from payloads import sample_cars
+
+from registry import registry
+from features import records_to_frame
+
+
+def per_call(fn, cars):
+    start = time.perf_counter()
+    for car in cars:
+        fn([car])
+    return (time.perf_counter() - start) / len(cars)
+
+
+def once(fn, cars):
+    start = time.perf_counter()
+    fn(cars)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cars', type=int, default=5000)
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    registry.load(linear_model_path=None)   # the sklearn artifacts, not the exported table
+    bundle = registry.current
+    if bundle.scorer is None:
+        sys.exit(f'the model {bundle.version} cannot be folded into a linear scorer')
+
+    cars = sample_cars(args.cars, bundle.scaler, seed=args.seed)
+
+    def sklearn_path(group):
+        return bundle.model.predict(bundle.scaler.transform(records_to_frame(group)))
+
+    def encoder_path(group):
+        return bundle.model.predict(bundle.encoder.encode(group))
+
+    difference = float(np.max(np.abs(bundle.scorer.score(cars) - sklearn_path(cars))))
+    print(f'max |scorer - sklearn| on {len(cars)} cars: {difference:.3g}')
+    if difference > args.tolerance:
+        sys.exit(f'above the tolerance {args.tolerance:g}')
+
+    paths = {'pandas + sklearn': sklearn_path, 'numpy scorer': bundle.scorer.score}
+    if bundle.encoder is not None:
+        paths = {'pandas + sklearn': sklearn_path, 'encoder + sklearn': encoder_path,
+                 'numpy scorer': bundle.scorer.score}
+
+    reference_single = per_call(sklearn_path, cars[:1000])
+    reference_batch = once(sklearn_path, cars)
+    print(f"{'':<20} {'us/car (single)':>16} {'speedup':>8} {'batch (s)':>11} {'speedup':>8}")
+    for name, fn in paths.items():
+        single = per_call(fn, cars[:1000])
+        batch = once(fn, cars)
+        print(f"{name:<20} {single * 1e6:>16.1f} {reference_single / single:>7.1f}x "
+              f"{batch:>11.4f} {reference_batch / batch:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Startup time of the API process: `import app` and the time to the first prediction.
+
+Each run is a fresh interpreter, like a new gunicorn worker. The coefficient table is exported
+first to a temporary file (like the Dockerfile does), so the workers take the slim path even on
+a clean checkout. With the limits given, the script exits with an error when they are exceeded
+or when the slim start imports heavy modules that inference does not need (so it can guard
+against startup regressions in CI):
+
+    python benchmarks/bench_startup.py --runs 5 --max-import-s 1.5 --max-first-prediction-s 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import payloads  # noqa: F401  (puts the API folder on sys.path)
+from payloads import API_DIR
+
+
+# modules that must never be imported just to serve predictions
+FORBIDDEN_MODULES = ['sklearn.metrics', 'matplotlib']
+
+CHILD = r'''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+from registry import registry
+from features import REFERENCE_CAR
+registry.load()
+registry.current.predict_records([REFERENCE_CAR])
+predicted = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "first_prediction_s": predicted - start,
+    "slim_start": registry.current.scorer is not None and registry.current._model is None,
+    "sklearn_imported": "sklearn" in sys.modules,
+    "pandas_imported": "pandas" in sys.modules,
+    "forbidden": [m for m in %r if m in sys.modules],
+}))
+''' % (FORBIDDEN_MODULES,)
+
+
+def export_linear_model(path):
+    """scorer.py --out path, False when the model cannot be folded (not linear)."""
+
+    done = subprocess.run([sys.executable, 'scorer.py', '--out', path], cwd=API_DIR, capture_output=True, text=True)
+    return done.returncode == 0
+
+
+def run_once(env):
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=API_DIR, capture_output=True,
+                            text=True, check=True, env=env).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import-s', type=float, default=None)
+    parser.add_argument('--max-first-prediction-s', type=float, default=None)
+    parser.add_argument('--json', default=None, help='also write the results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        linear_model_path = os.path.join(tmp, 'linear_model.json')
+        exported = export_linear_model(linear_model_path)
+        env = {**os.environ, 'LINEAR_MODEL_PATH': linear_model_path} if exported else dict(os.environ)
+        runs = [run_once(env) for _ in range(args.runs)]
+    result = {"runs": args.runs,
+              "import_s_median": statistics.median(r['import_s'] for r in runs),
+              "first_prediction_s_median": statistics.median(r['first_prediction_s'] for r in runs),
+              "linear_model_exported": exported,
+              "slim_start": runs[0]['slim_start'],
+              "sklearn_imported": runs[0]['sklearn_imported'],
+              "pandas_imported": runs[0]['pandas_imported'],
+              "forbidden_imported": runs[0]['forbidden']}
+
+    print(json.dumps(result, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    failures = []
+    # the sklearn path unpickles a GridSearchCV, which imports sklearn.metrics anyway
+    if result['slim_start'] and result['forbidden_imported']:
+        failures.append(f"modules not needed for inference were imported: {result['forbidden_imported']}")
+    if args.max_import_s is not None and result['import_s_median'] > args.max_import_s:
+        failures.append(f"import took {result['import_s_median']:.3f}s > {args.max_import_s}s")
+    if args.max_first_prediction_s is not None and result['first_prediction_s_median'] > args.max_first_prediction_s:
+        failures.append(f"first prediction after {result['first_prediction_s_median']:.3f}s "
+                        f"> {args.max_first_prediction_s}s")
+
+    if failures:
+        sys.exit('STARTUP REGRESSION: ' + '; '.join(failures))
+
+
+if __name__ == '__main__':
+    main()
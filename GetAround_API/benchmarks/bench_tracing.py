@@ -0,0 +1,185 @@
+"""Cost of the per-stage tracing of /predict, measured directly, against the latency of a request.
+
+Timing two short runs of whole requests with and without tracing only measures noise, so the
+cost of the tracing itself is measured apart, as the difference between:
+  - the TracingMiddleware (every request sampled) around an endpoint doing nothing but the
+    handler_started / handler_done calls, and that endpoint alone
+  - predict_records with the stage timings collected and recorded, and without
+Each is timed in `--rounds` interleaved rounds of `--calls` calls, the median of the rounds is
+kept. It is then compared with the median latency of a whole /predict through the ASGI app
+(in-process, distinct cars so none comes from the cache), with tracing off.
+
+The script exits with an error when a traced request costs more than --max-overhead percent
+of that latency (the sample rate only changes how many requests pay it, not what one pays).
+The medians resolve a fraction of a microsecond, well below 1% of a request.
+
+    python benchmarks/bench_tracing.py --rounds 31 --calls 2000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import payloads  # noqa: F401  (puts the API folder on sys.path)
+from payloads import sample_cars
+
+from registry import registry
+from tracing import (TracingMiddleware, Trace, current_trace, tracer, handler_started, handler_done,
+                     collect_timings, record_timings)
+from app import app
+
+
+SCOPE = {'type': 'http', 'path': '/predict'}
+
+
+async def receive():
+    return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+
+async def discard(message):
+    pass
+
+
+async def empty_endpoint(scope, receive, send):
+    handler_started()
+    handler_done()
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b'{}'})
+
+
+async def per_call_asgi(asgi_app, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        await asgi_app(SCOPE, receive, discard)
+    return (time.perf_counter() - start) / calls
+
+
+def per_call(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def median_difference(traced, bare, rounds):
+    """The median over interleaved rounds of the per-call time of `traced` minus `bare`."""
+
+    differences = []
+    for r in range(rounds):
+        # the order alternates, so neither one always runs on a warmer cache
+        if r % 2:
+            b, t = bare(), traced()
+        else:
+            t, b = traced(), bare()
+        differences.append(t - b)
+    return statistics.median(differences)
+
+
+async def post_predict(body):
+    """One POST /predict through the whole ASGI app, returns the status code."""
+
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+             'scheme': 'http', 'path': '/predict', 'raw_path': b'/predict', 'root_path': '', 'query_string': b'',
+             'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+             'client': ('127.0.0.1', 0), 'server': ('127.0.0.1', 80)}
+    sent = False
+    status = []
+
+    async def receive_body():
+        nonlocal sent
+        if sent:
+            return {'type': 'http.disconnect'}
+        sent = True
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await app(scope, receive_body, send)
+    return status[0]
+
+
+async def request_latency(bodies):
+    latencies = []
+    for body in bodies:
+        start = time.perf_counter()
+        if await post_predict(body) != 200:
+            raise SystemExit('/predict did not answer 200')
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies)
+
+
+async def measure(args):
+    bundle = registry.current
+    records = [sample_cars(1, bundle.scaler, seed=args.seed)[0]]
+
+    tracer.sample_rate = 1.0
+    middleware = TracingMiddleware(empty_endpoint, tracer=tracer)
+
+    # the same interleaved rounds as median_difference, awaited in this loop
+    differences = []
+    for r in range(args.rounds):
+        variants = [(middleware, 1), (empty_endpoint, -1)]
+        difference = 0.0
+        for asgi_app, sign in (variants if r % 2 == 0 else variants[::-1]):
+            difference += sign * await per_call_asgi(asgi_app, args.calls)
+        differences.append(difference)
+    middleware_cost = statistics.median(differences)
+
+    def timed_predict():
+        timings = collect_timings()
+        bundle.predict_records(records, timings)
+        record_timings(timings)
+
+    def traced_calls():
+        # the stages are only timed inside a traced request
+        token = current_trace.set(Trace())
+        try:
+            return per_call(timed_predict, args.calls)
+        finally:
+            current_trace.reset(token)
+
+    stage_cost = median_difference(traced_calls,
+                                   lambda: per_call(lambda: bundle.predict_records(records), args.calls),
+                                   args.rounds)
+
+    tracer.sample_rate = 0.0
+    cars = sample_cars(args.requests, bundle.scaler, seed=args.seed + 1)
+    for i, car in enumerate(cars):
+        car['mileage'] += i      # all distinct => no cache hit
+    latency = await request_latency([json.dumps(car).encode() for car in cars])
+    return middleware_cost, stage_cost, latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=31)
+    parser.add_argument('--calls', type=int, default=2000, help='calls per round and per variant')
+    parser.add_argument('--requests', type=int, default=2000, help='whole /predict requests for the latency')
+    parser.add_argument('--max-overhead', type=float, default=1.0, help='in percent of the median latency')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    registry.load()
+    sample_rate = tracer.sample_rate
+    try:
+        middleware_cost, stage_cost, latency = asyncio.run(measure(args))
+    finally:
+        tracer.sample_rate = sample_rate
+        tracer.reset()
+
+    cost = middleware_cost + stage_cost
+    overhead = cost / latency * 100
+    print(f"middleware, traced request : {middleware_cost * 1e6:8.2f} us")
+    print(f"stage timings              : {stage_cost * 1e6:8.2f} us")
+    print(f"median /predict latency    : {latency * 1e6:8.2f} us (tracing off)")
+    print(f"overhead, traced request   : {overhead:8.3f} %")
+
+    if overhead > args.max_overhead:
+        raise SystemExit(f"a traced request costs {overhead:.3f} % more, above {args.max_overhead} %")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""Load test of the pricing API over HTTP: throughput, p50/p95/p99 latency and RSS of the server.
+
+The server is started on the loopback, fully offline, either
+  --server inprocess : uvicorn in a thread of this process (quick, but the clients share its GIL)
+  --server gunicorn  : like the Dockerfile CMD, gunicorn + UvicornWorker with --workers processes
+or an already running one is used with --url.
+
+`--concurrency` clients (threads, one keep-alive connection each) replay realistic CarFeatures
+payloads, always the same for a seed. With --distinct the payloads repeat (the prediction
+cache is hit like in production), by default they are all different (no cache hit).
+
+The result is written as JSON (--out) and can be compared with a previous one (--compare):
+the script exits with an error when a metric regressed by more than --max-regression percent.
+
+    python benchmarks/loadtest.py --server gunicorn --workers 2 --concurrency 32 --requests 5000 --out head.json
+    python benchmarks/loadtest.py --server gunicorn --workers 2 --concurrency 32 --requests 5000 --compare head.json
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import payloads  # noqa: F401  (puts the API folder on sys.path)
+from payloads import API_DIR, sample_cars
+from stats import summarize
+
+
+# higher is better for the throughput, lower for the others
+HIGHER_IS_BETTER = ['throughput_rps']
+LOWER_IS_BETTER = ['p50_ms', 'p95_ms', 'p99_ms', 'rss_mb']
+
+
+#################################################################################################
+##########                              THE SERVER                                      #########
+#################################################################################################
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(host, port, timeout=60.0):
+    # the "/" health check answers once the worker started (and loaded the model)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request('GET', '/')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise SystemExit(f"the server on {host}:{port} did not start within {timeout}s")
+
+
+class InProcessServer:
+    """app:app under uvicorn, in a thread of this process."""
+
+    def __init__(self, port):
+        import uvicorn
+        from app import app
+
+        self.pid = os.getpid()
+        self.server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+        self.server.install_signal_handlers = lambda: None    # not in the main thread
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+class GunicornServer:
+    """The same command as the Dockerfile, bound to the loopback."""
+
+    def __init__(self, port, workers, env=None):
+        self.command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+                        '--worker-class', 'uvicorn.workers.UvicornWorker', '--workers', str(workers),
+                        '--log-level', 'warning']
+        self.env = {**os.environ, **(env or {})}
+        self.process = None
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def start(self):
+        self.process = subprocess.Popen(self.command, cwd=API_DIR, env=self.env)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def rss_mb(pid):
+    """The resident memory of a process and of its children (the gunicorn workers), Linux only."""
+
+    def rss(p):
+        try:
+            with open(f'/proc/{p}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return 0.0
+
+    def children(p):
+        try:
+            with open(f'/proc/{p}/task/{p}/children') as f:
+                return [int(c) for c in f.read().split()]
+        except OSError:
+            return []
+
+    if not os.path.exists(f'/proc/{pid}'):
+        return None
+    total, todo = 0.0, [pid]
+    while todo:
+        p = todo.pop()
+        total += rss(p)
+        todo.extend(children(p))
+    return total
+
+
+#################################################################################################
+##########                              THE CLIENTS                                     #########
+#################################################################################################
+
+def make_bodies(n, batch_size, distinct, seed):
+    # realistic cars, the mileage is shifted so that they are all distinct (no cache hit)
+    # unless only `distinct` different ones are replayed
+    pool = distinct or n * batch_size
+    cars = sample_cars(pool, seed=seed)
+    if not distinct:
+        for i, car in enumerate(cars):
+            car['mileage'] += i
+    cars = [cars[i % pool] for i in range(n * batch_size)]
+    if batch_size == 1:
+        return [json.dumps(car).encode() for car in cars]
+    return [json.dumps(cars[i:i + batch_size]).encode() for i in range(0, len(cars), batch_size)]
+
+
+def run_clients(host, port, path, bodies, concurrency):
+    latencies, statuses, errors = [], {}, []
+    lock = threading.Lock()
+    headers = {'Content-Type': 'application/json'}
+
+    def client(k):
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        mine, codes = [], {}
+        for body in bodies[k::concurrency]:
+            start = time.perf_counter()
+            try:
+                conn.request('POST', path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as e:
+                with lock:
+                    errors.append(repr(e))
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+                continue
+            if response.status == 200:
+                mine.append(time.perf_counter() - start)
+            codes[response.status] = codes.get(response.status, 0) + 1
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            for code, count in codes.items():
+                statuses[code] = statuses.get(code, 0) + count
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    result = summarize(latencies, time.perf_counter() - start)
+    result.update(statuses={str(code): count for code, count in sorted(statuses.items())},
+                  rejected=statuses.get(503, 0),
+                  errors=len(errors) + sum(count for code, count in statuses.items() if code not in (200, 503)))
+    return result
+
+
+#################################################################################################
+##########                              THE REPORT                                      #########
+#################################################################################################
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=API_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, baseline, max_regression):
+    """The metrics worse than the baseline by more than `max_regression` percent."""
+
+    failures = []
+    for metric in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+        new, old = result.get(metric), baseline.get(metric)
+        if new is None or old is None or old == 0:
+            continue
+        change = (new - old) / old * 100
+        worse = -change if metric in HIGHER_IS_BETTER else change
+        print(f"  {metric:<15} {old:>10.2f} -> {new:>10.2f}  ({change:+.1f} %)")
+        if worse > max_regression:
+            failures.append(f"{metric} {old:.2f} -> {new:.2f} ({change:+.1f} %)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', choices=['inprocess', 'gunicorn'], default='gunicorn')
+    parser.add_argument('--url', default=None, help='an already running server instead, e.g. http://127.0.0.1:8000')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE',
+                        help='environment of the gunicorn server, e.g. --env INFERENCE_EXECUTOR=none')
+    parser.add_argument('--endpoint', choices=['/predict', '/predict/batch'], default='/predict')
+    parser.add_argument('--batch-size', type=int, default=1, help='cars per request on /predict/batch')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--distinct', type=int, default=0, help='replay only this many different cars (0 = all distinct)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help='write the result to this JSON file')
+    parser.add_argument('--compare', default=None, help='a previous JSON result to compare with')
+    parser.add_argument('--max-regression', type=float, default=10.0, help='in percent')
+    args = parser.parse_args()
+
+    batch_size = args.batch_size if args.endpoint == '/predict/batch' else 1
+    bodies = make_bodies(args.warmup + args.requests, batch_size, args.distinct, args.seed)
+    warmup, bodies = bodies[:args.warmup], bodies[args.warmup:]
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = '127.0.0.1', free_port()
+        if args.server == 'inprocess':
+            server = InProcessServer(port)
+        else:
+            server = GunicornServer(port, args.workers, dict(e.split('=', 1) for e in args.env))
+        server.start()
+
+    try:
+        wait_ready(host, port)
+        if warmup:
+            run_clients(host, port, args.endpoint, warmup, args.concurrency)
+        result = run_clients(host, port, args.endpoint, bodies, args.concurrency)
+        result['rss_mb'] = rss_mb(server.pid) if server else None
+    finally:
+        if server:
+            server.stop()
+
+    report = {"commit": git_commit(),
+              "python": platform.python_version(),
+              "config": {"server": 'url' if args.url else args.server,
+                         "workers": args.workers if args.server == 'gunicorn' and not args.url else None,
+                         "env": args.env,
+                         "endpoint": args.endpoint,
+                         "batch_size": batch_size,
+                         "concurrency": args.concurrency,
+                         "requests": args.requests,
+                         "distinct": args.distinct,
+                         "seed": args.seed},
+              "result": result}
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if result['errors']:
+        failures.append(f"{result['errors']} requests failed")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('config') != report['config']:
+            print("warning: the baseline was run with another configuration")
+        print(f"compared with {args.compare} (commit {baseline.get('commit')}):")
+        failures += compare(result, baseline['result'], args.max_regression)
+
+    if failures:
+        sys.exit('LOAD TEST REGRESSION: ' + '; '.join(failures))
+
+
+if __name__ == '__main__':
+    main()
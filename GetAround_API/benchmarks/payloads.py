@@ -0,0 +1,52 @@
+import os
+import random
+import sys
+
+# the benchmarks import the API modules sitting in the parent folder
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from features import REFERENCE_CAR
+
+
+# used when the fitted scaler is not available to read the known categories from
+FALLBACK_CATEGORIES = {
+    "name": ["Citroën", "Renault", "BMW", "Peugeot", "Audi", "Nissan", "Mitsubishi", "Mercedes",
+             "Volkswagen", "Toyota", "others"],
+    "fuel": ["diesel", "petrol", "hybrid_petrol", "electro"],
+    "paint_color": ["black", "grey", "white", "red", "silver", "blue", "orange", "beige", "brown", "green"],
+    "car_type": ["convertible", "coupe", "estate", "hatchback", "sedan", "subcompact", "suv", "van"],
+}
+
+
+def known_categories(scaler=None):
+    """The categories the OneHotEncoder was fitted on, so every generated car is valid."""
+
+    if scaler is None:
+        return FALLBACK_CATEGORIES
+
+    ohe = scaler.named_transformers_['cat']
+    cat_columns = [cols for name, _, cols in scaler.transformers_ if name == 'cat'][0]
+    return {col: list(cats) for col, cats in zip(cat_columns, ohe.categories_)}
+
+
+def sample_cars(n, scaler=None, seed=0):
+    """Generate `n` realistic CarFeatures payloads (plain dicts), always the same for a seed."""
+
+    rng = random.Random(seed)
+    categories = known_categories(scaler)
+
+    cars = []
+    for _ in range(n):
+        car = dict(REFERENCE_CAR)
+        for col in ('name', 'fuel', 'paint_color', 'car_type'):
+            car[col] = rng.choice(list(categories[col]))
+        for col in ('private_parking_available', 'has_gps', 'has_air_conditioning', 'automatic_car',
+                    'has_getaround_connect', 'has_speed_regulator', 'winter_tires'):
+            car[col] = int(rng.choice(list(categories.get(col, [0, 1]))))
+        car['mileage'] = int(rng.lognormvariate(11.8, 0.5))
+        car['engine_power'] = int(rng.choice([90, 100, 110, 120, 135, 150, 190]))
+        cars.append(car)
+
+    return cars
@@ -0,0 +1,23 @@
+import math
+
+
+def percentile(values, q):
+    """Nearest-rank percentile (q in 0..100) of a list of numbers."""
+
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies, elapsed):
+    """Throughput and latency percentiles (in milliseconds) of one benchmark run."""
+
+    return {"requests": len(latencies),
+            "elapsed_s": elapsed,
+            "throughput_rps": len(latencies) / elapsed if elapsed > 0 else float('nan'),
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": max(latencies) * 1000 if latencies else float('nan')}
@@ -0,0 +1,111 @@
+import csv
+import io
+import json
+import os
+
+import numpy as np
+
+from features import MissingColumnsError, normalize_pricing_frame
+
+
+# number of rows parsed and scored at once, the memory used does not depend on the file size
+CHUNK_ROWS = int(os.environ.get('FILE_CHUNK_ROWS', '10000'))
+
+FORMATS = ('csv', 'ndjson', 'parquet')
+
+
+def guess_format(filename, content_type=None):
+    """'csv', 'ndjson' or 'parquet' from the file extension (or the content type)."""
+
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl', '.json')) or (content_type or '').endswith(('ndjson', 'jsonl')):
+        return 'ndjson'
+    if name.endswith(('.parquet', '.pq')):
+        return 'parquet'
+    return 'csv'
+
+
+def read_chunks(source, fmt, chunk_rows=CHUNK_ROWS):
+    """Iterate over a CSV / NDJSON / Parquet file (path or file object) chunk by chunk."""
+
+    import pandas as pd
+
+    # the readers are closed as soon as the generator is closed
+    if fmt == 'csv':
+        with pd.read_csv(source, chunksize=chunk_rows) as reader:
+            yield from reader
+    elif fmt == 'ndjson':
+        with pd.read_json(source, lines=True, chunksize=chunk_rows) as reader:
+            yield from reader
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"unknown format '{fmt}', expected one of {FORMATS}")
+
+
+# what a faulty row raises: an unknown category, a value that is not a number, a blank boolean...
+ROW_ERRORS = (ValueError, TypeError)
+
+
+def score_chunk(bundle, chunk, strict=False):
+    """Predictions of one raw chunk, plus the error of each row (None when it went fine).
+
+    The chunk is prepared and scored in one vectorized call, only when it fails (e.g. a car
+    with an unknown category) the rows are prepared and scored one by one to find the faulty
+    ones. With `strict`, a chunk without the scaler columns raises MissingColumnsError,
+    otherwise all its rows get the error.
+    """
+
+    try:
+        return bundle.predict_table(normalize_pricing_frame(chunk)), [None] * len(chunk)
+    except MissingColumnsError:
+        if strict:
+            raise
+    except ROW_ERRORS:
+        pass
+
+    predictions = np.full(len(chunk), np.nan)
+    errors = []
+    for i in range(len(chunk)):
+        try:
+            predictions[i] = bundle.predict_table(normalize_pricing_frame(chunk.iloc[i:i + 1]))[0]
+            errors.append(None)
+        except ROW_ERRORS as error:
+            errors.append(str(error))
+    return predictions, errors
+
+
+def score_stream(bundle, chunks):
+    """For each chunk: the row number of its first row, the predictions and the errors.
+
+    Only the first chunk can fail as a whole (see score_chunk), once the response has
+    started the errors are reported row by row.
+    """
+
+    first_row = 0
+    for chunk in chunks:
+        predictions, errors = score_chunk(bundle, chunk, strict=first_row == 0)
+        yield first_row, predictions, errors
+        first_row += len(chunk)
+
+
+def format_csv(first_row, predictions, errors, header=False):
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    if header:
+        writer.writerow(['row', 'prediction', 'error'])
+    for i, (prediction, error) in enumerate(zip(predictions.tolist(), errors)):
+        writer.writerow([first_row + i, '' if error is not None else repr(prediction), error or ''])
+    return out.getvalue()
+
+
+def format_ndjson(first_row, predictions, errors, header=False):
+    lines = []
+    for i, (prediction, error) in enumerate(zip(predictions.tolist(), errors)):
+        row = {"row": first_row + i, "prediction": prediction if error is None else None}
+        if error is not None:
+            row["error"] = error
+        lines.append(json.dumps(row) + '\n')
+    return ''.join(lines)
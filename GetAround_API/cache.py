@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from features import FEATURE_COLUMNS, INT_COLUMNS
+
+
+# configuration, can be changed per deployment with environment variables
+#   CACHE_MAXSIZE      : number of predictions kept (0 disables the cache)
+#   CACHE_TTL_SECONDS  : how long a prediction stays valid
+CACHE_MAXSIZE = int(os.environ.get('CACHE_MAXSIZE', '10000'))
+CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', '3600'))
+
+
+def features_key(car):
+    """Canonical hash of the features of a car, the same car always gives the same key.
+
+    The fields are taken in the scaler order and the numeric/boolean ones as integers,
+    so e.g. `true` and `1` or a different field order in the JSON do not make a new entry.
+    """
+
+    car = car if isinstance(car, dict) else dict(car)
+    values = [int(car[col]) if col in INT_COLUMNS else str(car[col]) for col in FEATURE_COLUMNS]
+    payload = json.dumps(values, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class PredictionCache:
+    """Bounded LRU cache of predictions with a time to live, tied to one model version.
+
+    When a prediction of another model version is asked for, everything is dropped, the old
+    prices must not be served by the new model. A lock keeps it safe if it is used from the
+    inference threads as well as from the event loop.
+    """
+
+    def __init__(self, maxsize=CACHE_MAXSIZE, ttl_seconds=CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl_seconds
+        self.clock = clock
+        self.version = None
+        self._entries = OrderedDict()     # key -> (expires_at, prediction), oldest first
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def _invalidate(self, version):
+        # called with the lock held
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self.version = version
+
+    def _check_version(self, version):
+        # called with the lock held
+        if version != self.version:
+            self._invalidate(version)
+
+    def get(self, key, version):
+        """The cached prediction or None."""
+
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, prediction = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return prediction
+
+    def put(self, key, version, prediction):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            # a prediction computed just before a model swap is not stored for the new version
+            if version != self.version:
+                return
+            self._entries[key] = (self.clock() + self.ttl, prediction)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, version):
+        """Drop everything and tie the cache to `version`, even when it keeps the same name."""
+
+        with self._lock:
+            self._invalidate(version)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations}
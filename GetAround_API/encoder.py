@@ -0,0 +1,150 @@
+import numpy as np
+
+
+class FeatureEncoder:
+    """Turns cars straight into the scaled matrix, without building a pandas dataframe.
+
+    It is compiled from the fitted ColumnTransformer of the notebook (scaler_v3.joblib):
+        - 'num' : median SimpleImputer + StandardScaler on mileage / engine_power
+        - 'cat' : OneHotEncoder(drop='first') on the other columns
+    and reuses its fitted medians, means, scales and categories, so the output is the same
+    matrix as `scaler.transform(df)` (as a dense array).
+    """
+
+    def __init__(self, blocks, n_features_out):
+        # blocks are ('num', columns, medians, means, scales, offset)
+        #         or ('cat', column, {category: output column or None if dropped})
+        self.blocks = blocks
+        self.n_features_out = n_features_out
+
+    @classmethod
+    def from_column_transformer(cls, preprocessor):
+        """Read the fitted parameters, raise TypeError for a layout we do not know how to compile."""
+
+        blocks = []
+        offset = 0
+
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+
+            kind = type(transformer).__name__
+
+            if kind == 'Pipeline':
+                steps = [step for _, step in transformer.steps]
+                if [type(s).__name__ for s in steps] != ['SimpleImputer', 'StandardScaler']:
+                    raise TypeError(f"cannot compile the pipeline of '{name}'")
+                imputer, standard_scaler = steps
+                if imputer.strategy not in ('median', 'mean', 'constant', 'most_frequent') \
+                        or getattr(imputer, 'add_indicator', False):
+                    raise TypeError(f"cannot compile the imputer of '{name}'")
+
+                medians = np.asarray(imputer.statistics_, dtype=np.float64)
+                means = standard_scaler.mean_ if standard_scaler.with_mean else None
+                scales = standard_scaler.scale_ if standard_scaler.with_std else None
+                blocks.append(('num', list(columns), medians, means, scales, offset))
+                offset += len(columns)
+
+            elif kind == 'OneHotEncoder':
+                if getattr(transformer, '_infrequent_enabled', False):
+                    raise TypeError(f"cannot compile the infrequent categories of '{name}'")
+
+                drop_idx = transformer.drop_idx_
+                for i, column in enumerate(columns):
+                    dropped = None if drop_idx is None else drop_idx[i]
+                    lookup = {}
+                    for j, category in enumerate(transformer.categories_[i]):
+                        if dropped is not None and j == dropped:
+                            lookup[category] = None    # the reference category is all zeros
+                        else:
+                            lookup[category] = offset
+                            offset += 1
+                    blocks.append(('cat', column, lookup))
+
+            else:
+                raise TypeError(f"cannot compile the transformer '{name}' ({kind})")
+
+        return cls(blocks, offset)
+
+    def encode(self, records):
+        """Encode a list of cars (CarFeatures objects or dicts) into an (n, n_features_out) array."""
+
+        records = [r if isinstance(r, dict) else dict(r) for r in records]
+        n = len(records)
+        X = np.zeros((n, self.n_features_out), dtype=np.float64)
+        rows = np.arange(n)
+
+        for block in self.blocks:
+            if block[0] == 'num':
+                _, columns, medians, means, scales, offset = block
+                values = np.array([[r[col] for col in columns] for r in records], dtype=np.float64)
+                values = values.reshape(n, len(columns))
+                missing = np.isnan(values)
+                if missing.any():
+                    values[missing] = np.take(medians, np.nonzero(missing)[1])
+                # same operations and order as StandardScaler.transform
+                if means is not None:
+                    values -= means
+                if scales is not None:
+                    values /= scales
+                X[:, offset:offset + len(columns)] = values
+
+            else:
+                _, column, lookup = block
+                positions = np.empty(n, dtype=np.int64)
+                for i, r in enumerate(records):
+                    value = r[column]
+                    if isinstance(value, (bool, np.bool_)):
+                        value = int(value)
+                    try:
+                        position = lookup[value]
+                    except (KeyError, TypeError):
+                        raise ValueError(f"Found unknown categories ['{value}'] in column '{column}' during transform")
+                    positions[i] = -1 if position is None else position
+                hot = positions >= 0
+                X[rows[hot], positions[hot]] = 1.0
+
+        return X
+
+
+def reference_records(encoder):
+    """The reference car with every known category swapped in one at a time."""
+
+    from features import REFERENCE_CAR
+
+    base = dict(REFERENCE_CAR)
+    for block in encoder.blocks:
+        if block[0] == 'cat':
+            base[block[1]] = next(iter(block[2]))
+
+    records = [base]
+    for block in encoder.blocks:
+        if block[0] == 'cat':
+            for category in block[2]:
+                records.append(dict(base, **{block[1]: category}))
+    return records
+
+
+def build_encoder(preprocessor):
+    """Compile the encoder and check it against the sklearn transform on the reference records.
+
+    Returns None when the preprocessor cannot be compiled or when the outputs are not
+    exactly the same, the caller then keeps using `preprocessor.transform`.
+    """
+
+    from features import records_to_frame
+
+    try:
+        encoder = FeatureEncoder.from_column_transformer(preprocessor)
+    except (TypeError, AttributeError):
+        return None
+
+    records = reference_records(encoder)
+    expected = preprocessor.transform(records_to_frame(records))
+    if hasattr(expected, 'toarray'):
+        expected = expected.toarray()
+
+    if not np.array_equal(encoder.encode(records), expected):
+        return None
+
+    return encoder
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from tracing import collect_timings, record_timings
+
+
+# configuration, can be changed per deployment with environment variables
+#   INFERENCE_EXECUTOR     : 'thread', 'process' or 'none' (run inside the event loop as before)
+#   INFERENCE_WORKERS      : number of threads / processes of the pool
+#   INFERENCE_MAX_PENDING  : calls accepted (running + waiting) before answering 503
+EXECUTOR_KIND = os.environ.get('INFERENCE_EXECUTOR', 'thread')
+EXECUTOR_WORKERS = int(os.environ.get('INFERENCE_WORKERS', '2'))
+EXECUTOR_MAX_PENDING = int(os.environ.get('INFERENCE_MAX_PENDING', '256'))
+
+
+class ExecutorSaturated(Exception):
+    """Too many predictions are already waiting, the caller should retry later."""
+
+
+# In the process pool each worker process loads its own copy of the model once
+_worker_bundle = None
+
+def _init_worker(scaler_path, model_path, version, linear_model_path):
+    global _worker_bundle
+    from registry import load_bundle
+    _worker_bundle = load_bundle(scaler_path, model_path, version, linear_model_path)
+
+def _predict_in_worker(records, timed=False):
+    # the stage timings are sent back with the predictions, the trace lives in the parent
+    timings = {} if timed else None
+    return _worker_bundle.predict_records(records, timings).tolist(), timings
+
+
+class InferenceExecutor:
+    """Runs the CPU-bound predictions outside of the event loop, with a bounded backlog."""
+
+    def __init__(self, registry, kind=EXECUTOR_KIND, max_workers=EXECUTOR_WORKERS,
+                 max_pending=EXECUTOR_MAX_PENDING):
+        if kind not in ('thread', 'process', 'none'):
+            raise ValueError(f"unknown executor kind '{kind}', expected 'thread', 'process' or 'none'")
+        self.registry = registry
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool = None
+        self._pool_bundle = None
+
+        # metrics
+        self.pending = 0          # accepted and not finished yet (running + waiting in the queue)
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.total_seconds = 0.0  # waiting + running time of the accepted calls
+
+    def _get_pool(self):
+        if self.kind == 'thread':
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='inference')
+            return self._pool
+
+        # the processes hold the model they were started with, restart them on a new version
+        bundle = self.registry.current
+        if self._pool is None or self._pool_bundle is not bundle:
+            self.shutdown(wait=False)
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                             initargs=(bundle.scaler_path, bundle.model_path, bundle.version,
+                                                       bundle.linear_model_path))
+            self._pool_bundle = bundle
+        return self._pool
+
+    @property
+    def queue_depth(self):
+        # the calls beyond the number of workers are waiting for a free one
+        return max(0, self.pending - self.max_workers)
+
+    async def predict(self, records):
+        """Predict a list of cars (CarFeatures or dicts) and return the list of prices."""
+
+        records = [r if isinstance(r, dict) else dict(r) for r in records]
+        timings = collect_timings()   # None when this call is not traced
+
+        if self.kind == 'none':
+            result = self.registry.current.predict_records(records, timings).tolist()
+            record_timings(timings)
+            return result
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ExecutorSaturated(f'{self.pending} predictions already pending')
+
+        self.pending += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            if self.kind == 'thread':
+                # take the bundle now, so the whole call uses one model version
+                bundle = self.registry.current
+                result = await loop.run_in_executor(self._get_pool(),
+                                                    lambda: bundle.predict_records(records, timings).tolist())
+            else:
+                result, timings = await loop.run_in_executor(self._get_pool(), _predict_in_worker, records,
+                                                             timings is not None)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+            self.total_seconds += time.perf_counter() - start
+
+        self.completed += 1
+        record_timings(timings)
+        return result
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+            self._pool_bundle = None
+
+    def stats(self):
+        return {"kind": self.kind,
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "total_seconds": round(self.total_seconds, 6)}
@@ -0,0 +1,86 @@
+# the columns expected by the scaler, in the same order as the training set (X in the notebook)
+FEATURE_COLUMNS = ['name', 'mileage', 'engine_power', 'fuel',
+                   'paint_color', 'car_type', 'private_parking_available', 'has_gps',
+                   'has_air_conditioning', 'automatic_car', 'has_getaround_connect',
+                   'has_speed_regulator', 'winter_tires']
+
+# the numeric and the boolean fields, the booleans were turned into 0/1 before training
+INT_COLUMNS = ['mileage', 'engine_power',
+               'private_parking_available', 'has_gps', 'has_air_conditioning', 'automatic_car',
+               'has_getaround_connect', 'has_speed_regulator', 'winter_tires']
+
+# the example car documented at the bottom of app.py, it is also used to check the compiled encoder
+REFERENCE_CAR = {
+    "name": "Peugeot",
+    "mileage": 123886,
+    "engine_power": 125,
+    "fuel": "petrol",
+    "paint_color": "black",
+    "car_type": "convertible",
+    "private_parking_available": 1,
+    "has_gps": 0,
+    "has_air_conditioning": 0,
+    "automatic_car": 0,
+    "has_getaround_connect": 0,
+    "has_speed_regulator": 1,
+    "winter_tires": 1,
+}
+
+
+def records_to_frame(records):
+    """Build one columnar dataframe out of many cars.
+
+    `records` is a list of CarFeatures objects or of plain dicts, the frame is built column by
+    column in a single pass instead of appending the rows one after the other.
+    """
+
+    import pandas as pd   # only this fallback path needs pandas, the API can start without it
+
+    records = [r if isinstance(r, dict) else dict(r) for r in records]
+
+    columns = {}
+    for col in FEATURE_COLUMNS:
+        values = [r[col] for r in records]
+        if col in INT_COLUMNS:
+            columns[col] = pd.array([int(v) for v in values], dtype='int64')
+        else:
+            columns[col] = values
+
+    return pd.DataFrame(columns, columns=FEATURE_COLUMNS)
+
+
+# the numeric columns stay floats in the files: a blank cell is NaN, filled by the median imputer
+NUMERIC_COLUMNS = ['mileage', 'engine_power']
+
+
+class MissingColumnsError(ValueError):
+    """The file does not have the columns of the scaler, no row of it can be scored."""
+
+
+# the brands kept by the notebook, the other ones were trained as 'others'
+COMMON_BRANDS = ['Citroën', 'Renault', 'BMW', 'Peugeot', 'Audi', 'Nissan', 'Mitsubishi', 'Mercedes',
+                 'Volkswagen', 'Toyota', 'Ferrari', 'Porsche', 'Maserati', 'Suzuki', 'Ford',
+                 'KIA Motors', 'Alfa Romeo']
+
+
+def normalize_pricing_frame(df):
+    """Apply the notebook preparation to a chunk shaped like get_around_pricing_project.csv.
+
+    - `model_key` is renamed `name` and the rare brands become 'others'
+    - the boolean columns become 0/1, the numeric ones floats (a blank cell stays NaN)
+    - only the scaler columns are kept, in the scaler order (no index, no price column)
+    """
+
+    if 'model_key' in df.columns and 'name' not in df.columns:
+        df = df.rename(columns={'model_key': 'name'})
+
+    missing = [col for col in FEATURE_COLUMNS if col not in df.columns]
+    if missing:
+        raise MissingColumnsError(f'missing columns: {missing}')
+
+    df = df[FEATURE_COLUMNS].copy()
+    df['name'] = df['name'].where(df['name'].isin(COMMON_BRANDS), 'others')
+    for col in INT_COLUMNS:
+        df[col] = df[col].astype('float64' if col in NUMERIC_COLUMNS else 'int64')
+
+    return df
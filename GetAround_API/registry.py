@@ -0,0 +1,234 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+from encoder import build_encoder
+from scorer import LinearScorer, build_scorer
+from features import records_to_frame
+
+
+# Where the artifacts live, by default next to this file (same as the Dockerfile WORKDIR)
+# they can be overridden with environment variables when deploying a new version
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCALER_PATH = os.environ.get('SCALER_PATH', os.path.join(BASE_DIR, 'scaler_v3.joblib'))
+DEFAULT_MODEL_PATH = os.environ.get('MODEL_PATH', os.path.join(BASE_DIR, 'model.pkl'))
+# the coefficient table exported by scorer.py, when it matches the scaler and model.pkl
+# the worker starts without unpickling anything (and without importing sklearn at all)
+DEFAULT_LINEAR_MODEL_PATH = os.environ.get('LINEAR_MODEL_PATH', os.path.join(BASE_DIR, 'linear_model.json'))
+# the only folder /model/reload may read artifacts from (the files are unpickled)
+ARTIFACTS_ROOT = os.path.realpath(os.environ.get('MODEL_ARTIFACTS_DIR', BASE_DIR))
+
+
+def artifact_path(path, root=ARTIFACTS_ROOT):
+    """`path` resolved inside the artifact folder (relative to it, or absolute).
+
+    Raises PermissionError when it points outside of it, symbolic links included.
+    """
+
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([full, root]) != root:
+        raise PermissionError(f"'{path}' is not inside the artifact folder")
+    return full
+
+
+class ModelBundle:
+    """The preprocessor and the regressor of one model version, loaded together.
+
+    When the bundle starts from the exported linear scorer, the sklearn artifacts are only
+    read from their paths the first time `scaler` or `model` is needed.
+    """
+
+    def __init__(self, scaler, model, version, encoder=None, scorer=None, scaler_path=None, model_path=None,
+                 linear_model_path=None):
+        self._scaler = scaler
+        self._model = model
+        self.version = version
+        self.encoder = encoder   # compiled copy of the scaler, None if it could not be compiled
+        self.scorer = scorer     # scaler + linear model folded in numpy, None for a non linear model
+        # where the artifacts came from, the worker processes reload them from there
+        self.scaler_path = scaler_path
+        self.model_path = model_path
+        self.linear_model_path = linear_model_path
+        self._lock = threading.Lock()
+
+    def _load_artifacts(self):
+        with self._lock:
+            if self._scaler is None and self.scaler_path is not None:
+                self._scaler = read_scaler(self.scaler_path)
+            if self._model is None and self.model_path is not None:
+                self._model = read_model(self.model_path)[0]
+
+    @property
+    def scaler(self):
+        if self._scaler is None:
+            self._load_artifacts()
+        return self._scaler
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._load_artifacts()
+        return self._model
+
+    def predict_frame(self, df):
+        # scale then predict, exactly like the notebook
+        scaled_X = self.scaler.transform(df)
+        return self.model.predict(scaled_X)
+
+    def predict_records(self, records, timings=None):
+        # the hot path, the fastest available way:
+        #   1) the numpy linear scorer, no pandas and no sklearn involved
+        #   2) the compiled encoder + model.predict
+        #   3) pandas + scaler.transform + model.predict, like the notebook
+        # with a `timings` dict the time of each stage is added to it (see tracing.py)
+        if timings is not None:
+            return self._timed_predict_records(records, timings)
+        if self.scorer is not None:
+            return self.scorer.score(records)
+        if self.encoder is not None:
+            return self.model.predict(self.encoder.encode(records))
+        return self.predict_frame(records_to_frame(records))
+
+    def _timed_predict_records(self, records, timings):
+        # the same paths, with the clock read between the stages
+        clock = time.perf_counter
+        start = clock()
+        if self.scorer is not None:
+            # encode, transform and predict are a single pass in the scorer
+            y = self.scorer.score(records)
+            timings['predict'] = clock() - start
+            return y
+        if self.encoder is not None:
+            X = self.encoder.encode(records)    # the scaling is compiled in the encoder
+            encoded = clock()
+            y = self.model.predict(X)
+            timings['encode'] = encoded - start
+            timings['predict'] = clock() - encoded
+            return y
+        df = records_to_frame(records)
+        encoded = clock()
+        X = self.scaler.transform(df)
+        transformed = clock()
+        y = self.model.predict(X)
+        timings['encode'] = encoded - start
+        timings['transform'] = transformed - encoded
+        timings['predict'] = clock() - transformed
+        return y
+
+    def predict_table(self, df):
+        # same for a whole dataframe (file uploads, offline scoring)
+        if self.scorer is not None:
+            return self.scorer.score_frame(df)
+        return self.predict_frame(df)
+
+
+def read_scaler(scaler_path):
+    import joblib   # imported here, it pulls in sklearn when unpickling the scaler
+    return joblib.load(scaler_path)
+
+
+def _stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _content_version(model_path, content):
+    # the file name + a hash of its content,
+    # so re-deploying a new model.pkl under the same name is still a new version
+    return f"{_stem(model_path)}-{hashlib.sha256(content).hexdigest()[:8]}"
+
+
+def _pair_version(scaler_path, model_path, scaler_content, model_content):
+    digest = hashlib.sha256(hashlib.sha256(scaler_content).digest() + hashlib.sha256(model_content).digest())
+    return f"{_stem(scaler_path)}+{_stem(model_path)}-{digest.hexdigest()[:8]}"
+
+
+def read_model(model_path):
+    """The unpickled model and its content version."""
+
+    with open(model_path, 'rb') as f:
+        content = f.read()
+    return pickle.loads(content), _content_version(model_path, content)
+
+
+def model_file_version(model_path):
+    return _content_version(model_path, _read_bytes(model_path))
+
+
+def artifacts_version(scaler_path, model_path):
+    """The source_version of a coefficient table: a hash of both the scaler and the model file."""
+
+    return _pair_version(scaler_path, model_path, _read_bytes(scaler_path), _read_bytes(model_path))
+
+
+def load_bundle(scaler_path=DEFAULT_SCALER_PATH, model_path=DEFAULT_MODEL_PATH, version=None,
+                linear_model_path=DEFAULT_LINEAR_MODEL_PATH):
+    """Read the artifacts from disk, this is the expensive part (I/O + unpickling)."""
+
+    # 1) the slim path: an exported coefficient table made from this very scaler and model.pkl
+    if linear_model_path and os.path.exists(linear_model_path):
+        model_content = _read_bytes(model_path)
+        source_version = _pair_version(scaler_path, model_path, _read_bytes(scaler_path), model_content)
+        scorer = LinearScorer.load(linear_model_path)
+        if scorer.source_version == source_version:
+            return ModelBundle(None, None, version or _content_version(model_path, model_content), scorer=scorer,
+                               scaler_path=scaler_path, model_path=model_path,
+                               linear_model_path=linear_model_path)
+
+    # 2) the sklearn artifacts, compiled into the encoder / scorer when possible
+    scaler = read_scaler(scaler_path)
+    model, file_version = read_model(model_path)
+    version = version or file_version
+    source_version = artifacts_version(scaler_path, model_path)
+
+    return ModelBundle(scaler, model, version,
+                       encoder=build_encoder(scaler),
+                       scorer=build_scorer(scaler, model, source_version=source_version),
+                       scaler_path=scaler_path, model_path=model_path,
+                       linear_model_path=linear_model_path)
+
+
+class ModelRegistry:
+    """Keeps the current model version in memory.
+
+    The bundle is replaced as a whole by a single reference assignment, so a request that
+    already took `registry.current` keeps using its own scaler/model pair until it finishes,
+    while new requests get the new version.
+    """
+
+    def __init__(self):
+        self._bundle = None
+        self._lock = threading.Lock()   # only serializes the writers (load / swap)
+
+    @property
+    def current(self):
+        bundle = self._bundle
+        if bundle is None:
+            raise RuntimeError('No model loaded, call registry.load() first')
+        return bundle
+
+    @property
+    def is_loaded(self):
+        return self._bundle is not None
+
+    def load(self, scaler_path=DEFAULT_SCALER_PATH, model_path=DEFAULT_MODEL_PATH, version=None,
+             linear_model_path=DEFAULT_LINEAR_MODEL_PATH):
+        # the loading happens outside the lock, the old version keeps serving in the meantime
+        bundle = load_bundle(scaler_path, model_path, version, linear_model_path)
+        return self.swap(bundle)
+
+    def swap(self, bundle):
+        with self._lock:
+            previous = self._bundle
+            self._bundle = bundle
+        return previous
+
+
+# one registry per process (i.e. per gunicorn worker)
+registry = ModelRegistry()
@@ -0,0 +1,136 @@
+"""The whole Ridge regularization path from one SVD, instead of one refit per alpha.
+
+With X centered (the intercept is not penalized, like sklearn's Ridge) and X = U diag(s) Vt,
+    coef(alpha) = V diag(s / (s² + alpha)) Ut y
+so once U, s, Vt are known every alpha costs a few small matrix products:
+  - k-fold (what GridSearchCV(Ridge(), {'alpha': ...}, cv=k) does): one SVD per training fold,
+    then the R² of every alpha on the held-out fold. The folds are the ones of KFold(k)
+  - leave-one-out and GCV: one SVD of the whole set, the prediction of a row without it is
+    (y - ŷ) / (1 - h) with h the diagonal of the hat matrix, 1/n + sum(U² s² / (s² + alpha))
+
+RidgePathCV behaves like the GridSearchCV of the notebook (best_params_, best_score_,
+cv_results_, best_estimator_ refitted on the whole set), so train.py and the API take it as is.
+"""
+import numpy as np
+
+
+# the singular values below this are treated as 0 (the same cut as sklearn's svd solver)
+SINGULAR_CUTOFF = 1e-15
+
+
+def as_dense(X):
+    return np.asarray(X.toarray() if hasattr(X, 'toarray') else X, dtype=np.float64)
+
+
+class RidgePath:
+    """The SVD of one (centered) training set, and the Ridge fits of any alphas from it."""
+
+    def __init__(self, X, y):
+        X, y = as_dense(X), np.asarray(y, dtype=np.float64)
+        self.n = X.shape[0]
+        self.X_mean = X.mean(axis=0)
+        self.y_mean = y.mean()
+        self.U, s, self.Vt = np.linalg.svd(X - self.X_mean, full_matrices=False)
+        self.s = np.where(s > SINGULAR_CUTOFF, s, 0.0)
+        self.Uty = self.U.T @ (y - self.y_mean)
+        self.y = y
+
+    def _shrink(self, alphas):
+        # s / (s² + alpha) for every (singular value, alpha), 0 for the null singular values
+        s = self.s[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            d = np.where(s > 0, s / (s ** 2 + np.asarray(alphas, dtype=np.float64)[None, :]), 0.0)
+        return d
+
+    def coefs(self, alphas):
+        """The intercepts (n_alphas,) and the coefficients (n_features, n_alphas)."""
+
+        W = self.Vt.T @ (self._shrink(alphas) * self.Uty[:, None])
+        return self.y_mean - self.X_mean @ W, W
+
+    def predict(self, X, alphas):
+        """The predictions of every alpha, (n_rows, n_alphas)."""
+
+        intercepts, W = self.coefs(alphas)
+        return as_dense(X) @ W + intercepts
+
+    def _hat(self, alphas):
+        # s² / (s² + alpha): the diagonal of the hat matrix in the base of U
+        return self._shrink(alphas) * self.s[:, None]
+
+    def loo_mse(self, alphas):
+        """The leave-one-out mean squared error of every alpha, no refit."""
+
+        hat = self._hat(alphas)
+        residuals = (self.y - self.y_mean)[:, None] - self.U @ (hat * self.Uty[:, None])
+        leverage = 1.0 / self.n + (self.U ** 2) @ hat
+        return np.mean((residuals / (1.0 - leverage)) ** 2, axis=0)
+
+    def gcv_mse(self, alphas):
+        """The generalized cross-validation error: the leverages replaced by their mean."""
+
+        hat = self._hat(alphas)
+        residuals = (self.y - self.y_mean)[:, None] - self.U @ (hat * self.Uty[:, None])
+        mean_leverage = (1.0 + hat.sum(axis=0)) / self.n
+        return np.mean(residuals ** 2, axis=0) / (1.0 - mean_leverage) ** 2
+
+
+def r2(y, predictions):
+    """The R² of each column of `predictions` (like Ridge.score)."""
+
+    y = np.asarray(y, dtype=np.float64)
+    total = np.sum((y - y.mean()) ** 2)
+    return 1.0 - np.sum((y[:, None] - predictions) ** 2, axis=0) / total
+
+
+def kfold_scores(X, y, alphas, cv=3):
+    """The R² of every alpha on each held-out fold, (cv, n_alphas), the folds of KFold(cv)."""
+
+    X, y = as_dense(X), np.asarray(y, dtype=np.float64)
+    scores = []
+    for test in np.array_split(np.arange(X.shape[0]), cv):   # the same sizes and order as KFold
+        train = np.ones(X.shape[0], dtype=bool)
+        train[test] = False
+        path = RidgePath(X[train], y[train])
+        scores.append(r2(y[test], path.predict(X[test], alphas)))
+    return np.array(scores)
+
+
+class RidgePathCV:
+    """GridSearchCV(Ridge(), {'alpha': alphas}, cv=cv) computed with RidgePath.
+
+    cv is a number of folds (R², like GridSearchCV), 'loo' or 'gcv' (the score is then minus
+    the mean squared error, like RidgeCV). The best alpha is refitted with sklearn's Ridge.
+    """
+
+    def __init__(self, alphas, cv=3):
+        self.alphas = list(alphas)
+        self.cv = cv
+
+    def fit(self, X, y):
+        from sklearn.linear_model import Ridge
+
+        alphas = np.asarray(self.alphas, dtype=np.float64)
+        if self.cv in ('loo', 'gcv'):
+            path = RidgePath(X, y)
+            scores = -(path.loo_mse(alphas) if self.cv == 'loo' else path.gcv_mse(alphas))
+            self.cv_results_ = {'param_alpha': alphas, 'mean_test_score': scores}
+        else:
+            splits = kfold_scores(X, y, alphas, self.cv)
+            scores = splits.mean(axis=0)
+            self.cv_results_ = {'param_alpha': alphas, 'mean_test_score': scores,
+                                'std_test_score': splits.std(axis=0),
+                                **{f'split{k}_test_score': split for k, split in enumerate(splits)}}
+
+        # the first of the best ones, as GridSearchCV ranks the ties
+        self.best_index_ = int(np.argmax(scores))
+        self.best_params_ = {'alpha': self.alphas[self.best_index_]}
+        self.best_score_ = float(scores[self.best_index_])
+        self.best_estimator_ = Ridge(**self.best_params_).fit(X, y)
+        return self
+
+    def predict(self, X):
+        return self.best_estimator_.predict(X)
+
+    def score(self, X, y):
+        return self.best_estimator_.score(X, y)
@@ -0,0 +1,129 @@
+"""Offline batch scoring of a pricing file, with the same preprocessor and model as the API.
+
+The input (CSV, NDJSON or Parquet shaped like get_around_pricing_project.csv) is read chunk by
+chunk, the chunks are scored in a pool of processes and written in order to a columnar file
+(Parquet, or Arrow/Feather for a .arrow / .feather output). Nothing goes through HTTP.
+
+    python score.py get_around_pricing_project.csv --output prices.parquet --workers 8
+    python score.py fleet.parquet --output prices.parquet --linear-model linear_model.json
+"""
+import argparse
+import os
+import time
+from collections import deque
+from multiprocessing import Pool
+
+import pandas as pd
+
+import bulk
+from registry import DEFAULT_SCALER_PATH, DEFAULT_MODEL_PATH
+
+
+# each worker process loads the model once
+_bundle = None
+
+def _init_worker(scaler_path, model_path, linear_model_path):
+    global _bundle
+    from registry import ModelBundle, load_bundle
+    if linear_model_path:
+        # only the exported coefficient table, sklearn is not even imported
+        from scorer import LinearScorer
+        scorer = LinearScorer.load(linear_model_path)
+        _bundle = ModelBundle(None, None, scorer.source_version, scorer=scorer)
+    else:
+        _bundle = load_bundle(scaler_path, model_path)
+
+def _score_in_worker(chunk):
+    return bulk.score_chunk(_bundle, chunk)
+
+
+class ColumnarWriter:
+    """Appends the scored chunks to a Parquet or an Arrow IPC (Feather) file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.arrow = path.lower().endswith(('.arrow', '.feather', '.ipc'))
+        self._writer = None
+        self._schema = None
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._schema = table.schema
+            if self.arrow:
+                self._writer = pa.ipc.new_file(self.path, self._schema)
+            else:
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+        else:
+            # e.g. a column that is entirely empty in one chunk
+            table = table.cast(self._schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def score_file(input_path, output_path, workers, chunk_rows, scaler_path, model_path, linear_model_path=None):
+    """Score the file and return the number of rows."""
+
+    fmt = bulk.guess_format(input_path)
+    chunks = bulk.read_chunks(input_path, fmt, chunk_rows)
+    writer = ColumnarWriter(output_path)
+    rows = 0
+
+    def write(chunk, result):
+        predictions, errors = result
+        chunk = chunk.copy()
+        chunk['prediction'] = predictions
+        chunk['error'] = pd.array(errors, dtype='string')   # typed even when there is no error
+        writer.write(chunk)
+        return len(chunk)
+
+    with Pool(workers, initializer=_init_worker, initargs=(scaler_path, model_path, linear_model_path)) as pool:
+        # a bounded number of chunks in flight, Pool.imap would read the whole file ahead
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append((chunk, pool.apply_async(_score_in_worker, (chunk,))))
+                if len(pending) >= 2 * workers:
+                    done_chunk, result = pending.popleft()
+                    rows += write(done_chunk, result.get())
+            while pending:
+                done_chunk, result = pending.popleft()
+                rows += write(done_chunk, result.get())
+        finally:
+            writer.close()
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='CSV, NDJSON or Parquet file')
+    parser.add_argument('--output', default=None, help='.parquet (default) or .arrow / .feather file')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-rows', type=int, default=bulk.CHUNK_ROWS)
+    parser.add_argument('--scaler', default=DEFAULT_SCALER_PATH)
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--linear-model', default=None,
+                        help='coefficient table exported by scorer.py, used instead of the sklearn artifacts')
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.input)[0] + '_scored.parquet'
+
+    start = time.perf_counter()
+    rows = score_file(args.input, output, args.workers, args.chunk_rows,
+                      args.scaler, args.model, args.linear_model)
+    elapsed = time.perf_counter() - start
+
+    print(f'{rows} rows scored into {output} in {elapsed:.2f}s')
+    print(f'{rows / elapsed:,.0f} rows/s with {args.workers} workers, '
+          f'{rows / elapsed / args.workers:,.0f} rows/s per core')
+
+
+if __name__ == '__main__':
+    main()
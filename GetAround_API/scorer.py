@@ -0,0 +1,196 @@
+"""Pure NumPy scorer for the linear (Ridge) price model.
+
+The notebook pipeline is: median imputer + StandardScaler on mileage / engine_power,
+OneHotEncoder(drop='first') on the categorical columns, then a Ridge regressor.
+For a linear model the whole thing folds into
+    price = intercept' + sum(numeric * weight / scale) + sum(weight of each category)
+so once exported, scoring a car is a dot product plus a few dictionary lookups.
+
+Export the coefficient table from the sklearn artifacts:
+
+    python scorer.py --scaler scaler_v3.joblib --model model.pkl --out linear_model.json
+"""
+import argparse
+import json
+
+import numpy as np
+
+from encoder import FeatureEncoder, reference_records
+
+
+FORMAT = 'getaround-linear-v1'
+
+
+def _plain(value):
+    # numpy scalars -> python values, so the categories go to json unchanged
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class LinearScorer:
+
+    def __init__(self, intercept, numeric_columns, numeric_weights, numeric_medians, categorical,
+                 source_version=None):
+        self.intercept = float(intercept)
+        self.numeric_columns = list(numeric_columns)
+        self.numeric_weights = np.asarray(numeric_weights, dtype=np.float64)
+        self.numeric_medians = np.asarray(numeric_medians, dtype=np.float64)
+        self.categorical = [(column, dict(weights)) for column, weights in categorical]
+        self.source_version = source_version
+
+    @classmethod
+    def from_sklearn(cls, preprocessor, model, source_version=None):
+        """Fold the fitted scaler and the linear model, raise TypeError if they are not foldable."""
+
+        encoder = FeatureEncoder.from_column_transformer(preprocessor)
+
+        estimator = getattr(model, 'best_estimator_', model)    # GridSearchCV -> Ridge
+        coef = getattr(estimator, 'coef_', None)
+        if coef is None or np.ndim(coef) > 2 or (np.ndim(coef) == 2 and np.shape(coef)[0] != 1):
+            raise TypeError(f'{type(estimator).__name__} is not a single-output linear model')
+        coef = np.ravel(coef).astype(np.float64)
+        if coef.shape[0] != encoder.n_features_out:
+            raise TypeError('the model and the scaler do not have the same number of features')
+
+        intercept = float(np.ravel(estimator.intercept_)[0])
+        numeric_columns, numeric_weights, numeric_medians = [], [], []
+        categorical = []
+
+        for block in encoder.blocks:
+            if block[0] == 'num':
+                _, columns, medians, means, scales, offset = block
+                weights = coef[offset:offset + len(columns)]
+                if scales is not None:
+                    weights = weights / scales
+                if means is not None:
+                    intercept -= float(np.dot(weights, means))
+                numeric_columns.extend(columns)
+                numeric_weights.extend(weights)
+                numeric_medians.extend(medians)
+            else:
+                _, column, lookup = block
+                weights = {category: (0.0 if position is None else float(coef[position]))
+                           for category, position in lookup.items()}
+                categorical.append((column, weights))
+
+        return cls(intercept, numeric_columns, numeric_weights, numeric_medians, categorical,
+                   source_version=source_version)
+
+    # ----- scoring -----
+
+    def _weights_of(self, column, weights, values):
+        try:
+            return np.fromiter((weights[int(v) if isinstance(v, (bool, np.bool_)) else v] for v in values),
+                               dtype=np.float64, count=len(values))
+        except (KeyError, TypeError):
+            unknown = sorted({str(v) for v in values if v not in weights})
+            raise ValueError(f"Found unknown categories {unknown} in column '{column}' during transform")
+
+    def _numeric(self, values):
+        missing = np.isnan(values)
+        if missing.any():
+            values = np.where(missing, self.numeric_medians, values)
+        return values @ self.numeric_weights + self.intercept
+
+    def score(self, records):
+        """Prices of a list of cars (CarFeatures objects or dicts)."""
+
+        records = [r if isinstance(r, dict) else dict(r) for r in records]
+        n = len(records)
+        numeric = np.array([[r[col] for col in self.numeric_columns] for r in records], dtype=np.float64)
+        y = self._numeric(numeric.reshape(n, len(self.numeric_columns)))
+        for column, weights in self.categorical:
+            y += self._weights_of(column, weights, [r[column] for r in records])
+        return y
+
+    def score_frame(self, df):
+        """Prices of the rows of a dataframe having the scaler columns."""
+
+        y = self._numeric(df[self.numeric_columns].to_numpy(dtype=np.float64))
+        for column, weights in self.categorical:
+            y += self._weights_of(column, weights, df[column].tolist())
+        return y
+
+    # ----- coefficient table -----
+
+    def to_dict(self):
+        return {"format": FORMAT,
+                "source_version": self.source_version,
+                "intercept": self.intercept,
+                "numeric": {"columns": self.numeric_columns,
+                            "weights": self.numeric_weights.tolist(),
+                            "medians": self.numeric_medians.tolist()},
+                "categorical": [{"column": column,
+                                 "categories": [_plain(c) for c in weights],
+                                 "weights": list(weights.values())}
+                                for column, weights in self.categorical]}
+
+    @classmethod
+    def from_dict(cls, table):
+        if table.get('format') != FORMAT:
+            raise ValueError(f"not a {FORMAT} coefficient table")
+        numeric = table['numeric']
+        categorical = [(block['column'], zip(block['categories'], block['weights']))
+                       for block in table['categorical']]
+        return cls(table['intercept'], numeric['columns'], numeric['weights'], numeric['medians'],
+                   categorical, source_version=table.get('source_version'))
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def max_difference(scorer, preprocessor, model, records):
+    """Largest absolute difference with the sklearn predictions on the given cars."""
+
+    from features import records_to_frame
+
+    expected = model.predict(preprocessor.transform(records_to_frame(records)))
+    return float(np.max(np.abs(scorer.score(records) - expected)))
+
+
+def build_scorer(preprocessor, model, source_version=None, tolerance=1e-9):
+    """Compile the scorer and check it against sklearn, None if not possible or not close enough."""
+
+    try:
+        scorer = LinearScorer.from_sklearn(preprocessor, model, source_version)
+    except (TypeError, AttributeError):
+        return None
+
+    records = reference_records(FeatureEncoder.from_column_transformer(preprocessor))
+    if max_difference(scorer, preprocessor, model, records) > tolerance:
+        return None
+
+    return scorer
+
+
+def main():
+    from registry import DEFAULT_SCALER_PATH, DEFAULT_MODEL_PATH, artifacts_version, load_bundle
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scaler', default=DEFAULT_SCALER_PATH)
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--out', default='linear_model.json')
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    args = parser.parse_args()
+
+    bundle = load_bundle(args.scaler, args.model, linear_model_path=None)
+    # tied to both files: a new scaler or a new model.pkl makes the table stale
+    scorer = LinearScorer.from_sklearn(bundle.scaler, bundle.model,
+                                       source_version=artifacts_version(args.scaler, args.model))
+
+    records = reference_records(FeatureEncoder.from_column_transformer(bundle.scaler))
+    difference = max_difference(scorer, bundle.scaler, bundle.model, records)
+    if difference > args.tolerance:
+        raise SystemExit(f'the exported scorer differs from sklearn by {difference:.3g} (> {args.tolerance:g})')
+
+    scorer.save(args.out)
+    print(f'{args.out} written ({bundle.version}), max difference with sklearn {difference:.3g}')
+
+
+if __name__ == '__main__':
+    main()
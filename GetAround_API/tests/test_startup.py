@@ -0,0 +1,32 @@
+"""A worker starting from the exported coefficient table imports nothing inference does not need.
+
+The check of benchmarks/bench_startup.py, in a fresh interpreter: `import app` and a first
+prediction, then none of FORBIDDEN_MODULES (sklearn.metrics, matplotlib) may be in sys.modules.
+
+    python -m pytest GetAround_API/tests
+"""
+import os
+import sys
+
+import pytest
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+if BENCHMARKS_DIR not in sys.path:
+    sys.path.insert(0, BENCHMARKS_DIR)
+
+from bench_startup import FORBIDDEN_MODULES, export_linear_model, run_once
+
+
+def test_slim_start_does_not_import_forbidden_modules(tmp_path):
+    # the export unpickles the sklearn artifacts, the child imports the app
+    pytest.importorskip('sklearn')
+    pytest.importorskip('fastapi')
+
+    linear_model_path = str(tmp_path / 'linear_model.json')
+    if not export_linear_model(linear_model_path):
+        pytest.skip('the model cannot be folded into a coefficient table, there is no slim start')
+
+    result = run_once({**os.environ, 'LINEAR_MODEL_PATH': linear_model_path})
+
+    assert result['slim_start']
+    assert result['forbidden'] == [], f"imported by `import app`: {result['forbidden']} (of {FORBIDDEN_MODULES})"
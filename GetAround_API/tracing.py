@@ -0,0 +1,245 @@
+import bisect
+import contextvars
+import os
+import random
+import threading
+import time
+
+
+# Where the time of a prediction request goes, per stage:
+#   validation : from the request received to the endpoint called (body read + pydantic)
+#   encode     : the cars -> feature matrix (the scaler folded in, for the compiled encoder)
+#   transform  : scaler.transform, only on the pandas path (it is folded in the other paths)
+#   predict    : model.predict, or the whole one-pass linear scorer
+#   serialize  : from the endpoint returned to the response sent (json encoding + send)
+#   total      : the whole request
+# The timings are aggregated in fixed-bucket histograms, served by /metrics.
+#
+# Only a sample of the requests is traced: TRACE_SAMPLE_RATE between 0 (tracing off) and 1 (all).
+# The stages are timed only inside a traced request, a micro-batch is timed when one of its
+# cars comes from a traced request, and its stages go to the trace of each of those requests.
+
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0.1'))
+TRACED_PATHS = ('/predict', '/predict/batch')
+
+STAGES = ('validation', 'encode', 'transform', 'predict', 'serialize', 'total')
+
+# the finished traces are added to the histograms by groups of this many (and on /metrics),
+# so a traced request only reads the clock and appends its trace to a list
+FOLD_EVERY = 1024
+
+# upper bounds of the buckets in seconds, from 50 microseconds to 10 seconds
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Counts of the observed durations per bucket, plus their number and sum."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)    # the last one is above the last bound
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def observe_all(self, values):
+        # sorted, the count of each bucket is the difference of two bisections of the values
+        values = sorted(values)
+        below = 0
+        for i, bound in enumerate(self.buckets):
+            upto = bisect.bisect_right(values, bound)
+            self.counts[i] += upto - below
+            below = upto
+        self.counts[-1] += len(values) - below
+        self.count += len(values)
+        self.sum += sum(values)
+
+    def quantile(self, q):
+        # the upper bound of the bucket holding the q-th observation
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 3)
+
+        cumulative, seen = {}, 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            cumulative['+Inf' if bound == float('inf') else f'{bound * 1000:g}ms'] = seen
+
+        return {"count": self.count,
+                "mean_ms": ms(self.sum / self.count) if self.count else None,
+                "p50_ms": ms(self.quantile(0.50)),
+                "p90_ms": ms(self.quantile(0.90)),
+                "p99_ms": ms(self.quantile(0.99)),
+                "buckets": cumulative}
+
+
+class Trace:
+    """The clock readings of one request, and the stages timed inside the endpoint.
+
+    validation, serialize and total are computed from the readings when the trace is folded
+    into the histograms, not while the request is served.
+    """
+
+    __slots__ = ('started', 'handler_started', 'handler_done', 'finished', 'stages')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.handler_started = None
+        self.handler_done = None
+        self.finished = None
+        self.stages = {}
+
+    def add(self, timings):
+        for stage, seconds in timings.items():
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+class TraceGroup:
+    """The traces of the requests predicted together (a micro-batch), each gets the stages."""
+
+    __slots__ = ('traces',)
+
+    def __init__(self, traces):
+        self.traces = traces
+
+    def add(self, timings):
+        for trace in self.traces:
+            trace.add(timings)
+
+
+def group_traces(traces):
+    """What to set as current_trace for a call made on behalf of these requests (None: not traced)."""
+
+    traces = [trace for trace in traces if trace is not None]
+    if not traces:
+        return None
+    return traces[0] if len(traces) == 1 else TraceGroup(traces)
+
+
+# the trace of the request being handled, None when it is not sampled
+current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class Tracer:
+    """The latency histograms of each stage, shared by the requests of the worker."""
+
+    def __init__(self, sample_rate=TRACE_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.histograms = {stage: Histogram() for stage in STAGES}
+        self.traced = 0
+        self._pending = []     # the traces finished since the last fold
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    def sampled(self):
+        return self.sample_rate >= 1 or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def finish(self, trace):
+        # no lock and no bucket search on the request path, the fold does it for many traces
+        self._pending.append(trace)
+        if len(self._pending) >= FOLD_EVERY:
+            self.fold()
+
+    def fold(self):
+        """Add the finished traces to the histograms."""
+
+        with self._lock:
+            pending, self._pending = self._pending, []
+            values = {'validation': [t.handler_started - t.started for t in pending if t.handler_started is not None],
+                      'serialize': [t.finished - t.handler_done for t in pending if t.handler_done is not None],
+                      'total': [t.finished - t.started for t in pending]}
+            for stage in ('encode', 'transform', 'predict'):
+                values[stage] = [t.stages[stage] for t in pending if stage in t.stages]
+            for stage, seconds in values.items():
+                if seconds:
+                    self.histograms[stage].observe_all(seconds)
+            self.traced += len(pending)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {stage: Histogram() for stage in STAGES}
+            self.traced = 0
+            self._pending = []
+
+    def stats(self):
+        self.fold()
+        with self._lock:
+            return {"sample_rate": self.sample_rate,
+                    "traced_requests": self.traced,
+                    "stages": {stage: histogram.snapshot() for stage, histogram in self.histograms.items()}}
+
+
+tracer = Tracer()
+
+
+def handler_started():
+    """Called first thing by a traced endpoint: the request is read and validated."""
+
+    trace = current_trace.get()
+    if trace is not None:
+        trace.handler_started = time.perf_counter()
+
+
+def handler_done():
+    """Called by a traced endpoint right before returning its response."""
+
+    trace = current_trace.get()
+    if trace is not None:
+        trace.handler_done = time.perf_counter()
+
+
+def collect_timings():
+    """A dict for predict_records to fill in, when the stages of this call should be timed."""
+
+    return {} if current_trace.get() is not None else None
+
+
+def record_timings(timings):
+    # into the trace of the request (or of each request of the micro-batch)
+    if not timings:
+        return
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(timings)
+
+
+class TracingMiddleware:
+    """ASGI middleware: samples the prediction requests and times validation, serialize and total."""
+
+    def __init__(self, app, tracer=tracer, paths=TRACED_PATHS):
+        self.app = app
+        self.tracer = tracer
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths or not self.tracer.sampled():
+            await self.app(scope, receive, send)
+            return
+
+        # send is not wrapped: the response is sent when the app returns
+        trace = Trace()
+        token = current_trace.set(trace)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            trace.finished = time.perf_counter()
+            current_trace.reset(token)
+            self.tracer.finish(trace)
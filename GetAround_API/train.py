@@ -0,0 +1,324 @@
+"""Train the price model like Getaround_ML.ipynb, from the command line.
+
+The notebook flow: read get_around_pricing_project.csv, keep the common brands, 0/1 booleans,
+split 80/20 (random_state=0), fit the ColumnTransformer on the train set, then three
+GridSearchCV (cv=3): RandomForest, GradientBoosting and Ridge, and save the scaler and the
+Ridge search. Here:
+  - the preprocessing is fitted once and cached on disk (joblib.Memory), so are the searches:
+    re-running with the same data and grids only reloads them
+  - the searches use all the cores (n_jobs=-1)
+  - with --ridge-path the Ridge alphas are scored from one SVD per fold (see ridge_path.py)
+    instead of one refit each, so a dense grid (--ridge-alphas 200) costs about one fit
+  - the artifacts are written to artifacts/<version>/ (scaler.joblib, model.pkl, the
+    linear_model.json of scorer.py when the model is linear, and a manifest.json)
+
+    python train.py --data get_around_pricing_project.csv
+    python train.py --data get_around_pricing_project.csv --compare-notebook   # wall-clock vs the notebook
+    python train.py --data get_around_pricing_project.csv --ridge-path --ridge-alphas 200
+
+The API serves a version with the paths of its folder (SCALER_PATH, MODEL_PATH and
+LINEAR_MODEL_PATH, or POST /model/reload).
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+from features import normalize_pricing_frame
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.environ.get('PRICING_DATA_PATH', os.path.join(BASE_DIR, 'get_around_pricing_project.csv'))
+ARTIFACTS_DIR = os.environ.get('ARTIFACTS_DIR', os.path.join(BASE_DIR, 'artifacts'))
+CACHE_DIR = os.environ.get('TRAIN_CACHE_DIR', os.path.join(BASE_DIR, '.train_cache'))
+
+TARGET = 'rental_price_per_day'
+NUMERIC_FEATURES = ['mileage', 'engine_power']
+CATEGORICAL_FEATURES = ['name', 'fuel', 'paint_color', 'car_type',
+                        'private_parking_available', 'has_gps', 'has_air_conditioning', 'automatic_car',
+                        'has_getaround_connect', 'has_speed_regulator', 'winter_tires']
+
+TEST_SIZE = 0.2
+RANDOM_STATE = 0
+CV = 3
+
+# the grids of the notebook
+SEARCHES = {
+    'random_forest': {'max_depth': [3, 8, 10], 'min_samples_split': [2, 4, 8], 'n_estimators': [20]},
+    'gradient_boosting': {'n_estimators': [100, 250], 'learning_rate': [0.05, 0.1], 'max_depth': [4, 8],
+                          'subsample': [0.8]},
+    'ridge': {'alpha': [0.0, 0.1, 0.5, 1.0, 1.5, 2]},
+}
+
+# the one the API serves, the scorer folds it into numpy
+DEFAULT_MODEL = 'ridge'
+
+
+def ridge_grid(n=0):
+    """The alphas of the notebook, plus `n` of them spread from 1e-3 to 1e3."""
+
+    import numpy as np
+    return sorted(set(SEARCHES['ridge']['alpha']) | set(np.logspace(-3, 3, n).tolist()))
+
+
+def make_estimator(name):
+    from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+    from sklearn.linear_model import Ridge
+
+    if name == 'random_forest':
+        return RandomForestRegressor(random_state=RANDOM_STATE)
+    if name == 'gradient_boosting':
+        return GradientBoostingRegressor(random_state=RANDOM_STATE)
+    if name == 'ridge':
+        return Ridge()
+    raise ValueError(f'unknown model {name!r}')
+
+
+def make_preprocessor():
+    """The ColumnTransformer of the notebook (saved as scaler_v3.joblib)."""
+
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    numeric_transformer = Pipeline(steps=[('imputer', SimpleImputer(strategy='median')),
+                                          ('scaler', StandardScaler())])
+    return ColumnTransformer(transformers=[('num', numeric_transformer, NUMERIC_FEATURES),
+                                           ('cat', OneHotEncoder(drop='first'), CATEGORICAL_FEATURES)])
+
+
+def file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def load_dataset(path=DATA_PATH):
+    """The features (the notebook preparation, see features.py) and the prices."""
+
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    return normalize_pricing_frame(df), df[TARGET]
+
+
+def split(X, y):
+    from sklearn.model_selection import train_test_split
+    return train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+
+
+#################################################################################################
+##########                              THE STEPS                                       #########
+#################################################################################################
+
+# The cached steps get everything they depend on as arguments (the unfitted preprocessor, the
+# estimator and its grid), joblib.Memory only hashes the arguments and the source of the function:
+# a grid or an estimator parameter changed in this file is then a new cache entry, not a stale one.
+
+def fit_preprocessor(preprocessor, X_train, X_test):
+    """The fitted preprocessor and both sets encoded, done once for all the candidates."""
+
+    from sklearn.base import clone
+
+    preprocessor = clone(preprocessor)
+    return preprocessor, preprocessor.fit_transform(X_train), preprocessor.transform(X_test)
+
+
+def run_search(estimator, param_grid, X_train, y_train, n_jobs=-1, cv=CV):
+    """The fitted GridSearchCV of one estimator over `param_grid`."""
+
+    from sklearn.model_selection import GridSearchCV
+
+    search = GridSearchCV(estimator, param_grid=param_grid, cv=cv, n_jobs=n_jobs)
+    search.fit(X_train, y_train)
+    return search
+
+
+def run_ridge_path(alphas, X_train, y_train, cv=CV):
+    """The RidgePathCV of `alphas`, in place of the Ridge GridSearchCV (same attributes)."""
+
+    from ridge_path import RidgePathCV
+    return RidgePathCV(alphas, cv=cv).fit(X_train, y_train)
+
+
+def summary(search, X_train, y_train, X_test, y_test):
+    return {"best_params": search.best_params_,
+            "cv_r2": float(search.best_score_),
+            "train_r2": float(search.score(X_train, y_train)),
+            "test_r2": float(search.score(X_test, y_test))}
+
+
+def train(X, y, models=tuple(SEARCHES), n_jobs=-1, cache_dir=CACHE_DIR, ridge_alphas=None):
+    """Preprocess once, run the searches, returns (preprocessor, {name: search}, report)."""
+
+    import joblib
+
+    memory = joblib.Memory(cache_dir, verbose=0) if cache_dir else None
+    cached = (lambda fn, **kw: memory.cache(fn, **kw)) if memory else (lambda fn, **kw: fn)
+
+    X_train, X_test, y_train, y_test = split(X, y)
+    timings = {}
+
+    start = time.perf_counter()
+    preprocessor, E_train, E_test = cached(fit_preprocessor)(make_preprocessor(), X_train, X_test)
+    timings['preprocess'] = time.perf_counter() - start
+
+    searches, results = {}, {}
+    for name in models:
+        start = time.perf_counter()
+        if name == 'ridge' and ridge_alphas is not None:
+            searches[name] = cached(run_ridge_path)(ridge_alphas, E_train, y_train, CV)
+        else:
+            searches[name] = cached(run_search, ignore=['n_jobs'])(make_estimator(name), SEARCHES[name],
+                                                                   E_train, y_train, n_jobs, CV)
+        timings[name] = time.perf_counter() - start
+        results[name] = {**summary(searches[name], E_train, y_train, E_test, y_test),
+                         "seconds": timings[name]}
+
+    report = {"rows": int(len(X)), "train_rows": int(len(X_train)), "test_rows": int(len(X_test)),
+              "features_out": int(E_train.shape[1]), "timings": timings, "searches": results}
+    return preprocessor, searches, report
+
+
+def notebook_flow(X, y):
+    """The notebook cells as they were: fit_transform by hand, three searches on one core, no cache."""
+
+    from sklearn.model_selection import GridSearchCV
+
+    start = time.perf_counter()
+    X_train, X_test, y_train, y_test = split(X, y)
+    preprocessor = make_preprocessor()
+    X_train = preprocessor.fit_transform(X_train)
+    X_test = preprocessor.transform(X_test)
+    results = {}
+    for name in SEARCHES:
+        search = GridSearchCV(make_estimator(name), param_grid=SEARCHES[name], cv=CV)
+        search.fit(X_train, y_train)
+        results[name] = summary(search, X_train, y_train, X_test, y_test)
+    return time.perf_counter() - start, results
+
+
+#################################################################################################
+##########                              THE ARTIFACTS                                   #########
+#################################################################################################
+
+def write_artifacts(preprocessor, search, version, manifest, out_dir=ARTIFACTS_DIR):
+    """artifacts/<version>/: scaler.joblib, model.pkl, linear_model.json (if linear), manifest.json."""
+
+    import joblib
+    from registry import artifacts_version, model_file_version
+    from scorer import build_scorer
+
+    directory = os.path.join(out_dir, version)
+    os.makedirs(directory, exist_ok=True)
+    scaler_path = os.path.join(directory, 'scaler.joblib')
+    model_path = os.path.join(directory, 'model.pkl')
+    linear_model_path = os.path.join(directory, 'linear_model.json')
+
+    joblib.dump(preprocessor, scaler_path)
+    # the whole search, like the notebook pickled it (the API takes its best_estimator_)
+    with open(model_path, 'wb') as f:
+        pickle.dump(search, f)
+
+    # the coefficient table the workers start from, tied to this very scaler and model.pkl
+    scorer = build_scorer(preprocessor, search, source_version=artifacts_version(scaler_path, model_path))
+    if scorer is not None:
+        scorer.save(linear_model_path)
+
+    manifest = {**manifest,
+                "version": version,
+                "scaler": os.path.basename(scaler_path),
+                "model": os.path.basename(model_path),
+                "linear_model": os.path.basename(linear_model_path) if scorer is not None else None,
+                "model_file_version": model_file_version(model_path)}
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return directory, manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=DATA_PATH, help='the local get_around_pricing_project.csv')
+    parser.add_argument('--models', nargs='+', choices=sorted(SEARCHES), default=list(SEARCHES))
+    parser.add_argument('--select', default=DEFAULT_MODEL,
+                        help="the model saved: one of the searched models, or 'best' (best cv R2)")
+    parser.add_argument('--jobs', type=int, default=-1, help='n_jobs of the searches, -1 = all the cores')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help="joblib cache, '' to disable")
+    parser.add_argument('--out-dir', default=ARTIFACTS_DIR)
+    parser.add_argument('--version', default=None, help='default: <date>-<hash of the data>')
+    parser.add_argument('--ridge-path', action='store_true', help='score the Ridge alphas from one SVD per fold')
+    parser.add_argument('--ridge-alphas', type=int, default=0,
+                        help='with --ridge-path, add this many alphas (1e-3..1e3) to the notebook grid')
+    parser.add_argument('--compare-notebook', action='store_true',
+                        help='also time the notebook flow, and this one with a cold then a warm cache')
+    args = parser.parse_args()
+
+    import sklearn
+
+    ridge_alphas = ridge_grid(args.ridge_alphas) if args.ridge_path else None
+    data_hash = file_hash(args.data)
+    X, y = load_dataset(args.data)
+
+    if args.compare_notebook:
+        notebook_s, notebook_results = notebook_flow(X, y)
+        scratch = tempfile.mkdtemp(prefix='train-cache-')
+        try:
+            start = time.perf_counter()
+            train(X, y, args.models, args.jobs, scratch, ridge_alphas)
+            cold_s = time.perf_counter() - start
+            start = time.perf_counter()
+            train(X, y, args.models, args.jobs, scratch, ridge_alphas)
+            warm_s = time.perf_counter() - start
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        print(f"{'notebook flow':<28} {notebook_s:>9.2f}s")
+        print(f"{'train.py, cold cache':<28} {cold_s:>9.2f}s   x{notebook_s / cold_s:.1f}")
+        print(f"{'train.py, warm cache':<28} {warm_s:>9.2f}s   x{notebook_s / warm_s:.1f}")
+
+    start = time.perf_counter()
+    preprocessor, searches, report = train(X, y, args.models, args.jobs, args.cache_dir or None,
+                                         ridge_alphas)
+    wall_clock = time.perf_counter() - start
+
+    for name, result in report['searches'].items():
+        print(f"{name:<18} cv R2 {result['cv_r2']:.4f}  test R2 {result['test_r2']:.4f}  "
+              f"{result['seconds']:.2f}s  {result['best_params']}")
+
+    if args.select == 'best':
+        selected = max(report['searches'], key=lambda name: report['searches'][name]['cv_r2'])
+    elif args.select in searches:
+        selected = args.select
+    else:
+        raise SystemExit(f"--select {args.select!r} was not searched (--models {' '.join(args.models)})")
+
+    version = args.version or f"{time.strftime('%Y%m%d-%H%M%S')}-{data_hash[:8]}"
+    manifest = {"created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                "data": {"path": os.path.abspath(args.data), "sha256": data_hash},
+                "sklearn": sklearn.__version__,
+                "selected": selected,
+                "split": {"test_size": TEST_SIZE, "random_state": RANDOM_STATE},
+                "cv": CV,
+                "ridge_alphas": ridge_alphas,
+                "wall_clock_s": wall_clock,
+                **report}
+    if args.compare_notebook:
+        manifest["notebook"] = {"wall_clock_s": notebook_s, "cold_cache_s": cold_s, "warm_cache_s": warm_s,
+                                "searches": notebook_results}
+
+    directory, manifest = write_artifacts(preprocessor, searches[selected], version, manifest, args.out_dir)
+    print(f"\n{selected} saved to {directory} ({manifest['model_file_version']}), trained in {wall_clock:.2f}s")
+    print(f"serve it with SCALER_PATH={os.path.join(directory, manifest['scaler'])} "
+          f"MODEL_PATH={os.path.join(directory, manifest['model'])}"
+          + (f" LINEAR_MODEL_PATH={os.path.join(directory, manifest['linear_model'])}"
+             if manifest['linear_model'] else ''))
+
+
+if __name__ == '__main__':
+    main()
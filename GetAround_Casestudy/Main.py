@@ -1,7 +1,11 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
+
+import time
+
+from cube import ALL_CHECKIN_TYPES
+from store import load_store
+from pipeline import DELAY, DELTA, RunLog, run_stage, load, clean, link, classify_rentals, sweep
 
 
 # STAGES OF WORK
@@ -63,29 +67,21 @@ st.markdown('First we will start with General Statistics to view the delay and d
 
 ######   FUNCTION TO LOAD THE DATA  #############################
 
-@st.cache_data          # st.cache is depricated use st.cache_data instead this is useful to prevent 
-                        # re-executing loading the data each time, consequently it is cached
-                        # it will only re-execute the loading if an input parameter of the function changed :)
-                        # Note : in case of database connections and ML models like in the second project
-                        # we will use the instruction st.cache_resource instead
-def load_data():
-   
-   data_load_state = st.text('Loading data...')
-   df = pd.read_excel("https://full-stack-assets.s3.eu-west-3.amazonaws.com/Deployment/get_around_delay_analysis.xlsx")
-   data_load_state.text('Data loaded successfully..')
+# load_store (see store.py) is cached with st.cache_resource: ONE compact copy of the data for the
+# whole process, shared by every viewer and every page
 
-   return df 
+# the analysis is split in stages (see pipeline.py): load -> clean -> link -> classify -> sweep,
+# each one is memoized on its inputs, the run log shows which ones ran on this rerun
+run_log = RunLog()
 
 progress_bar.progress(0, text='Downloading the data')
-df = load_data()  # Load the data
-count_1_total = df.shape[0] # saving the number of total records for executive summary
+loaded = run_stage(run_log, 'load', load, load_store())  # a view of the shared data, nothing is copied
+df = loaded.df
+count_1_total = loaded.count_1_total # saving the number of total records for executive summary
 progress_bar.progress(5 , text='Generating General Analysis')
 
-# we will use the technique of maintaining the data frame in the session state
-# to be used by other pages when browsing, instead of downloading the data from the file each time
-
-if 'my_data' not in st.session_state:
-    st.session_state['my_data'] = df
+# the data frame is NOT kept in the session state anymore, that was a copy per viewer
+# for the whole life of the session. Each run takes a view of the shared store instead
     
 
 
@@ -104,24 +100,21 @@ st.header('A) General Overview & Statistics')
 st.subheader('1. How is the delay distribution?')
 
 # We shall start with general analysis
-# we filter the delays greater than 0
-mask = df['delay_at_checkout_in_minutes'] >= 0
-df_general = df.loc[mask,:].copy()
-count_2_exclude_negative_delay = df_general.shape[0]
+# we filter the delays greater than 0 (the clean stage)
+# the histograms are binned once there (see binning.py), only the bars are sent to the browser
+# BINNING: we chose the bining width equals to 5 meaning 5 minutes, from 0 to 200 minutes
+general = run_stage(run_log, 'clean', clean, loaded)
+df_general = general.df_general
+count_2_exclude_negative_delay = general.count_2_exclude_negative_delay
+bins_general = general.bins
 
 # Layout and organizing the outputs
 # use the tabs to illustrate numbers and percentage
 tab_numbers, tab_percentages = st.tabs(["Numbers", "Percentages"])
 
 with tab_numbers:
-   # plotly figure of type histogram
-   fig = px.histogram(df_general, x="delay_at_checkout_in_minutes", range_x = [0,200])
-   # BINNING: we chose the bining width equals to 5 meaning 5 minutes
-   fig.update_traces(xbins=dict( # bins used for histogram
-            start=0.0,
-            end=200.0,
-            size=5      # binning width
-        ))
+   # plotly bar chart of the pre-binned histogram
+   fig = bins_general.figure(DELAY)
    st.plotly_chart(fig)
    
    # storing number of rows after filtering the positive delays
@@ -129,12 +122,7 @@ with tab_numbers:
 
 with tab_percentages:
 
-    fig = px.histogram(df_general, x="delay_at_checkout_in_minutes", range_x = [0,200],histnorm="percent")
-    fig.update_traces(xbins=dict( # bins used for histogram
-            start=0.0,
-            end=200.0,
-            size=5
-        ))
+    fig = bins_general.figure(DELAY, norm='percent')
     st.plotly_chart(fig)
     st.caption("Each bin 'bar'resembles 5 minutes ")
 
@@ -166,12 +154,7 @@ tab_numbers, tab_percentages = st.tabs(["Numbers", "percentage"])
 with tab_numbers:        
 
     # to display the check in type within the histogram we used the color = checkin_type
-    fig = px.histogram(df_general, x="delay_at_checkout_in_minutes", range_x = [0,200],  color='checkin_type')
-    fig.update_traces(xbins=dict( # bins used for histogram
-            start=0.0,
-            end=200.0,
-            size=5      # bins five minutes
-        ))
+    fig = bins_general.figure(DELAY, split=True)
     st.plotly_chart(fig)
 
     st.markdown("**OBSERVATION :** It can be noticed easily that the check_in type **'mobile'** plays a big role in \
@@ -181,12 +164,7 @@ with tab_numbers:
 
 with tab_percentages:
     # to display the check in type within the histogram we used the color = checkin_type
-    fig = px.histogram(df_general, x="delay_at_checkout_in_minutes", range_x = [0,200],  color='checkin_type', histnorm='percent')
-    fig.update_traces(xbins=dict( # bins used for histogram
-            start=0.0,
-            end=200.0,
-            size=5
-        ))
+    fig = bins_general.figure(DELAY, norm='percent', split=True)
     st.plotly_chart(fig)
     st.markdown(" **Important Note :**")
     st.markdown("Here, the percentages of each bin or 'bar'represent the percentage of the series \
@@ -208,12 +186,7 @@ st.markdown('The delta is the planned difference in time between the bookings ')
 
 # similar to the steps above except that here we display the delta instead of delay
 
-fig = px.histogram(df_general, x="time_delta_with_previous_rental_in_minutes", range_x = [0,200])
-fig.update_traces(xbins=dict( # bins used for histogram
-        start=0.0,
-        end=200.0,
-        size=5
-    ))
+fig = bins_general.figure(DELTA)
 st.plotly_chart(fig)
 
 st.markdown("- **Another observation** Notice how the delta is **distributed evenly** in an integer around \
@@ -239,21 +212,12 @@ st.divider()
 
 st.subheader("4. Let's overlap them")
 
-# to implement the overlap we use the add.trace technique in go figure plotly as follows:
-fig = go.Figure(layout_title_text="Histogram Delay vs. Delta distribution")
-fig.add_trace(go.Histogram(x=df_general['delay_at_checkout_in_minutes'],xbins=dict( # bins used for histogram
-        start=0.0,
-        end=200.0,
-        size=5
-    ), name='Check out Delay'))
-fig.add_trace(go.Histogram(x=df_general['time_delta_with_previous_rental_in_minutes'],xbins=dict( # bins used for histogram
-        start=0.0,
-        end=200.0,
-        size=5), name='Delta difference between bookings', marker =dict(color='red')))
+# to implement the overlap the bars of both columns are drawn on the same bins (overlay):
+fig = bins_general.overlay([DELAY, DELTA], ['Check out Delay', 'Delta difference between bookings'],
+                           colors=[None, 'red'], layout_title_text="Histogram Delay vs. Delta distribution")
 
 # Overlay both histograms
-fig.update_layout(barmode='overlay',xaxis_title='Duration (minutes)', yaxis_title='Counts')
-fig.update_xaxes(range=[0, 200])
+fig.update_layout(xaxis_title='Duration (minutes)', yaxis_title='Counts')
 
 # Reduce opacity to see both histograms
 fig.update_traces(opacity=0.75)
@@ -266,32 +230,14 @@ st.divider()
 
 st.subheader("5. Commulative")
 
-# overlap chart using add_trace and go.figure as below 
-# IMPORTANT !! OF COURSE THE histnorm = percent to obtain percentage and valid comaprison
-fig = go.Figure(layout_title_text="Histogram Delay vs. Delta distribution")
-fig.add_trace(go.Histogram(x=df_general['delay_at_checkout_in_minutes'],
-                           xbins=dict( # bins used for histogram
-                                    start=0.0,
-                                    end=200.0,
-                                    size=5
-                                ), 
-    name='Check out Delay', 
-    cumulative_enabled=True,   # cummulative enabled
-    histnorm = "percent"))     # histnorm = percent to obtain percentage of samples 
-
-fig.add_trace(go.Histogram(x=df_general['time_delta_with_previous_rental_in_minutes'],
-                           xbins=dict( # bins used for histogram
-                               start=0.0,
-                               end=200.0,
-                               size=5
-                               ),
-    name='Delta difference between bookings',
-    cumulative_enabled=True,
-    histnorm ="percent"))
+# overlap chart of the pre-binned bars as below
+# IMPORTANT !! OF COURSE THE norm = percent to obtain percentage and valid comaprison
+fig = bins_general.overlay([DELAY, DELTA], ['Check out Delay', 'Delta difference between bookings'],
+                           norm='percent', cumulative=True,
+                           layout_title_text="Histogram Delay vs. Delta distribution")
 
 # Overlay both histograms
-fig.update_layout(barmode='overlay',xaxis_title='Duration (minutes)', yaxis_title='Counts')
-fig.update_xaxes(range=[0, 200])
+fig.update_layout(xaxis_title='Duration (minutes)', yaxis_title='Counts')
 
 # Reduce opacity to see both histograms
 fig.update_traces(opacity=0.75)
@@ -333,85 +279,21 @@ progress_bar.progress(20, text='Re-Organizing the Dataframe')
 
 ######   B.1) RE-ORGANIZING THE DATASET ##################
 
-# this is a function to extract the delay of the previous request
+# extract the delay of the previous request
 # in order to compare it with the planned time difference between the two requests
+# the join is done in one go for all the rows (see joins.py) instead of searching
+# the whole dataframe for each row
+#
+# then the cases to consider in the analysis (the link stage):
+#(1) the missing values: the referenced ref_id that were not found, or if found their delay values were nan
+#(2) it is meaningless to have an empty delta or delay, the analysis is done on ds and not df
+#(3) the outliers: the delays above 1.5 times the median are excluded
 
-def get_delay_of_previous(ref_id):
-    
-    # first check if the ref_is is not empty i.e. 'Nan' 
-    if pd.notna(ref_id):
-        
-        # then filter the line which contains this ref_id value
-
-        mask = df['rental_id'] == ref_id
-
-        # take the column of that row which contains the delay value
-
-        previous_delay = df.loc[mask,'delay_at_checkout_in_minutes']     
-        
-
-        return previous_delay.values[0]  # the values command plays a role in extracting 
-                                         # the first value that we need, otherwise we get like a series object
-                                         # this is important and according to pandas
-    else :
-        # This means that the ref_id is empty
-        return 
-    
-# Execute the function for all rows using apply method and calling the "get_delay_of_previous" function
-# this is to obtain the delay related to that id and place it in one row to do our calculations
-
-df['delay_of_previous'] = df['previous_ended_rental_id'].apply(get_delay_of_previous)
-
-#################################################################################################
-###########                                                                            ##########
-###########     Missing values statistics                                              ##########
-#################################################################################################
-
-#(1) count the number of referenced ref_id that were not found, or if found their delay values were nan:
-
-mask = (df['previous_ended_rental_id'].notna()) & (df['delay_of_previous'].isna())
-count_missing_ref_id = df.loc[mask,:].shape[0]  # to be used in management summary
-
-
-#################################################################################################
-##########                                                                              #########
-########## THE cases to consider in the analysis                                        #########
-##########                                                                              #########
-#################################################################################################
-
-
-
-#(1) in order to implement our analysis correctly we need to extract the cases 
-# which contain real values and not empty ones Nan
-# note that the data to be considered are put in a copy named ds instead of df
-# to prevent confusion and bugs and modifying the original df because we need it
-
-# it is meaningless to have an empty delta or delay
-mask = (df['time_delta_with_previous_rental_in_minutes'].notna()) & (df['delay_of_previous'].notna())
-ds = df.loc[mask,:].copy()
-
-count_3_after_na_deltas_delay = ds.shape[0]   # to be used in management summary
-
-
-# exclude the outliers
-mask = df['delay_of_previous'] > 0  # exclude the negative
-df = df.loc[mask,:]
-
-median_delay = df['delay_of_previous'].median()
-outlier_delay = median_delay * 1.5 
-
-mask = ds['delay_of_previous'] < outlier_delay
-ds = ds.loc[mask,:]
-
-count_4_after_outliers_delay = df.shape[0]
-
-
-# median_delta = df['time_delta_with_previous_rental_in_minutes'].median()
-# outlier_delta = median_delta * 1.5 
-
-# mask = ds['time_delta_with_previous_rental_in_minutes'] < outlier_delta
-# ds = ds.loc[mask,:]
-count_5_after_outliers_delta = df.shape[0]
+linked = run_stage(run_log, 'link', link, loaded)
+count_missing_ref_id = linked.count_missing_ref_id  # to be used in management summary
+count_3_after_na_deltas_delay = linked.count_3_after_na_deltas_delay
+count_4_after_outliers_delay = linked.count_4_after_outliers_delay
+count_5_after_outliers_delta = linked.count_5_after_outliers_delta
 
 
 
@@ -421,70 +303,23 @@ count_5_after_outliers_delta = df.shape[0]
 ##########                                                                              #########
 #################################################################################################
 progress_bar.progress(57, text='Classifying')
-# classifications
+# classifications (see rules.py)
     # case (A) If There is no delay => "previous delay" is negative => delivered early
     # case (B) There is delay 
         # if delta > delay are considered non-problemetic
         # if delta < delay are considered problematic cases
     # the non problematic cases will lose money when the threshold is greater than delta otherwise no losses will occur
     # the problmeatic cases will become solved when the threshold exceeds the delay
+    # the rules are applied on the whole columns at once, not row by row with apply
 
-def classifier(row):
-    # check if the car was returned early case (A)
-
-    if row['delay_of_previous'] < 0:
-        return 'returned early'  
-    
-    # check if although late, compare with delta (B)
-    else:
-        if row['delta-delay'] >= 0:   # the delay was less than delta
-            return 'Non_Problematic'  # consequently non problematic
-        else:
-            return 'Problematic'  # this means delay bigger than delta => problem
-
-def do_preparations(proposed_threshold = 0):
-    # we will add in a column for the proposed margin delay
-    ds['proposed_threshold'] = proposed_threshold
-    ds['threshold-delay'] = ds['proposed_threshold'] - ds['delay_of_previous']
 
-    
-    # and status to indicate if the threshold solved the delay problem or not
+# the columns needed by the rules (threshold-delay, delta-delay, losses) are added by
+# pipeline.prepare, then the classification and the status (the classify stage)
+classified = run_stage(run_log, 'classify', classify_rentals, linked)
 
-    # How to classify if problematic or not
-    ds['delta-delay'] = ds['time_delta_with_previous_rental_in_minutes'] - ds['delay_of_previous']
-    
-    
-    # Losses calculation, 
-    # losses to calculate the miuntes of loss for the non-problmeatic cases
-    # The losses happen for the positive values only of the below equation, 
-    # the negative values will be discarded and filtered out  
-    ds['losses'] = ds['proposed_threshold'] - ds['time_delta_with_previous_rental_in_minutes']
-
-    return ds
-
-# finally the status column, whether solved or not
-def define_status(row):
-    if row['classification'] == 'Problematic':
-        if row['threshold-delay'] >= 0 :
-            return 'Solved'
-        else:
-            return 'UnSolved'
-    elif row['classification'] == 'returned early':
-            return ''
-    else:
-        if row['losses'] <= 0 :  # this means that the delta is greateer than the threshold
-            return 'Not affected'
-        else:
-            return 'Affected'   # because the threshold pushed the booking
-
-# initialize the dataframe for proposed threshold = 0
-ds = do_preparations(0)
-ds['classification'] = ds.apply(classifier, axis=1)
-ds['status'] = ds.apply(define_status, axis=1)  # the status column:
-
-count_6_problematic_cases =  ds['classification'].value_counts()['Problematic']
-count_7_non_problematic_cases = ds['classification'].value_counts()['Non_Problematic']
-count_8_returned_early_cases = ds['classification'].value_counts()['returned early']
+count_6_problematic_cases = classified.count_6_problematic_cases
+count_7_non_problematic_cases = classified.count_7_non_problematic_cases
+count_8_returned_early_cases = classified.count_8_returned_early_cases
 
 #################################################################################################
 ##########                                                                              #########
@@ -493,127 +328,20 @@ count_8_returned_early_cases = ds['classification'].value_counts()['returned ear
 #################################################################################################
 
 # this table will contain the results for all the proposed thresholds
-
-df_observer = pd.DataFrame(columns=['proposed_safety_margin',
-                                          'problematic_cases',
-                                          'non_problematic_cases',
-                                          'solved_cases',
-                                          'unsolved_cases',
-                                          'affected_cases',
-                                          'not_affected_cases',
-                                          'affected_minutes',
-                                          'problematic_cases_percent', 
-                                          'non_problematic_cases_percent',                                       
-                                          'solved_percent',
-                                          'un_solved_percent',
-                                          'affected_cases_percent',
-                                          'not_affected_cases_percent',
-                                          'checkin_type',
-                                          'total cases',
-                                          'verification'])
-
-
-
-# let's make a loop to measure on ground how many would be satisfied
+# to measure on ground how many would be satisfied
 # affected rentals and losses if any for various values of thresholds
-# each 5 minutes
-
-#@st.cache_data
-def create_observer_results():
-      
-   # create a list of proposed delays
-   p = 0
-   proposed_list = []
-   while p < 125:
-      proposed_list.append(p)
-      p +=5   
-
-   # Declarations
-   total_cases = ds.shape[0]
-   no_unique_cars = len(df['car_id'].unique())
-   
-
-   # Loop through the proposed delays and calculate the result for each case 'proposed delay'
-   for proposed_delay in proposed_list:    
-
-      # the column with the proposed threshold
-      ds['proposed_delay'] = proposed_delay   # set up the proposed delay
-
-      # update the results
-      do_preparations(proposed_delay)
-      ds['status'] = ds.apply(define_status, axis=1)
-
-      ## generate statistics
-      # problematic_cases 
-
-      mask = ds['classification'] == 'Problematic'
-      problematic_cases = ds.loc[mask,].shape[0]
-      
-      # non_problematic_cases
-      mask = ds['classification'] == 'Non_Problematic'
-      non_problematic_cases = ds.loc[mask,].shape[0]
-
-      # solved
-      mask = ds['status'] == 'Solved'
-      solved_cases = ds.loc[mask,].shape[0]       
-
-      # unsolved
-      mask = ds['status'] == 'UnSolved'
-      Un_solved_cases = ds.loc[mask,].shape[0]  
-
-
-      # total_loss
-      mask = ds['losses'] > 0
-      total_loss = ds.loc[mask,'losses'].sum()
-
-      # affected_cases
-      mask = ds['status'] == 'Affected'
-      affected_cases = ds.loc[mask].shape[0]
-      
-
-      # non affected_cases
-      mask = ds['status'] == 'Not affected'
-      not_affected_cases = ds.loc[mask].shape[0]
-      
-      # calculate percentages
-      problematic_cases_percent = problematic_cases / total_cases *100
-      non_problematic_cases_percent = non_problematic_cases / total_cases * 100
-      solved_percentage = solved_cases / problematic_cases * 100
-      Un_solved_percentage = Un_solved_cases / problematic_cases * 100
-      affected_cases_percent = affected_cases / non_problematic_cases * 100
-      not_affected_cases_percent = not_affected_cases / non_problematic_cases *100
-      
-      new_value = dict({'proposed_safety_margin': proposed_delay,
-                                          'problematic_cases': problematic_cases,
-                                          'non_problematic_cases': non_problematic_cases,
-                                          'solved_cases': solved_cases,
-                                          'unsolved_cases': Un_solved_cases,
-                                          'affected_cases':affected_cases,
-                                          'not_affected_cases':not_affected_cases,
-                                          'affected_minutes': total_loss,
-                                          'problematic_cases_percent':int(problematic_cases_percent), 
-                                          'non_problematic_cases_percent':int(non_problematic_cases_percent),                                       
-                                          'solved_percent':int(solved_percentage),
-                                          'un_solved_percent':int(Un_solved_percentage),
-                                          'affected_cases_percent':int(affected_cases_percent),
-                                          'not_affected_cases_percent':int(not_affected_cases_percent),
-                                          'checkin_type':0,
-                                          'total cases':total_cases,
-                                          'verification':0})                                                                                                                                        
-
-      last_row = df_observer.shape[0]
-      df_observer.loc[last_row + 1] = new_value
-   return df_observer
+# each 5 minutes (0 to 120)
+#
+# the delays and deltas are sorted once, then each threshold is only a binary search
+# and a prefix sum (see sweep.py), no re-classification of ds for each threshold
 
 progress_bar.progress(73, text='Creating the observer')
-df_observer = create_observer_results()
+# the sweep stage also builds the minute by minute table and the cube of the lab
+swept = run_stage(run_log, 'sweep', sweep, classified, step=5, max_threshold=120, max_minutes=720)
+df_observer = swept.observer
 #st.dataframe(df_observer)
 
 
-if 'observer_table' not in st.session_state:
-    st.session_state['observer_table'] = df_observer
-
-
 tab_numbers, tab_percentages = st.tabs(["Numbers", "Percentages"])
 
 
@@ -637,6 +365,20 @@ with tab_percentages:
    st.subheader("Percentages..")
    st.bar_chart(data = df_observer, y = ['affected_cases_percent','not_affected_cases_percent'], x ='proposed_safety_margin',use_container_width=True)   
  
+# the same results minute by minute, up to 12 hours, the sorted arrays make it instant
+with st.expander("Minute by minute (0 to 720 minutes)"):
+    df_observer_minutes = swept.observer_minutes
+    st.line_chart(data = df_observer_minutes, y = ['solved_percent','affected_cases_percent'], x ='proposed_safety_margin',use_container_width=True)
+
+# the same sweep for each check-in type (see segmented_observer in sweep.py),
+# mobile and connect do not have to get the same safety margin
+with st.expander("Per check-in type"):
+    df_observer_checkin = swept.observer_checkin
+    st.subheader("Solved percentage")
+    st.line_chart(data = df_observer_checkin, y = 'solved_percent', x ='proposed_safety_margin', color = 'checkin_type', use_container_width=True)
+    st.subheader("Affected percentage")
+    st.line_chart(data = df_observer_checkin, y = 'affected_cases_percent', x ='proposed_safety_margin', color = 'checkin_type', use_container_width=True)
+
 
 #################################################################################################
 ##########                                                                              #########
@@ -649,49 +391,55 @@ st.subheader("C) Welcome to the laboratory")
 #st.markdown('In here you can investigate the impact when chaninging the threshold value ')
 
 
-value = st.slider("Choose a threshold as a safety margin", 
-          min_value= 0, 
-          max_value= int(df_observer['proposed_safety_margin'].max()),
-          value= 0, 
-          step=5, 
-          help= 'Change the threshold to observe the impact', 
-          )
+# the cube holds the counts of every threshold x checkin_type x classification x status,
+# it is built once per version of the data by the sweep stage
+cube = swept.cube
 
 
-st.subheader(f"Chosen Threshold : {value}")
+# a fragment: moving the slider only re-runs the lab (render), not the whole page nor any stage,
+# and the lab only reads a slice of the cube
+@st.fragment
+def update_charts():
 
-def update_charts(v1): 
-    
-    #update the table with the chosen threshold
-    
-    ds = do_preparations(v1)
-    ds['status'] = ds.apply(define_status, axis=1)
+    started = time.perf_counter()
+    value = st.slider("Choose a threshold as a safety margin", 
+              min_value= 0, 
+              max_value= int(df_observer['proposed_safety_margin'].max()),
+              value= 0, 
+              step=5, 
+              help= 'Change the threshold to observe the impact', 
+              )
+    checkin_type = st.radio("Check-in type", [ALL_CHECKIN_TYPES] + cube.checkin_types, horizontal=True)
+
+    st.subheader(f"Chosen Threshold : {value}")
 
-    fig = px.histogram(ds, x="classification", color="status")
+    fig = px.bar(cube.frame(value, checkin_type), x="classification", y="count", color="status")
     st.plotly_chart(fig)
     
-    mask = df_observer['proposed_safety_margin'] == (v1)    
+    figures = cube.metrics(value, checkin_type)
 
     col1, col2, col3 = st.columns(3)
 
     
-    col1.metric("**Problematic**", df_observer.loc[mask,['problematic_cases']].values[0])
-    col2.metric("**Solved**", df_observer.loc[mask,['solved_cases']].values[0])
-    col3.metric("Solved percentage %", df_observer.loc[mask,['solved_percent']].values[0])
+    col1.metric("**Problematic**", figures['problematic_cases'])
+    col2.metric("**Solved**", figures['solved_cases'])
+    col3.metric("Solved percentage %", figures['solved_percent'])
 
     
 
-    col1.metric("Non Problematic", df_observer.loc[mask,['non_problematic_cases']].values[0])
-    col2.metric("Affected Cases", df_observer.loc[mask,['affected_cases']].values[0])
-    col3.metric("Affected percentage", df_observer.loc[mask,['affected_cases_percent']].values[0])
+    col1.metric("Non Problematic", figures['non_problematic_cases'])
+    col2.metric("Affected Cases", figures['affected_cases'])
+    col3.metric("Affected percentage", figures['affected_cases_percent'])
 
     st.divider()
     
-    col1.metric("Loss in minutes", df_observer.loc[mask,['affected_minutes']].values[0])
+    col1.metric("Loss in minutes", figures['affected_minutes'])
+
+    st.caption(f"Lab rendered in {(time.perf_counter() - started) * 1000:.1f} ms, no stage re-ran")
 
 
 
-update_charts(value)
+update_charts()
 
 
 
@@ -701,207 +449,6 @@ update_charts(value)
 #     st.dataframe(df)
 
 
-####### A.5) Commulative Chart   #######
-
-st.subheader("5. Commulative")
-
-# overlap chart using add_trace and go.figure as below 
-# IMPORTANT !! OF COURSE THE histnorm = percent to obtain percentage and valid comaprison
-fig = go.Figure(layout_title_text="Histogram Delay vs. Delta distribution")
-fig.add_trace(go.Histogram(x=ds['delay_at_checkout_in_minutes'],
-                           xbins=dict( # bins used for histogram
-                                    start=0.0,
-                                    end=200.0,
-                                    size=5
-                                ), 
-    name='Check out Delay', 
-    cumulative_enabled=True,   # cummulative enabled
-    histnorm = "percent"))     # histnorm = percent to obtain percentage of samples 
-
-fig.add_trace(go.Histogram(x=ds['time_delta_with_previous_rental_in_minutes'],
-                           xbins=dict( # bins used for histogram
-                               start=0.0,
-                               end=200.0,
-                               size=5
-                               ),
-    name='Delta difference between bookings',
-    cumulative_enabled=True,
-    histnorm ="percent"))
-
-# Overlay both histograms
-fig.update_layout(barmode='overlay',xaxis_title='Duration (minutes)', yaxis_title='Counts')
-fig.update_xaxes(range=[0, 200])
-
-# Reduce opacity to see both histograms
-fig.update_traces(opacity=0.75)
-
-st.plotly_chart(fig)
-
-
-                        ####### A.1 ) General delay distribution  #######
-
-st.header('A) General Overview & Statistics')
-
-st.subheader('1. How is the delay distribution?')
-
-# We shall start with general analysis
-# we filter the delays greater than 0
-mask = df['delay_at_checkout_in_minutes'] >= 0
-ds = df.loc[mask,:].copy()
-
-# Layout and organizing the outputs
-# use the tabs to illustrate numbers and percentage
-tab_numbers, tab_percentages = st.tabs(["Numbers", "Percentages"])
-
-with tab_numbers:
-   # plotly figure of type histogram
-   fig = px.histogram(ds, x="delay_at_checkout_in_minutes", range_x = [0,200])
-   # BINNING: we chose the bining width equals to 5 meaning 5 minutes
-   fig.update_traces(xbins=dict( # bins used for histogram
-            start=0.0,
-            end=200.0,
-            size=5      # binning width
-        ))
-   st.plotly_chart(fig)
-   
-   # storing number of rows after filtering the positive delays
-   no_of_rows_after_delay_positive = ds.shape[0]
-
-with tab_percentages:
-
-    fig = px.histogram(ds, x="delay_at_checkout_in_minutes", range_x = [0,200],histnorm="percent")
-    fig.update_traces(xbins=dict( # bins used for histogram
-            start=0.0,
-            end=200.0,
-            size=5
-        ))
-    st.plotly_chart(fig)
-    st.caption("Each bin 'bar'resembles 5 minutes ")
-
-# writing the delay general stats
-
-col1,col2,col3,col4 = st.columns(4)
-
-col1.metric('min',int(ds['delay_at_checkout_in_minutes'].min()))
-col2.metric('median',int(ds['delay_at_checkout_in_minutes'].median()))
-col3.metric('mean',str(round(ds['delay_at_checkout_in_minutes'].mean(),2)))
-col4.metric('max',int(ds['delay_at_checkout_in_minutes'].max()))
-
-median_delay = ds['delay_at_checkout_in_minutes'].mean()
-
-st.markdown("Apparently there are **outliers** values, the maximum delay is greater than 11 hours!! \
-            We shall use the following rule to exclue them, the max value in the range will include \
-            1.5 times the median, we shall do that in the upcomming analysis.")
-
-st.divider()  
-
-
-                        ####### A.2) Delay distribution per type  #######
-
-st.subheader('2. The delay distribution per "check_in" type')
-
-# organizing the results in tabs
-tab_numbers, tab_percentages = st.tabs(["Numbers", "percentage"])  
-
-with tab_numbers:        
-
-    # to display the check in type within the histogram we used the color = checkin_type
-    fig = px.histogram(ds, x="delay_at_checkout_in_minutes", range_x = [0,200],  color='checkin_type')
-    fig.update_traces(xbins=dict( # bins used for histogram
-            start=0.0,
-            end=200.0,
-            size=5      # bins five minutes
-        ))
-    st.plotly_chart(fig)
-
-    st.markdown("**OBSERVATION :** It can be noticed easily that the check_in type **'mobile'** plays a big role in \
-                producing the majority of the delay cases, unlike the check_in type **'connect'** \
-                which has a negligable impact.")
-
-
-with tab_percentages:
-    # to display the check in type within the histogram we used the color = checkin_type
-    fig = px.histogram(ds, x="delay_at_checkout_in_minutes", range_x = [0,200],  color='checkin_type', histnorm='percent')
-    fig.update_traces(xbins=dict( # bins used for histogram
-            start=0.0,
-            end=200.0,
-            size=5
-        ))
-    st.plotly_chart(fig)
-    st.markdown(" **Important Note :**")
-    st.markdown("Here, the percentages of each bin or 'bar'represent the percentage of the series \
-                itself and **NOT** the total samples, example the first bar (0 to 4) miuntes are 10 percent of the \
-                connect series ONLY and not the 'connect + mobile' combined.")
-    
-
-    st.caption("There were some cases where the car was returned earlier but had been filtered out \
-            to focus on the delay ")
-    
-
-st.divider()
-
-                        ####### A.3) Delta distribution   #######
-
-st.subheader('3. What about the DELTA distribution?')
-
-st.markdown('The delta is the planned difference in time between the bookings ')
-
-# similar to the steps above except that here we display the delta instead of delay
-
-fig = px.histogram(ds, x="time_delta_with_previous_rental_in_minutes", range_x = [0,200])
-fig.update_traces(xbins=dict( # bins used for histogram
-        start=0.0,
-        end=200.0,
-        size=5
-    ))
-st.plotly_chart(fig)
-
-st.markdown("- **Another observation** Notice how the delta is **distributed evenly** in an integer around \
-            30 minutes, i.e. 30 mins, 1 hour, 1.5 hour, 2hours, etc..,\
-            this could be useful to solve the problem, we'll see how..  ")
-st.markdown("- Also here we can see that there are outliers that need to be clipped out")
-
-# displaying the general stats of the delta
-col1,col2,col3,col4 = st.columns(4)
-
-col1.metric('min',int(ds['time_delta_with_previous_rental_in_minutes'].min()))
-col2.metric('median',int(ds['time_delta_with_previous_rental_in_minutes'].median()))
-mean_delta = str(round(ds['time_delta_with_previous_rental_in_minutes'].mean(),2))
-col3.metric('mean',mean_delta)
-col4.metric('max',int(ds['time_delta_with_previous_rental_in_minutes'].max()))
-
-median_delta = ds['time_delta_with_previous_rental_in_minutes'].median()
-
-st.divider()
-
-
-                             ####### A.4) Overlapping Delta and delay   #######
-
-st.subheader("4. Let's overlap them")
-
-# to implement the overlap we use the add.trace technique in go figure plotly as follows:
-fig = go.Figure(layout_title_text="Histogram Delay vs. Delta distribution")
-fig.add_trace(go.Histogram(x=ds['delay_at_checkout_in_minutes'],xbins=dict( # bins used for histogram
-        start=0.0,
-        end=200.0,
-        size=5
-    ), name='Check out Delay'))
-fig.add_trace(go.Histogram(x=ds['time_delta_with_previous_rental_in_minutes'],xbins=dict( # bins used for histogram
-        start=0.0,
-        end=200.0,
-        size=5), name='Delta difference between bookings', marker =dict(color='red')))
-
-# Overlay both histograms
-fig.update_layout(barmode='overlay',xaxis_title='Duration (minutes)', yaxis_title='Counts')
-fig.update_xaxes(range=[0, 200])
-
-# Reduce opacity to see both histograms
-fig.update_traces(opacity=0.75)
-st.plotly_chart(fig)
-st.divider()
-
-
-st.dataframe(ds)
 #################################################################################################
 ##########                                                                              #########
 ##########                    C) Executive Summary                                      #########
@@ -936,3 +483,9 @@ st.plotly_chart(fig_funnel)
 
 progress_bar.progress(100, text='Completed Successfully')
 progress_bar.empty()
+
+# instrumentation: the stages that ran on this rerun, and the ones served from the memo
+run_log.finish('render')
+with st.sidebar.expander("Pipeline stages (this run)"):
+    st.dataframe(run_log.frame(), hide_index=True)
+    st.caption(f"ran: {', '.join(run_log.ran())}")
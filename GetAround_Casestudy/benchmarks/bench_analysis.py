@@ -0,0 +1,87 @@
+"""Time and peak memory of every stage of the analysis, at growing sizes of synthetic data.
+
+The stages are the ones of pipeline.py (the memo is bypassed), plus the optimizer of the
+executive summary. Each stage is run once timed, then once under tracemalloc for its peak
+memory (the allocations it made on top of what was already there), which tracemalloc slows
+down too much to time both in one run. --no-memory skips the second run, for the big sizes.
+
+    python benchmarks/bench_analysis.py --sizes 10000 100000 1000000 --json analysis.json
+    python benchmarks/bench_analysis.py --sizes 100000000 --no-memory
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import data  # noqa: F401  (puts the case study folder on sys.path)
+from synthetic import generate
+from store import DatasetStore
+from pipeline import load, clean, link, classify_rentals, sweep
+from optimizer import optimize, optimize_segments, pareto_front
+
+
+def stages(n, seed):
+    """(name, function) in the order of the page, each function reads the previous outputs."""
+
+    out = {}
+    return [
+        ('generate', lambda: out.setdefault('raw', generate(n, seed))),
+        ('store', lambda: out.setdefault('store', DatasetStore(out['raw'], f'synthetic-{n}-{seed}'))),
+        ('load', lambda: out.setdefault('loaded', load(out['store']))),
+        ('clean', lambda: clean(out['loaded'])),
+        ('link', lambda: out.setdefault('linked', link(out['loaded']))),
+        ('classify', lambda: out.setdefault('classified', classify_rentals(out['linked']))),
+        ('sweep', lambda: out.setdefault('swept', sweep(out['classified'], step=5, max_threshold=120,
+                                                        max_minutes=720))),
+        ('optimize', lambda: optimize(out['swept'].rentals)),
+        ('optimize per type', lambda: optimize_segments(out['classified'].ds)),
+        ('pareto front', lambda: pareto_front(out['swept'].rentals)),
+    ]
+
+
+def peak_mb(fn):
+    # only the allocations made after start() are traced, i.e. the ones of the stage
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak / 2**20
+
+
+def run(n, seed, memory):
+    rows = []
+    for name, fn in stages(n, seed):
+        start = time.perf_counter()
+        fn()
+        seconds = time.perf_counter() - start
+        # the outputs are kept by the first run, the second one is only measured
+        rows.append({'rows': n, 'stage': name, 'seconds': seconds,
+                     'peak_mb': peak_mb(fn) if memory else None})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='only the times, no tracemalloc run')
+    parser.add_argument('--json', default=None, help='also write the results to this file')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'rows':>12} {'stage':<18} {'seconds':>9} {'rows/s':>14} {'peak MB':>9}")
+    for n in args.sizes:
+        for row in run(n, args.seed, not args.no_memory):
+            results.append(row)
+            peak = '' if row['peak_mb'] is None else f"{row['peak_mb']:.1f}"
+            print(f"{n:>12,} {row['stage']:<18} {row['seconds']:>9.3f} {n / row['seconds']:>14,.0f} {peak:>9}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
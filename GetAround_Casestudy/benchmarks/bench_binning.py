@@ -0,0 +1,53 @@
+"""Size of the figures sent to the browser: px.histogram of the raw rows vs the pre-binned bars.
+
+    python benchmarks/bench_binning.py --rows 200000
+"""
+import argparse
+import time
+
+import numpy as np
+import plotly.express as px
+
+from data import make_rentals
+from binning import Bins, BIN_START, BIN_END, BIN_SIZE
+
+DELAY, DELTA = 'delay_at_checkout_in_minutes', 'time_delta_with_previous_rental_in_minutes'
+
+
+def payload_kb(fig):
+    return len(fig.to_json()) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    df = make_rentals(args.rows, args.seed)
+    df = df.loc[df[DELAY] >= 0]
+
+    start = time.perf_counter()
+    bins = Bins(df, [DELAY, DELTA])
+    t_bins = time.perf_counter() - start
+
+    # the same bars as plotly: [start, start + size), the end excluded
+    edges = np.arange(BIN_START, BIN_END + BIN_SIZE, BIN_SIZE)
+    values = df[DELAY].to_numpy()
+    expected, _ = np.histogram(values[values < BIN_END], bins=edges)
+    same = np.array_equal(bins.series(DELAY), expected)
+
+    charts = {'delay': (px.histogram(df, x=DELAY, range_x=[0, 200]), bins.figure(DELAY)),
+              'delay per checkin_type': (px.histogram(df, x=DELAY, range_x=[0, 200], color='checkin_type'),
+                                         bins.figure(DELAY, split=True)),
+              'delta': (px.histogram(df, x=DELTA, range_x=[0, 200]), bins.figure(DELTA))}
+
+    print(f'{len(df)} rows, binned once in {t_bins * 1000:.1f} ms, same counts as np.histogram: {same}')
+    for name, (raw, binned) in charts.items():
+        print(f'{name:<24} raw rows {payload_kb(raw):>10,.0f} KB   pre-binned {payload_kb(binned):>6,.1f} KB')
+    if not same:
+        raise SystemExit('MISMATCH between the binned counts and np.histogram')
+
+
+if __name__ == '__main__':
+    main()
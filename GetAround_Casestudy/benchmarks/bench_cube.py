@@ -0,0 +1,62 @@
+"""Time what the lab does when the slider moves: before (re-prepare and re-classify ds)
+and after (read a slice of the observer cube). Checks the cube against the observer table.
+
+    python benchmarks/bench_cube.py --rows 200000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from bench_sweep import classified
+from cube import build_cube
+from rules import define_statuses
+from sweep import observer_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ds = classified(args.rows, args.seed)
+    grid = list(range(0, 125, 5))
+
+    start = time.perf_counter()
+    cube = build_cube(ds, grid)
+    t_build = time.perf_counter() - start
+
+    observer = observer_table(ds, grid)
+    columns = ['problematic_cases', 'solved_cases', 'solved_percent', 'non_problematic_cases',
+               'affected_cases', 'affected_cases_percent', 'affected_minutes']
+    same = all(np.allclose([cube.metrics(t)[c] for c in columns], row[columns].to_numpy(dtype=float))
+               for t, (_, row) in zip(grid, observer.iterrows()))
+
+    # before: what update_charts did for one slider position
+    start = time.perf_counter()
+    for threshold in grid:
+        ds['threshold-delay'] = threshold - ds['delay_of_previous']
+        ds['losses'] = threshold - ds['time_delta_with_previous_rental_in_minutes']
+        status = define_statuses(ds)
+        status.groupby([ds['classification'], status], observed=True).size()
+    t_before = (time.perf_counter() - start) / len(grid)
+
+    start = time.perf_counter()
+    for threshold in grid:
+        cube.frame(threshold)
+        cube.metrics(threshold)
+    t_after = (time.perf_counter() - start) / len(grid)
+
+    print(f'{len(ds)} classified rentals, cube identical to the observer table: {same}')
+    print(f'cube build (once per dataset)      {t_build * 1000:>10.2f} ms')
+    print(f'slider move, re-classify ds        {t_before * 1000:>10.2f} ms')
+    print(f'slider move, read the cube         {t_after * 1000:>10.3f} ms')
+    if not same:
+        raise SystemExit('MISMATCH between the cube and the observer table')
+    if t_after > 0.05:
+        raise SystemExit('a slider move takes more than 50 ms')
+
+
+if __name__ == '__main__':
+    main()
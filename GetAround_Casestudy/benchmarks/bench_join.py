@@ -0,0 +1,54 @@
+"""Time the vectorized previous-delay join against the former row-by-row lookup.
+
+    python benchmarks/bench_join.py --rows 21310 --rowwise-rows 21310
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from data import make_rentals
+from joins import link_previous
+
+
+def rowwise_link(df):
+    # the former implementation of Main.py: one boolean scan of the whole frame per row
+    # (a reference to a rental missing from the data gives NaN, like link_previous)
+    def get_delay_of_previous(ref_id):
+        if pd.notna(ref_id):
+            mask = df['rental_id'] == ref_id
+            previous_delay = df.loc[mask, 'delay_at_checkout_in_minutes']
+            return previous_delay.values[0] if len(previous_delay) else np.nan
+        else:
+            return
+
+    return df['previous_ended_rental_id'].apply(get_delay_of_previous)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=21310, help='rows for the vectorized join')
+    parser.add_argument('--rowwise-rows', type=int, default=5000, help='rows for the row-by-row version')
+    parser.add_argument('--depth', type=int, default=2)
+    args = parser.parse_args()
+
+    small = make_rentals(args.rowwise_rows)
+    start = time.perf_counter()
+    expected = rowwise_link(small)
+    rowwise = time.perf_counter() - start
+    got = link_previous(small)['delay_of_previous']
+    same = np.allclose(pd.to_numeric(expected).to_numpy(dtype=float), got.to_numpy(), equal_nan=True)
+    print(f'row by row    {args.rowwise_rows:>10} rows {rowwise:>9.3f}s   (same result: {same})')
+    if not same:
+        raise SystemExit('the vectorized join differs from the row-by-row lookup')
+
+    big = make_rentals(args.rows)
+    start = time.perf_counter()
+    link_previous(big, depth=args.depth)
+    vectorized = time.perf_counter() - start
+    print(f'vectorized    {args.rows:>10} rows {vectorized:>9.3f}s   (depth {args.depth})')
+
+
+if __name__ == '__main__':
+    main()
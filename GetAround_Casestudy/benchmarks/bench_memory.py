@@ -0,0 +1,76 @@
+"""Memory held per viewer: a copy of the data in each session (before) vs views of the shared store (after).
+
+Each scenario runs in a fresh interpreter, the RSS is read before and after N simulated viewers.
+
+    python benchmarks/bench_memory.py --rows 1000000 --viewers 20
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+import data  # noqa: F401  (puts the case study folder on sys.path)
+from data import CASESTUDY_DIR
+
+CHILD = r'''
+import gc, json, os, pickle, sys
+sys.path.insert(0, os.path.join(%(here)r, 'benchmarks'))
+from data import make_rentals
+from joins import link_previous
+from store import DatasetStore, memory_mb
+
+def rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+
+raw = make_rentals(%(rows)d)
+raw['checkin_type'] = raw['checkin_type'].astype(object)   # the dtypes read_excel gave
+raw['state'] = raw['state'].astype(object)
+store = DatasetStore(raw, 'bench') if %(after)r else None
+gc.collect()
+baseline = rss_mb()
+
+sessions = []
+for _ in range(%(viewers)d):
+    if store is None:
+        # st.cache_data hands a copy to each run, and the session_state kept it
+        df = pickle.loads(pickle.dumps(raw))
+    else:
+        df = store.view()
+    df['delay_of_previous'] = link_previous(df)['delay_of_previous']
+    sessions.append({'my_data': df})
+gc.collect()
+
+print(json.dumps({"data_mb": memory_mb(raw) if store is None else store.memory_mb(),
+                  "per_viewer_mb": (rss_mb() - baseline) / %(viewers)d}))
+'''
+
+
+def run(rows, viewers, after):
+    code = CHILD % {'here': CASESTUDY_DIR, 'rows': rows, 'viewers': viewers, 'after': after}
+    output = subprocess.run([sys.executable, '-c', code], cwd=CASESTUDY_DIR, capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--viewers', type=int, default=20)
+    args = parser.parse_args()
+
+    before = run(args.rows, args.viewers, after=False)
+    after = run(args.rows, args.viewers, after=True)
+    print(f'{args.rows} rentals, {args.viewers} viewers')
+    print(f"before: data {before['data_mb']:>8.1f} MB, RSS per viewer {before['per_viewer_mb']:>8.1f} MB")
+    print(f"after:  data {after['data_mb']:>8.1f} MB, RSS per viewer {after['per_viewer_mb']:>8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""The optimizer against a brute force scan of every minute, and the time of each.
+
+    python benchmarks/bench_optimizer.py --rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from bench_sweep import classified
+from optimizer import evaluate, optimize, pareto_front
+from sweep import sorted_rentals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--max-threshold', type=int, default=720)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ds = classified(args.rows, args.seed)
+    rentals = sorted_rentals(ds)
+    failures = []
+
+    for weight in (10.0, 60.0, 600.0):
+        weights = {'unsolved': weight, 'affected_minutes': 1.0}
+        start = time.perf_counter()
+        best = optimize(rentals, weights, max_threshold=args.max_threshold)
+        t_opt = time.perf_counter() - start
+
+        # the synthetic delays are whole minutes, so the minimum is on the minute grid too
+        start = time.perf_counter()
+        grid = evaluate(rentals, np.arange(0, args.max_threshold + 1), weights)
+        brute = grid.loc[grid['cost'].idxmin()]
+        t_grid = time.perf_counter() - start
+
+        same = np.isclose(best['cost'], brute['cost'])
+        print(f"unsolved = {weight:>5.0f} min: optimum {best['threshold']:>4.0f} min (grid {brute['threshold']:>4.0f}), "
+              f"same cost: {same}, optimizer {t_opt * 1000:.2f} ms, every minute {t_grid * 1000:.2f} ms")
+        if not same:
+            failures.append(weight)
+
+    front = pareto_front(rentals, max_threshold=args.max_threshold)
+    print(f'{len(ds)} classified rentals, Pareto front of {len(front)} thresholds')
+    if failures:
+        raise SystemExit(f'the optimizer missed the minimum for the weights {failures}')
+
+
+if __name__ == '__main__':
+    main()
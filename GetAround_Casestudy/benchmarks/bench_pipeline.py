@@ -0,0 +1,42 @@
+"""The stages of the page on a cold run, then on a rerun with the same data (only render should run).
+
+    python benchmarks/bench_pipeline.py --rows 200000
+"""
+import argparse
+
+from data import make_rentals
+from pipeline import RunLog, run_stage, load, clean, link, classify_rentals, sweep
+from store import DatasetStore
+
+
+def run_page(store):
+    log = RunLog()
+    loaded = run_stage(log, 'load', load, store)
+    run_stage(log, 'clean', clean, loaded)
+    linked = run_stage(log, 'link', link, loaded)
+    classified = run_stage(log, 'classify', classify_rentals, linked)
+    run_stage(log, 'sweep', sweep, classified, step=5, max_threshold=120, max_minutes=720)
+    log.finish('render')
+    return log
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    store = DatasetStore(make_rentals(args.rows, args.seed), f'synthetic-{args.rows}-{args.seed}')
+    cold = run_page(store)
+    rerun = run_page(store)
+
+    print('cold run')
+    print(cold.frame().to_string(index=False))
+    print('\nrerun, same data')
+    print(rerun.frame().to_string(index=False))
+    if rerun.ran() != ['render']:
+        raise SystemExit(f'stages re-ran on a rerun: {rerun.ran()}')
+
+
+if __name__ == '__main__':
+    main()
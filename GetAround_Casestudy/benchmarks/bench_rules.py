@@ -0,0 +1,57 @@
+"""Time the vectorized classification / status rules against the row-by-row apply.
+
+Checks first that both give exactly the same labels.
+
+    python benchmarks/bench_rules.py --rows 1000000 --threshold 45
+"""
+import argparse
+import time
+
+from data import make_rentals
+from joins import link_previous
+from rules import classifier, define_status, classify, define_statuses
+
+
+def prepare(n, threshold, seed):
+    # the same columns as pipeline.prepare
+    ds = make_rentals(n, seed)
+    ds['delay_of_previous'] = link_previous(ds)['delay_of_previous']
+    ds['threshold-delay'] = threshold - ds['delay_of_previous']
+    ds['delta-delay'] = ds['time_delta_with_previous_rental_in_minutes'] - ds['delay_of_previous']
+    ds['losses'] = threshold - ds['time_delta_with_previous_rental_in_minutes']
+    return ds
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--threshold', type=float, default=45)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ds = prepare(args.rows, args.threshold, args.seed)
+
+    rowwise_classes, t_rowwise_classes = timed(lambda: ds.apply(classifier, axis=1))
+    classes, t_classes = timed(classify, ds)
+    ds['classification'] = classes
+
+    rowwise_statuses, t_rowwise_statuses = timed(lambda: ds.apply(define_status, axis=1))
+    statuses, t_statuses = timed(define_statuses, ds)
+
+    same = (classes.astype(str) == rowwise_classes).all() and (statuses.astype(str) == rowwise_statuses).all()
+    print(f'{args.rows} rentals, identical labels: {same}')
+    print(f"{'':<16} {'apply (s)':>10} {'vectorized (s)':>15} {'speedup':>9}")
+    print(f"{'classification':<16} {t_rowwise_classes:>10.3f} {t_classes:>15.4f} {t_rowwise_classes / t_classes:>8.0f}x")
+    print(f"{'status':<16} {t_rowwise_statuses:>10.3f} {t_statuses:>15.4f} {t_rowwise_statuses / t_statuses:>8.0f}x")
+    if not same:
+        raise SystemExit('MISMATCH between the vectorized rules and the row-by-row functions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Scaling of the segmented sweep (per checkin_type and car_id) with the number of rentals and workers.
+
+Checks first that each segment has the same table as observer_table on its own rentals, then
+compares with calling observer_table segment by segment (groupby), and with 1..N workers.
+Above --loop-max-segments segments the loop is timed on that many segments and extrapolated.
+
+    python benchmarks/bench_segments.py --rows 100000 1000000 --workers 1 2 4
+"""
+import argparse
+import time
+
+import numpy as np
+
+from bench_sweep import classified
+from sweep import observer_table, segmented_observer, SEGMENT_COLUMNS, DEFAULT_THRESHOLDS
+
+BY = ['checkin_type', 'car_id']
+
+
+def check(ds):
+    table = segmented_observer(ds, ['checkin_type'])
+    for checkin_type, segment in ds.groupby('checkin_type', observed=True):
+        expected = observer_table(segment)[SEGMENT_COLUMNS].to_numpy(dtype=float)
+        got = table.loc[table['checkin_type'] == checkin_type, SEGMENT_COLUMNS].to_numpy(dtype=float)
+        if not np.allclose(got, expected):
+            return False
+    return True
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--loop-max-segments', type=int, default=2000,
+                        help='above this number of segments, time the loop on that many and extrapolate')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    same = check(classified(50_000, args.seed))
+    print(f'per checkin_type identical to observer_table: {same}')
+    if not same:
+        raise SystemExit('MISMATCH between the segmented sweep and observer_table')
+
+    for rows in args.rows:
+        ds = classified(rows, args.seed)
+        n_segments = ds.groupby(BY, observed=True).ngroups
+        print(f'\n{len(ds)} classified rentals, {n_segments} segments x {len(DEFAULT_THRESHOLDS)} thresholds')
+
+        def loop():
+            for i, (_, segment) in enumerate(ds.groupby(BY, observed=True)):
+                if i == args.loop_max_segments:
+                    return i
+                observer_table(segment)
+            return n_segments
+
+        seconds, looped = timed(loop)
+        loop_seconds = seconds * n_segments / looped
+        estimated = '' if looped == n_segments else f'   (estimated from {looped} segments)'
+        print(f'  observer_table per segment   {loop_seconds:>9.3f}s{estimated}')
+
+        single = None
+        for workers in args.workers:
+            seconds, table = timed(lambda: segmented_observer(ds, BY, workers=workers))
+            single = single or seconds
+            print(f'  one pass, {workers} worker(s)       {seconds:>9.3f}s   ({len(table)} rows)   '
+                  f'x{loop_seconds / seconds:,.0f} vs the loop, x{single / seconds:.2f} vs {args.workers[0]} worker(s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Time the closed-form threshold sweep against the former loop of create_observer_results.
+
+Checks first that both observer tables are the same on the 0-120 / 5 minutes grid.
+
+    python benchmarks/bench_sweep.py --rows 200000 --max-threshold 720
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from data import make_rentals
+from joins import link_previous
+from rules import classify, define_statuses
+from sweep import observer_table, OBSERVER_COLUMNS
+
+
+def classified(n, seed):
+    ds = make_rentals(n, seed)
+    ds['delay_of_previous'] = link_previous(ds)['delay_of_previous']
+    mask = ds['time_delta_with_previous_rental_in_minutes'].notna() & ds['delay_of_previous'].notna()
+    ds = ds.loc[mask].copy()
+    ds['delta-delay'] = ds['time_delta_with_previous_rental_in_minutes'] - ds['delay_of_previous']
+    ds['classification'] = classify(ds)
+    return ds
+
+
+def loop_observer(ds, thresholds):
+    # the former way: re-prepare and re-classify the whole ds for each threshold
+    rows = []
+    total_cases = ds.shape[0]
+    for proposed_delay in thresholds:
+        ds['threshold-delay'] = proposed_delay - ds['delay_of_previous']
+        ds['losses'] = proposed_delay - ds['time_delta_with_previous_rental_in_minutes']
+        status = define_statuses(ds)
+        problematic = (ds['classification'] == 'Problematic').sum()
+        non_problematic = (ds['classification'] == 'Non_Problematic').sum()
+        solved = (status == 'Solved').sum()
+        unsolved = (status == 'UnSolved').sum()
+        affected = (status == 'Affected').sum()
+        not_affected = (status == 'Not affected').sum()
+        rows.append({'proposed_safety_margin': proposed_delay,
+                     'problematic_cases': problematic,
+                     'non_problematic_cases': non_problematic,
+                     'solved_cases': solved,
+                     'unsolved_cases': unsolved,
+                     'affected_cases': affected,
+                     'not_affected_cases': not_affected,
+                     'affected_minutes': ds.loc[ds['losses'] > 0, 'losses'].sum(),
+                     'problematic_cases_percent': int(problematic / total_cases * 100),
+                     'non_problematic_cases_percent': int(non_problematic / total_cases * 100),
+                     'solved_percent': int(solved / problematic * 100),
+                     'un_solved_percent': int(unsolved / problematic * 100),
+                     'affected_cases_percent': int(affected / non_problematic * 100),
+                     'not_affected_cases_percent': int(not_affected / non_problematic * 100),
+                     'checkin_type': 0,
+                     'total cases': total_cases,
+                     'verification': 0})
+    return pd.DataFrame(rows, columns=OBSERVER_COLUMNS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--max-threshold', type=int, default=720)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ds = classified(args.rows, args.seed)
+    grid = list(range(0, 125, 5))
+
+    start = time.perf_counter()
+    expected = loop_observer(ds.copy(), grid)
+    t_loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    got = observer_table(ds, grid)
+    t_sweep = time.perf_counter() - start
+
+    same = np.allclose(got.to_numpy(dtype=float), expected.to_numpy(dtype=float))
+    print(f'{len(ds)} classified rentals, identical tables on the 5 minutes grid: {same}')
+    print(f'loop, 25 thresholds            {t_loop:>9.3f}s')
+    print(f'sorted sweep, 25 thresholds    {t_sweep:>9.4f}s')
+
+    start = time.perf_counter()
+    observer_table(ds, np.arange(0, args.max_threshold + 1))
+    print(f'sorted sweep, every minute 0-{args.max_threshold}  {time.perf_counter() - start:>9.4f}s')
+    if not same:
+        raise SystemExit('MISMATCH between the sorted sweep and the loop')
+
+
+if __name__ == '__main__':
+    main()
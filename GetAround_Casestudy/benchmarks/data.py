@@ -0,0 +1,15 @@
+import os
+import sys
+
+# the benchmarks import the analysis modules sitting in the parent folder
+CASESTUDY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CASESTUDY_DIR not in sys.path:
+    sys.path.insert(0, CASESTUDY_DIR)
+
+from synthetic import generate
+
+
+def make_rentals(n, seed=0):
+    """A delay-analysis shaped dataframe of `n` rentals, with chains of previous rentals (see synthetic.py)."""
+
+    return generate(n, seed)
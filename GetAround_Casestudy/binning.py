@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+
+# The histograms of the page are binned here with NumPy, only the bars (40 per series) are sent
+# to the browser instead of every row of the dataframe, px.histogram / go.Histogram did the
+# binning in the browser.
+#
+# The bins behave like the plotly ones: [start, start + size) ... up to `end` excluded, and the
+# percentages are over the samples falling in the bins of the series (histnorm='percent').
+
+BIN_START = 0.0
+BIN_END = 200.0
+BIN_SIZE = 5     # 5 minutes
+
+
+def bin_counts(values, start=BIN_START, end=BIN_END, size=BIN_SIZE):
+    """The number of values in each bin, the NaNs and the values out of range are not counted."""
+
+    values = np.asarray(values, dtype=np.float64)
+    n_bins = int(np.ceil((end - start) / size))
+    index = np.floor((values - start) / size)
+    index = index[(index >= 0) & (index < n_bins)].astype(np.int64)
+    return np.bincount(index, minlength=n_bins)
+
+
+def _percent(counts):
+    total = counts.sum()
+    return counts / total * 100 if total else np.zeros(len(counts))
+
+
+class Bins:
+    """The counts of each column of `df`, overall and per `by` group, computed once.
+
+    The figures are then drawn from these counts as bar traces.
+    """
+
+    def __init__(self, df, columns, by='checkin_type', start=BIN_START, end=BIN_END, size=BIN_SIZE):
+        self.start, self.end, self.size = start, end, size
+        self.by = by
+        self.groups = sorted(df[by].dropna().unique().tolist()) if by else []
+        self.counts = {}
+        for column in columns:
+            self.counts[column, None] = bin_counts(df[column], start, end, size)
+            for group in self.groups:
+                self.counts[column, group] = bin_counts(df.loc[df[by] == group, column], start, end, size)
+        n_bins = len(next(iter(self.counts.values()))) if self.counts else 0
+        self.centers = start + size * (np.arange(n_bins) + 0.5)
+
+    def series(self, column, group=None, norm=None, cumulative=False):
+        """The bar heights: counts, or percentages with norm='percent', cumulated or not."""
+
+        values = self.counts[column, group]
+        values = _percent(values) if norm == 'percent' else values
+        return np.cumsum(values) if cumulative else values
+
+    def table(self, column, group=None):
+        """The bins of one series as a small dataframe (bin start, count, percent, cumulative percent)."""
+
+        counts = self.counts[column, group]
+        return pd.DataFrame({'bin_start': self.centers - self.size / 2,
+                             'count': counts,
+                             'percent': _percent(counts),
+                             'cumulative_percent': np.cumsum(_percent(counts))})
+
+    def bar(self, column, group=None, norm=None, cumulative=False, **trace):
+        """One go.Bar trace, the bars touching each other like a histogram."""
+
+        return go.Bar(x=self.centers, y=self.series(column, group, norm, cumulative),
+                      width=self.size, **trace)
+
+    def figure(self, column, norm=None, split=False):
+        """What px.histogram(df, x=column, histnorm=norm, color=by if split) displayed."""
+
+        if split:
+            # one stacked series per group, each normalized on itself like plotly did
+            fig = go.Figure([self.bar(column, group, norm, name=str(group)) for group in self.groups])
+            fig.update_layout(barmode='relative', legend_title_text=self.by)
+        else:
+            fig = go.Figure([self.bar(column, None, norm)])
+        fig.update_layout(xaxis_title=column, yaxis_title=norm or 'count', bargap=0)
+        fig.update_xaxes(range=[self.start, self.end])
+        return fig
+
+    def overlay(self, columns, names, norm=None, cumulative=False, colors=None, **layout):
+        """Several columns on the same bins, overlaid (barmode overlay) like the go.Histogram figures."""
+
+        colors = colors or [None] * len(columns)
+        fig = go.Figure([self.bar(column, None, norm, cumulative, name=name, marker=dict(color=color))
+                         for column, name, color in zip(columns, names, colors)], **layout)
+        fig.update_layout(barmode='overlay', bargap=0)
+        fig.update_xaxes(range=[self.start, self.end])
+        return fig
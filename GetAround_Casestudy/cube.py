@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+from rules import CLASSIFICATIONS, STATUSES, define_statuses
+
+
+# The OBSERVER CUBE: the number of rentals for each
+#   threshold x checkin_type x classification x status
+# plus the minutes lost (the positive losses) for each threshold x checkin_type x classification.
+#
+# It is built once per version of the dataset, after that the lab only reads a slice of it
+# when the slider moves, instead of re-preparing and re-classifying the whole ds.
+
+ALL_CHECKIN_TYPES = 'all'
+
+
+class ObserverCube:
+    """The counts of every threshold, read in O(1) by the lab."""
+
+    def __init__(self, thresholds, checkin_types, counts, minutes):
+        self.thresholds = np.asarray(thresholds)
+        self.checkin_types = list(checkin_types)
+        self.counts = counts     # [checkin_type, threshold, classification, status]
+        self.minutes = minutes   # [checkin_type, threshold, classification]
+        self._position = {int(t): i for i, t in enumerate(self.thresholds)}
+
+    def _slice(self, array, threshold, checkin_type):
+        i = self._position[int(threshold)]
+        if checkin_type in (None, ALL_CHECKIN_TYPES):
+            return array[:, i].sum(axis=0)
+        return array[self.checkin_types.index(checkin_type), i]
+
+    def frame(self, threshold, checkin_type=None):
+        """classification / status / count of one threshold, the rows with a count only."""
+
+        counts = self._slice(self.counts, threshold, checkin_type)
+        rows = [(classification, status, int(counts[c, s]))
+                for c, classification in enumerate(CLASSIFICATIONS)
+                for s, status in enumerate(STATUSES)
+                if counts[c, s] > 0]
+        return pd.DataFrame(rows, columns=['classification', 'status', 'count'])
+
+    def metrics(self, threshold, checkin_type=None):
+        """The figures displayed by the lab, the same values as the observer table."""
+
+        counts = self._slice(self.counts, threshold, checkin_type)
+        minutes = self._slice(self.minutes, threshold, checkin_type)
+        problematic = counts[CLASSIFICATIONS.index('Problematic')]
+        non_problematic = counts[CLASSIFICATIONS.index('Non_Problematic')]
+
+        solved = int(problematic[STATUSES.index('Solved')])
+        affected = int(non_problematic[STATUSES.index('Affected')])
+        total_problematic = int(problematic.sum())
+        total_non_problematic = int(non_problematic.sum())
+
+        return {'problematic_cases': total_problematic,
+                'solved_cases': solved,
+                'solved_percent': int(solved / total_problematic * 100) if total_problematic else 0,
+                'non_problematic_cases': total_non_problematic,
+                'affected_cases': affected,
+                'affected_cases_percent': int(affected / total_non_problematic * 100) if total_non_problematic else 0,
+                'affected_minutes': float(minutes.sum())}
+
+
+def build_cube(ds, thresholds=range(0, 125, 5)):
+    """The cube of the classified rentals `ds` (columns of pipeline.prepare + classification)."""
+
+    thresholds = np.asarray(thresholds)
+    checkin_types = sorted(ds['checkin_type'].dropna().unique().tolist())
+
+    # the cells are numbered checkin_type -> classification -> status, counted with bincount
+    checkin_codes = pd.Categorical(ds['checkin_type'], categories=checkin_types).codes
+    class_codes = pd.Categorical(ds['classification'], categories=CLASSIFICATIONS).codes
+    keep = (checkin_codes >= 0) & (class_codes >= 0)
+    checkin_codes, class_codes = checkin_codes[keep], class_codes[keep]
+
+    delay = ds['delay_of_previous'].to_numpy(dtype=np.float64)[keep]
+    delta = ds['time_delta_with_previous_rental_in_minutes'].to_numpy(dtype=np.float64)[keep]
+    # the status only needs these three columns, the rules themselves stay in rules.py
+    frame = pd.DataFrame({'classification': ds['classification'].to_numpy()[keep]})
+
+    n_checkin, n_class, n_status = len(checkin_types), len(CLASSIFICATIONS), len(STATUSES)
+    counts = np.zeros((n_checkin, len(thresholds), n_class, n_status), dtype=np.int64)
+    minutes = np.zeros((n_checkin, len(thresholds), n_class), dtype=np.float64)
+    cell = checkin_codes.astype(np.int64) * n_class + class_codes
+
+    for i, threshold in enumerate(thresholds):
+        frame['threshold-delay'] = threshold - delay
+        frame['losses'] = threshold - delta
+        status_codes = define_statuses(frame).cat.codes.to_numpy()
+
+        counts[:, i] = np.bincount(cell * n_status + status_codes,
+                                   minlength=n_checkin * n_class * n_status).reshape(n_checkin, n_class, n_status)
+        # like the observer, the positive losses of every rental
+        losses = np.where(frame['losses'] > 0, frame['losses'], 0.0)
+        minutes[:, i] = np.bincount(cell, weights=losses,
+                                    minlength=n_checkin * n_class).reshape(n_checkin, n_class)
+
+    return ObserverCube(thresholds, checkin_types, counts, minutes)
@@ -0,0 +1,228 @@
+"""Converts the delay analysis workbook once into a local columnar snapshot.
+
+Parsing the .xlsx (openpyxl) on every cold start is slow and needs the network, so the
+workbook is read once, the columns get explicit dtypes, and the result is written to a
+Feather (default, memory-mapped when loaded) or Parquet file named after the content hash
+of the workbook. A small manifest next to it points at the current snapshot.
+
+    python ingest.py                                   # download the workbook and convert it
+    python ingest.py --source ~/get_around_delay_analysis.xlsx --format parquet
+    python ingest.py --compare                         # cold-start time, Excel vs snapshot
+
+DELAY_DATA_PATH can point load_delay_data at a local workbook or snapshot instead.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+import urllib.request
+
+import pandas as pd
+
+
+SOURCE_URL = 'https://full-stack-assets.s3.eu-west-3.amazonaws.com/Deployment/get_around_delay_analysis.xlsx'
+SNAPSHOT_DIR = os.environ.get('DELAY_SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+MANIFEST = 'delay_analysis.json'
+
+# the ids of the previous rentals have NaNs, so they stay floats like read_excel gave them
+DTYPES = {'rental_id': 'int64',
+          'car_id': 'int64',
+          'checkin_type': 'category',
+          'state': 'category',
+          'delay_at_checkout_in_minutes': 'float64',
+          'previous_ended_rental_id': 'float64',
+          'time_delta_with_previous_rental_in_minutes': 'float64'}
+
+SNAPSHOT_EXTENSIONS = {'feather': '.feather', 'parquet': '.parquet'}
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()[:12]
+
+
+def read_source(source=SOURCE_URL):
+    """The raw bytes of the workbook, from a URL or a local path."""
+
+    if source.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(source) as response:
+            return response.read()
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def source_stat(source):
+    """The modification time and size of a local workbook, None for a URL."""
+
+    if source.startswith(('http://', 'https://')):
+        return None
+    stat = os.stat(source)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def read_workbook(content):
+    df = pd.read_excel(io.BytesIO(content))
+    return df.astype(DTYPES)
+
+
+def is_snapshot(path):
+    return path.lower().endswith(('.feather', '.arrow', '.parquet', '.pq'))
+
+
+def write_snapshot(df, path):
+    if path.lower().endswith(('.parquet', '.pq')):
+        df.to_parquet(path, index=False)
+    else:
+        # uncompressed so that it can be memory-mapped as it is
+        df.reset_index(drop=True).to_feather(path, compression='uncompressed')
+
+
+def read_snapshot(path):
+    """The snapshot as a dataframe, the file is memory-mapped rather than read in one go."""
+
+    if path.lower().endswith(('.parquet', '.pq')):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, memory_map=True)
+    else:
+        import pyarrow.feather as feather
+        table = feather.read_table(path, memory_map=True)
+    return table.to_pandas()
+
+
+def convert(source=SOURCE_URL, out_dir=SNAPSHOT_DIR, fmt='feather'):
+    """Convert the workbook into a snapshot, returns the manifest."""
+
+    content = read_source(source)
+    version = content_hash(content)
+    df = read_workbook(content)
+
+    os.makedirs(out_dir, exist_ok=True)
+    snapshot = f'delay_analysis-{version}{SNAPSHOT_EXTENSIONS[fmt]}'
+    write_snapshot(df, os.path.join(out_dir, snapshot))
+
+    manifest = {'source': source,
+                'source_stat': source_stat(source),
+                'version': version,
+                'snapshot': snapshot,
+                'rows': len(df),
+                'dtypes': {column: str(dtype) for column, dtype in df.dtypes.items()}}
+    write_manifest(manifest, out_dir)
+    return manifest
+
+
+def write_manifest(manifest, out_dir=SNAPSHOT_DIR):
+    with open(os.path.join(out_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def is_current(manifest, path, out_dir=SNAPSHOT_DIR):
+    """Whether the snapshot of the manifest was converted from the workbook `path` as it is now.
+
+    The file is only hashed again when its modification time or size changed.
+    """
+
+    if manifest['source'] != path:
+        return False
+    stat = source_stat(path)
+    if stat is None or manifest.get('source_stat') == stat:
+        return True
+    if content_hash(read_source(path)) != manifest['version']:
+        return False
+    # touched but the same content, no need to hash it again next time
+    write_manifest({**manifest, 'source_stat': stat}, out_dir)
+    return True
+
+
+def read_manifest(out_dir=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    if not os.path.exists(os.path.join(out_dir, manifest['snapshot'])):
+        return None
+    return manifest
+
+
+def load_delay_data(path=None, out_dir=SNAPSHOT_DIR):
+    """The delay analysis dataframe and its version (the content hash of the workbook).
+
+    `path` (or DELAY_DATA_PATH) may be a snapshot, loaded as it is, or a workbook which is
+    converted first (again when it changed since). Without it the current snapshot is used, and the workbook is only
+    downloaded and converted when there is none yet.
+    """
+
+    path = path or os.environ.get('DELAY_DATA_PATH')
+    if path and is_snapshot(path):
+        return read_snapshot(path), os.path.splitext(os.path.basename(path))[0]
+
+    manifest = read_manifest(out_dir)
+    if manifest is None or (path and not is_current(manifest, path, out_dir)):
+        manifest = convert(path or SOURCE_URL, out_dir)
+    return read_snapshot(os.path.join(out_dir, manifest['snapshot'])), manifest['version']
+
+
+# a fresh interpreter for each load, the imports (openpyxl, pyarrow) are part of a cold start
+COLD_LOAD = r'''
+import sys, time
+start = time.perf_counter()
+import pandas as pd
+from ingest import is_snapshot, read_snapshot
+path = sys.argv[1]
+df = read_snapshot(path) if is_snapshot(path) else pd.read_excel(path)
+print(time.perf_counter() - start)
+'''
+
+
+def cold_load_seconds(path):
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, '-c', COLD_LOAD, path], cwd=here,
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def compare(source=SOURCE_URL, out_dir=SNAPSHOT_DIR):
+    """Cold-start time of the workbook and of the snapshots, all read from the local disk."""
+
+    content = read_source(source)
+    os.makedirs(out_dir, exist_ok=True)
+    workbook = os.path.join(out_dir, 'delay_analysis.xlsx')
+    with open(workbook, 'wb') as f:
+        f.write(content)
+
+    version = content_hash(content)
+    df = None
+    paths = {'excel (openpyxl)': workbook}
+    for fmt, extension in SNAPSHOT_EXTENSIONS.items():
+        path = os.path.join(out_dir, f'delay_analysis-{version}{extension}')
+        if not os.path.exists(path):
+            df = read_workbook(content) if df is None else df
+            write_snapshot(df, path)
+        paths[f'{fmt} snapshot'] = path
+
+    return {name: cold_load_seconds(path) for name, path in paths.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=SOURCE_URL, help='URL or local path of the workbook')
+    parser.add_argument('--out-dir', default=SNAPSHOT_DIR)
+    parser.add_argument('--format', choices=sorted(SNAPSHOT_EXTENSIONS), default='feather')
+    parser.add_argument('--compare', action='store_true', help='time a cold load of the workbook and of the snapshots')
+    args = parser.parse_args()
+
+    if args.compare:
+        timings = compare(args.source, args.out_dir)
+        excel = timings['excel (openpyxl)']
+        for name, seconds in timings.items():
+            print(f'{name:<20} {seconds:>8.3f}s   x{excel / seconds:,.1f}')
+        return
+
+    manifest = convert(args.source, args.out_dir, args.format)
+    print(f"{manifest['rows']} rows written to {os.path.join(args.out_dir, manifest['snapshot'])}")
+
+
+if __name__ == '__main__':
+    main()
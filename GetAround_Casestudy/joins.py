@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+
+# Relate each rental with the delay of the previous rental (and the one before it, etc.)
+#
+# Instead of filtering the whole dataframe for every row (O(n²)), an index
+# rental_id -> position is built once and all the previous ids are looked up in one go.
+
+
+def previous_column_name(level):
+    # level 1 keeps the name used by the analysis, the next ones get a suffix
+    return 'delay_of_previous' if level == 1 else f'delay_of_previous_{level}'
+
+
+def link_previous(df, depth=1,
+                  id_col='rental_id',
+                  previous_col='previous_ended_rental_id',
+                  delay_col='delay_at_checkout_in_minutes'):
+    """Delay of the previous rental of each row, and of its predecessors up to `depth`.
+
+    Returns a dataframe with the same index as `df` and the columns
+    delay_of_previous, delay_of_previous_2, ..., delay_of_previous_<depth>.
+    An empty reference, or a reference not found in the data, gives NaN.
+    When a rental_id appears twice the first row is used (as `.values[0]` did).
+    """
+
+    first = ~df[id_col].duplicated()
+    # the ids are compared as floats because previous_ended_rental_id has NaNs
+    keys = pd.Index(df.loc[first, id_col].to_numpy(dtype=np.float64))
+    delays = df.loc[first, delay_col].to_numpy(dtype=np.float64)
+    previous = df.loc[first, previous_col].to_numpy(dtype=np.float64)
+
+    ids = df[previous_col].to_numpy(dtype=np.float64)
+    linked = {}
+    if len(keys) == 0:
+        return pd.DataFrame({previous_column_name(level): np.full(len(df), np.nan)
+                             for level in range(1, depth + 1)}, index=df.index)
+
+    for level in range(1, depth + 1):
+        positions = keys.get_indexer(ids)
+        found = positions >= 0
+        linked[previous_column_name(level)] = np.where(found, delays[positions], np.nan)
+        # one step further back in the chain
+        ids = np.where(found, previous[positions], np.nan)
+
+    return pd.DataFrame(linked, index=df.index)
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+from sweep import sorted_rentals
+
+
+# Search the best safety margin instead of reading bars every 5 minutes.
+#
+# The cost of a threshold T is
+#     weights['unsolved'] * (problematic cases still unsolved)
+#   + weights['affected_minutes'] * (minutes lost by the rentals pushed by T)
+#   + weights['affected_cases'] * (non problematic rentals affected)
+# The unsolved count only drops at the delays of the problematic rentals, the other two never
+# decrease when T grows, so between two such delays the cost can only grow: the minimum is at
+# the lower bound or at one of these delays. Each candidate is a binary search in the sorted
+# arrays of sweep.SortedRentals (O(log n)), no grid and no pass over the rentals.
+
+DEFAULT_WEIGHTS = {'unsolved': 60.0, 'affected_minutes': 1.0, 'affected_cases': 0.0}
+
+
+def candidates(rentals, min_threshold=0, max_threshold=720, resolution=None):
+    """The thresholds where the cost can be minimal, sorted.
+
+    With a resolution (e.g. 5 minutes) the margin must be a multiple of it, a delay then
+    becomes the first multiple above it.
+    """
+
+    delays = rentals.problematic_delay
+    delays = delays[(delays >= min_threshold) & (delays <= max_threshold)]
+    if resolution:
+        delays = np.ceil(delays / resolution) * resolution
+        delays = delays[delays <= max_threshold]
+        min_threshold = np.ceil(min_threshold / resolution) * resolution
+    return np.unique(np.concatenate([[min_threshold], delays]))
+
+
+def evaluate(rentals, thresholds, weights=None):
+    """The cost and the observer figures of each threshold, as a dataframe."""
+
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    counts = rentals.counts(thresholds)
+
+    cost = (weights['unsolved'] * counts['unsolved_cases']
+            + weights['affected_minutes'] * counts['affected_minutes']
+            + weights['affected_cases'] * counts['affected_cases'])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        solved_percent = np.where(rentals.problematic > 0, counts['solved_cases'] / rentals.problematic * 100, 0.0)
+        affected_percent = np.where(rentals.non_problematic > 0,
+                                    counts['affected_cases'] / rentals.non_problematic * 100, 0.0)
+
+    return pd.DataFrame({'threshold': thresholds,
+                         'cost': cost,
+                         **counts,
+                         'solved_percent': solved_percent,
+                         'affected_cases_percent': affected_percent})
+
+
+def optimize(rentals, weights=None, min_threshold=0, max_threshold=720, resolution=None):
+    """The threshold with the lowest cost (the smallest one on a tie), with its figures."""
+
+    table = evaluate(rentals, candidates(rentals, min_threshold, max_threshold, resolution), weights)
+    return table.loc[table['cost'].idxmin()].to_dict()
+
+
+def optimize_segments(ds, by=('checkin_type',), weights=None, min_threshold=0, max_threshold=720, resolution=None):
+    """The best threshold of each segment of the classified rentals `ds`, one row per segment."""
+
+    by = list(by)
+    rows = []
+    for key, segment in ds.groupby(by, observed=True, sort=True):
+        key = key if isinstance(key, tuple) else (key,)
+        best = optimize(sorted_rentals(segment), weights, min_threshold, max_threshold, resolution)
+        rows.append({**dict(zip(by, key)), **best})
+    return pd.DataFrame(rows)
+
+
+def pareto_front(rentals, min_threshold=0, max_threshold=720, resolution=None):
+    """The thresholds that no other beats on both solved % (higher) and affected % (lower).
+
+    A point (threshold, solved_percent, affected_cases_percent, ...) per efficient threshold,
+    sorted by threshold: going right on the front solves more at the price of more affected rentals.
+    """
+
+    table = evaluate(rentals, candidates(rentals, min_threshold, max_threshold, resolution))
+    # by affected % (then solved % descending), a point is efficient if it solves more than all the previous ones
+    table = table.sort_values(['affected_cases_percent', 'solved_percent', 'threshold'],
+                              ascending=[True, False, True], kind='stable')
+    efficient = table['solved_percent'].to_numpy() > np.maximum.accumulate(
+        np.concatenate([[-np.inf], table['solved_percent'].to_numpy()[:-1]]))
+    front = table.loc[efficient].sort_values('threshold').reset_index(drop=True)
+    return front.drop(columns=['cost'])
+
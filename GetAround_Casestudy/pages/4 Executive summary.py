@@ -1,4 +1,9 @@
 import streamlit as st
+import plotly.express as px
+
+from store import load_store
+from pipeline import RunLog, run_all
+from optimizer import DEFAULT_WEIGHTS, optimize, optimize_segments, pareto_front
 
 st.markdown('# Executive Summary')
 
@@ -43,3 +48,46 @@ st.markdown('- to solve above 80% of the delay problems a threshold of 45 miunte
 
 st.markdown('in the end it is the management choice but here the objective of illustrating,\
             the various possibilities and impact has been fulfilled')
+
+
+st.markdown('## The optimal threshold')
+
+# the same data and stages as the main page, they come from the memo when it was opened first
+results = run_all(RunLog(), load_store())
+rentals = results.swept.rentals
+
+st.markdown('Instead of reading the bars every 5 minutes, the threshold can be searched: each threshold \
+            has a cost, the unsolved problematic cases weighted against the minutes lost by the \
+            rentals it pushes, and the optimizer finds the threshold with the lowest cost (see optimizer.py).')
+
+col1, col2, col3 = st.columns(3)
+weight_unsolved = col1.number_input('Cost of an unsolved case (in minutes)', min_value=0.0,
+                                    value=DEFAULT_WEIGHTS['unsolved'], step=10.0)
+max_threshold = col2.number_input('Longest margin (minutes)', min_value=5, max_value=720, value=180, step=5)
+resolution = col3.selectbox('Margin in multiples of (minutes)', [1, 5, 10, 15], index=1)
+
+weights = {'unsolved': weight_unsolved, 'affected_minutes': 1.0}
+best = optimize(rentals, weights, max_threshold=max_threshold, resolution=resolution)
+
+col1, col2, col3 = st.columns(3)
+col1.metric('Optimal threshold', f"{best['threshold']:.0f} min")
+col2.metric('Solved percentage %', f"{best['solved_percent']:.1f}")
+col3.metric('Affected percentage', f"{best['affected_cases_percent']:.1f}")
+
+# a margin per check-in type
+st.markdown('Per check-in type:')
+per_type = optimize_segments(results.classified.ds, ['checkin_type'], weights,
+                             max_threshold=max_threshold, resolution=resolution)
+st.dataframe(per_type[['checkin_type', 'threshold', 'solved_percent', 'affected_cases_percent',
+                       'affected_minutes']].round(1), hide_index=True)
+
+# every efficient choice: no other threshold solves more while affecting less
+st.markdown('## Solved vs. affected: the efficient thresholds')
+front = pareto_front(rentals, max_threshold=max_threshold, resolution=resolution)
+fig = px.line(front, x='affected_cases_percent', y='solved_percent', markers=True, hover_data=['threshold'],
+              labels={'affected_cases_percent': 'Affected percentage', 'solved_percent': 'Solved percentage'})
+fig.add_scatter(x=[best['affected_cases_percent']], y=[best['solved_percent']], mode='markers',
+                marker=dict(size=14, symbol='star'), name='optimal')
+st.plotly_chart(fig)
+st.caption('Each point is a threshold no other threshold beats on both axes, going right solves more \
+            problematic cases at the price of affecting more rentals.')
@@ -0,0 +1,198 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pandas as pd
+
+from binning import Bins
+from cube import build_cube
+from joins import link_previous
+from rules import classify, define_statuses
+from sweep import sorted_rentals, observer_from_sorted, segmented_observer
+
+
+# The analysis of the page as explicit stages:
+#   load -> clean -> link previous -> classify -> sweep -> (render, in Main.py)
+#
+# Each stage is memoized on its inputs: the key of a stage is made of its name, its parameters
+# and the keys of the stages it reads (the first one being the version of the data), so a rerun
+# of the page with the same data only renders, and a new version of the data re-runs everything.
+# The memo is process-wide, shared by the sessions; the outputs are read-only (copy on write).
+
+DELAY = 'delay_at_checkout_in_minutes'
+DELTA = 'time_delta_with_previous_rental_in_minutes'
+
+MEMO_SIZE = int(os.environ.get('PIPELINE_MEMO_SIZE', '32'))
+
+
+class RunLog:
+    """Which stages ran, or came from the memo, in one run of the page, and how long they took."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+
+    def record(self, name, status, seconds):
+        self.stages.append((name, status, seconds))
+
+    def finish(self, name='render'):
+        # whatever was not spent in the stages was spent rendering
+        spent = sum(seconds for _, _, seconds in self.stages)
+        self.record(name, 'ran', time.perf_counter() - self.started - spent)
+
+    def ran(self):
+        return [name for name, status, _ in self.stages if status == 'ran']
+
+    def frame(self):
+        return pd.DataFrame([(name, status, round(seconds * 1000, 1)) for name, status, seconds in self.stages],
+                            columns=['stage', 'status', 'ms'])
+
+
+class Memo:
+    """A small LRU of the stage outputs."""
+
+    def __init__(self, maxsize=MEMO_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+memo = Memo()
+
+
+def stage_key(name, input_keys, params):
+    text = repr((name, tuple(input_keys), sorted(params.items())))
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def run_stage(log, name, fn, *inputs, **params):
+    """fn(*inputs, **params) unless the memo already has it; `inputs` must have a `key`."""
+
+    key = stage_key(name, [i.key for i in inputs], params)
+    output = memo.get(key)
+    if output is not None:
+        log.record(name, 'cached', 0.0)
+        return output
+
+    start = time.perf_counter()
+    output = fn(*inputs, **params)
+    output.key = key
+    memo.put(key, output)
+    log.record(name, 'ran', time.perf_counter() - start)
+    return output
+
+
+#################################################################################################
+##########                              THE STAGES                                      #########
+#################################################################################################
+
+def load(store):
+    df = store.view()
+    return SimpleNamespace(df=df, count_1_total=df.shape[0])
+
+
+def clean(loaded):
+    # the general analysis: the delays greater than 0, binned once for all the histograms
+    mask = loaded.df[DELAY] >= 0
+    df_general = loaded.df.loc[mask, :]
+    return SimpleNamespace(df_general=df_general,
+                           count_2_exclude_negative_delay=df_general.shape[0],
+                           bins=Bins(df_general, [DELAY, DELTA]))
+
+
+def link(loaded):
+    # the delay of the previous rental of each row (see joins.py)
+    df = loaded.df.copy(deep=False)
+    df['delay_of_previous'] = link_previous(df)['delay_of_previous']
+
+    # the referenced ids that were not found, or found with an empty delay
+    mask = (df['previous_ended_rental_id'].notna()) & (df['delay_of_previous'].isna())
+    count_missing_ref_id = df.loc[mask, :].shape[0]
+
+    # it is meaningless to have an empty delta or delay
+    mask = (df[DELTA].notna()) & (df['delay_of_previous'].notna())
+    ds = df.loc[mask, :]
+    count_3_after_na_deltas_delay = ds.shape[0]
+
+    # exclude the outliers: above 1.5 times the median of the (positive) delays
+    df = df.loc[df['delay_of_previous'] > 0, :]
+    outlier_delay = df['delay_of_previous'].median() * 1.5
+    ds = ds.loc[ds['delay_of_previous'] < outlier_delay, :]
+
+    return SimpleNamespace(ds=ds,
+                           count_missing_ref_id=count_missing_ref_id,
+                           count_3_after_na_deltas_delay=count_3_after_na_deltas_delay,
+                           count_4_after_outliers_delay=df.shape[0],
+                           count_5_after_outliers_delta=df.shape[0])
+
+
+def prepare(ds, proposed_threshold=0):
+    """The columns the rules need (was do_preparations), on a view of `ds`."""
+
+    ds = ds.copy(deep=False)
+    # we will add in a column for the proposed margin delay
+    ds['proposed_threshold'] = proposed_threshold
+    ds['threshold-delay'] = ds['proposed_threshold'] - ds['delay_of_previous']
+    # How to classify if problematic or not
+    ds['delta-delay'] = ds[DELTA] - ds['delay_of_previous']
+    # losses: the minutes lost by the non-problematic cases, only the positive values count
+    ds['losses'] = ds['proposed_threshold'] - ds[DELTA]
+    return ds
+
+
+def classify_rentals(linked):
+    ds = prepare(linked.ds, 0)
+    ds['classification'] = classify(ds)
+    ds['status'] = define_statuses(ds)
+
+    counts = ds['classification'].value_counts()
+    return SimpleNamespace(ds=ds,
+                           count_6_problematic_cases=counts['Problematic'],
+                           count_7_non_problematic_cases=counts['Non_Problematic'],
+                           count_8_returned_early_cases=counts['returned early'])
+
+
+def sweep(classified, step=5, max_threshold=120, max_minutes=720):
+    # the observer table (every `step` minutes), the same minute by minute, per check-in type,
+    # and the cube of the lab
+    thresholds = range(0, max_threshold + step, step)
+    rentals = sorted_rentals(classified.ds)
+    return SimpleNamespace(rentals=rentals,
+                           observer=observer_from_sorted(rentals, thresholds),
+                           observer_minutes=observer_from_sorted(rentals, range(0, max_minutes + 1)),
+                           observer_checkin=segmented_observer(classified.ds, ['checkin_type'], thresholds),
+                           cube=build_cube(classified.ds, thresholds))
+
+
+def run_all(log, store):
+    """The whole chain with the parameters of Main.py, for the pages that only read the results.
+
+    Once Main.py ran with the same data, every stage comes from the memo.
+    """
+
+    loaded = run_stage(log, 'load', load, store)
+    linked = run_stage(log, 'link', link, loaded)
+    classified = run_stage(log, 'classify', classify_rentals, linked)
+    swept = run_stage(log, 'sweep', sweep, classified, step=5, max_threshold=120, max_minutes=720)
+    return SimpleNamespace(loaded=loaded, linked=linked, classified=classified, swept=swept)
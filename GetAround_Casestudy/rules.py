@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+
+# classifications
+    # case (A) If There is no delay => "previous delay" is negative => delivered early
+    # case (B) There is delay
+        # if delta > delay are considered non-problemetic
+        # if delta < delay are considered problematic cases
+    # the non problematic cases will lose money when the threshold is greater than delta otherwise no losses will occur
+    # the problmeatic cases will become solved when the threshold exceeds the delay
+
+CLASSIFICATIONS = ['Problematic', 'Non_Problematic', 'returned early']
+STATUSES = ['Solved', 'UnSolved', 'Affected', 'Not affected', '']
+
+
+#################################################################################################
+##########      row by row version (the reference, kept for the benchmark / checks)     #########
+#################################################################################################
+
+def classifier(row):
+    # check if the car was returned early case (A)
+
+    if row['delay_of_previous'] < 0:
+        return 'returned early'
+
+    # check if although late, compare with delta (B)
+    else:
+        if row['delta-delay'] >= 0:   # the delay was less than delta
+            return 'Non_Problematic'  # consequently non problematic
+        else:
+            return 'Problematic'  # this means delay bigger than delta => problem
+
+
+# finally the status column, whether solved or not
+def define_status(row):
+    if row['classification'] == 'Problematic':
+        if row['threshold-delay'] >= 0 :
+            return 'Solved'
+        else:
+            return 'UnSolved'
+    elif row['classification'] == 'returned early':
+            return ''
+    else:
+        if row['losses'] <= 0 :  # this means that the delta is greateer than the threshold
+            return 'Not affected'
+        else:
+            return 'Affected'   # because the threshold pushed the booking
+
+
+#################################################################################################
+##########      vectorized version, the same rules on whole columns at once             #########
+#################################################################################################
+
+def _column(ds, name):
+    return ds[name].to_numpy(dtype=np.float64)
+
+
+def classify(ds):
+    """The `classifier` rules over the columns delay_of_previous and delta-delay.
+
+    Returns a categorical series (categories CLASSIFICATIONS) aligned with `ds`.
+    """
+
+    delay = _column(ds, 'delay_of_previous')
+    delta_delay = _column(ds, 'delta-delay')
+
+    # same order as the if/else above, the NaNs fall in the last case like they did
+    codes = np.select([delay < 0, delta_delay >= 0], [2, 1], default=0)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=CLASSIFICATIONS), index=ds.index)
+
+
+def define_statuses(ds):
+    """The `define_status` rules over classification, threshold-delay and losses.
+
+    Returns a categorical series (categories STATUSES) aligned with `ds`.
+    """
+
+    classification = ds['classification']
+    problematic = (classification == 'Problematic').to_numpy()
+    returned_early = (classification == 'returned early').to_numpy()
+    threshold_delay = _column(ds, 'threshold-delay')
+    losses = _column(ds, 'losses')
+
+    codes = np.select([problematic & (threshold_delay >= 0),   # Solved
+                       problematic,                            # UnSolved
+                       returned_early,                         # ''
+                       losses <= 0],                           # Not affected
+                      [0, 1, 4, 3],
+                      default=2)                               # Affected
+    return pd.Series(pd.Categorical.from_codes(codes, categories=STATUSES), index=ds.index)
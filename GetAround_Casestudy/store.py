@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from ingest import load_delay_data
+
+
+# One copy of the delay analysis data for the whole process, shared by every viewer.
+#
+# Each streamlit session used to keep its own copy of the raw dataframe (session_state), now the
+# sessions only get views of this store. pandas copy-on-write is enabled, so a view shares the
+# columns of the store and a session modifying (or adding) a column only copies that column,
+# the shared data itself is never touched.
+
+pd.set_option('mode.copy_on_write', True)
+
+
+def _downcast(series):
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+    if pd.api.types.is_float_dtype(series):
+        # only when it is exact, e.g. minutes and ids fit in a float32
+        values = series.to_numpy()
+        smaller = values.astype(np.float32)
+        if np.array_equal(smaller.astype(values.dtype), values, equal_nan=True):
+            return pd.Series(smaller, index=series.index, name=series.name)
+        return series
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        return series.astype('category')
+    return series
+
+
+def compact(df):
+    """The same data with the smallest exact numeric dtypes and categorical strings."""
+
+    return pd.DataFrame({column: _downcast(df[column]) for column in df.columns}, index=df.index)
+
+
+def memory_mb(df):
+    return df.memory_usage(index=True, deep=True).sum() / 2**20
+
+
+class DatasetStore:
+    """The compact, read-only dataset of the process, and the views handed to the sessions."""
+
+    def __init__(self, df, version):
+        self.version = version
+        self._df = compact(df)
+
+    @property
+    def key(self):
+        # what the pipeline stages are memoized on
+        return self.version
+
+    def view(self, columns=None):
+        """A shallow view of the data for one session, nothing is copied."""
+
+        df = self._df if columns is None else self._df[list(columns)]
+        return df.copy(deep=False)
+
+    def memory_mb(self):
+        return memory_mb(self._df)
+
+    def __len__(self):
+        return len(self._df)
+
+
+@st.cache_resource      # like for the database connections and the ML models of the second project,
+                        # st.cache_resource keeps ONE object for the whole process, shared by every viewer
+                        # and every page (st.cache_data would hand a new copy of the dataframe to each run)
+def load_store():
+   
+   data_load_state = st.text('Loading data...')
+   # the workbook is converted once into a local snapshot (see ingest.py), the next
+   # loads only memory-map it. DELAY_DATA_PATH can point at a local workbook or snapshot
+   df, version = load_delay_data()
+   data_load_state.text(f'Data loaded successfully.. (version {version})')
+
+   # compact dtypes (small ints, float32 when exact, categories), read-only
+   return DatasetStore(df, version)
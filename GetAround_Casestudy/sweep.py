@@ -0,0 +1,260 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+# The OBSERVER table: the results of every proposed threshold (safety margin)
+#
+# The classification of a rental does not depend on the threshold, only the status does:
+#   - a problematic rental is solved when  threshold - delay >= 0   <=>  delay <= threshold
+#   - a non problematic one is affected when threshold - delta > 0   <=>  delta < threshold
+#   - the affected minutes are the sum of (threshold - delta) over the rentals where it is positive
+# so once the delays and the deltas are sorted, every threshold is answered with a binary
+# search (searchsorted) and a prefix sum, no need to re-classify the whole dataset each time.
+
+OBSERVER_COLUMNS = ['proposed_safety_margin',
+                    'problematic_cases',
+                    'non_problematic_cases',
+                    'solved_cases',
+                    'unsolved_cases',
+                    'affected_cases',
+                    'not_affected_cases',
+                    'affected_minutes',
+                    'problematic_cases_percent',
+                    'non_problematic_cases_percent',
+                    'solved_percent',
+                    'un_solved_percent',
+                    'affected_cases_percent',
+                    'not_affected_cases_percent',
+                    'checkin_type',
+                    'total cases',
+                    'verification']
+
+# the grid of the page: every 5 minutes up to 120 minutes
+DEFAULT_THRESHOLDS = np.arange(0, 125, 5)
+
+
+def _percent(part, whole):
+    # like int(part / whole * 100), and 0 when there is nothing to divide by
+    whole = np.asarray(whole, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.trunc(np.asarray(part, dtype=np.float64) / whole * 100)
+    return np.where(whole > 0, ratio, 0).astype(np.int64)
+
+
+class SortedRentals:
+    """The sorted arrays needed to answer any threshold, built once (O(n log n))."""
+
+    def __init__(self, delay, delta, classification):
+        delay = np.asarray(delay, dtype=np.float64)
+        delta = np.asarray(delta, dtype=np.float64)
+        classification = np.asarray(classification, dtype=object)
+
+        problematic = classification == 'Problematic'
+        non_problematic = classification == 'Non_Problematic'
+
+        self.total = len(delay)
+        self.problematic = int(problematic.sum())
+        self.non_problematic = int(non_problematic.sum())
+
+        # a NaN never satisfies the comparisons: never solved, always affected
+        problematic_delay = delay[problematic]
+        self.problematic_delay = np.sort(problematic_delay[~np.isnan(problematic_delay)])
+
+        non_problematic_delta = delta[non_problematic]
+        self.non_problematic_delta = np.sort(non_problematic_delta[~np.isnan(non_problematic_delta)])
+        self.non_problematic_nan = int(np.isnan(non_problematic_delta).sum())
+
+        # the affected minutes were summed over all the rentals (the losses column of ds)
+        self.all_delta = np.sort(delta[~np.isnan(delta)])
+        self.all_delta_prefix = np.concatenate([[0.0], np.cumsum(self.all_delta)])
+
+    def counts(self, thresholds):
+        """Solved / affected counts and affected minutes for each threshold, O(k log n)."""
+
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+
+        solved = np.searchsorted(self.problematic_delay, thresholds, side='right')
+        affected = np.searchsorted(self.non_problematic_delta, thresholds, side='left') + self.non_problematic_nan
+
+        below = np.searchsorted(self.all_delta, thresholds, side='left')
+        affected_minutes = thresholds * below - self.all_delta_prefix[below]
+
+        return {'solved_cases': solved.astype(np.int64),
+                'unsolved_cases': (self.problematic - solved).astype(np.int64),
+                'affected_cases': affected.astype(np.int64),
+                'not_affected_cases': (self.non_problematic - affected).astype(np.int64),
+                'affected_minutes': affected_minutes}
+
+
+def sorted_rentals(ds):
+    return SortedRentals(ds['delay_of_previous'],
+                         ds['time_delta_with_previous_rental_in_minutes'],
+                         ds['classification'].astype(object))
+
+
+def observer_table(ds, thresholds=DEFAULT_THRESHOLDS, checkin_type=0):
+    """The observer table (one row per threshold) of the classified rentals `ds`.
+
+    Same columns and values as the former loop of create_observer_results,
+    for any grid of thresholds, e.g. every minute: np.arange(0, 721).
+    """
+
+    return observer_from_sorted(sorted_rentals(ds), thresholds, checkin_type)
+
+
+def observer_from_sorted(rentals, thresholds=DEFAULT_THRESHOLDS, checkin_type=0):
+    thresholds = np.asarray(thresholds)
+    k = len(thresholds)
+    counts = rentals.counts(thresholds)
+
+    def repeat(value):
+        return np.full(k, value, dtype=np.int64)
+
+    table = pd.DataFrame({
+        'proposed_safety_margin': thresholds,
+        'problematic_cases': repeat(rentals.problematic),
+        'non_problematic_cases': repeat(rentals.non_problematic),
+        **counts,
+        'problematic_cases_percent': repeat(_percent(rentals.problematic, rentals.total)),
+        'non_problematic_cases_percent': repeat(_percent(rentals.non_problematic, rentals.total)),
+        'solved_percent': _percent(counts['solved_cases'], rentals.problematic),
+        'un_solved_percent': _percent(counts['unsolved_cases'], rentals.problematic),
+        'affected_cases_percent': _percent(counts['affected_cases'], rentals.non_problematic),
+        'not_affected_cases_percent': _percent(counts['not_affected_cases'], rentals.non_problematic),
+        'checkin_type': checkin_type,
+        'total cases': repeat(rentals.total),
+        'verification': 0,
+    }, columns=OBSERVER_COLUMNS)
+
+    table.index = np.arange(1, k + 1)   # the former table was filled from the row 1
+    return table
+
+
+#################################################################################################
+##########      the same sweep per segment (checkin_type, car_id, ...) in one pass      #########
+#################################################################################################
+
+# For a segmented sweep, each rental is placed once on the (sorted) grid of thresholds:
+#   - a problematic rental is solved from the first threshold >= its delay on
+#   - a non problematic one is affected from the first threshold > its delta on
+# so counting the rentals of each segment x first threshold (bincount) and cumulating along
+# the thresholds (cumsum) gives the counts of every segment and every threshold at once.
+
+# The pass runs in-process by default (SWEEP_WORKERS=1): it is a few searchsorted / bincount
+# over flat arrays, the rentals and the (segments x thresholds) counts sent to and back from a
+# process pool, and the start of the pool, cost more than the pass itself (bench_segments.py:
+# 0.08s -> 0.14s at 100k rentals, 0.76s -> 1.08s at 1M with 2 workers). Only worth trying on
+# much bigger inputs, by setting SWEEP_WORKERS.
+SEGMENT_WORKERS = int(os.environ.get('SWEEP_WORKERS', '1'))
+
+# the columns of the tidy table, after the segment columns
+SEGMENT_COLUMNS = [column for column in OBSERVER_COLUMNS if column not in ('checkin_type', 'verification')]
+
+
+def _cumulated(cells, n_groups, k, weights=None):
+    # cells = group * (k + 1) + first threshold index, the last slot (k) is "never"
+    counts = np.bincount(cells, weights=weights, minlength=n_groups * (k + 1)).reshape(n_groups, k + 1)
+    return np.cumsum(counts[:, :k], axis=1)
+
+
+def segment_counts(delay, delta, problematic, non_problematic, groups, n_groups, thresholds):
+    """Counts of every segment (group code 0..n_groups-1) x threshold, as (n_groups, k) arrays."""
+
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    k = len(thresholds)
+
+    # NaN delays are never solved (searchsorted puts them last), NaN deltas are always affected
+    first_solved = np.searchsorted(thresholds, delay, side='left')
+    first_affected = np.where(np.isnan(delta), 0, np.searchsorted(thresholds, delta, side='right'))
+    first_loss = np.searchsorted(thresholds, delta, side='right')     # the losses (threshold - delta) > 0
+
+    solved = _cumulated((groups * (k + 1) + first_solved)[problematic], n_groups, k)
+    affected = _cumulated((groups * (k + 1) + first_affected)[non_problematic], n_groups, k)
+
+    # the affected minutes: threshold * (number of deltas below) - (sum of those deltas), over all the rentals
+    cells = groups * (k + 1) + first_loss
+    below = _cumulated(cells, n_groups, k)
+    below_sum = _cumulated(cells, n_groups, k, weights=np.nan_to_num(delta))
+
+    return {'problematic_cases': np.bincount(groups[problematic], minlength=n_groups),
+            'non_problematic_cases': np.bincount(groups[non_problematic], minlength=n_groups),
+            'total cases': np.bincount(groups, minlength=n_groups),
+            'solved_cases': solved.astype(np.int64),
+            'affected_cases': affected.astype(np.int64),
+            'affected_minutes': thresholds * below - below_sum}
+
+
+def _partition_counts(args):
+    return segment_counts(*args)
+
+
+def segmented_observer(ds, by=('checkin_type',), thresholds=DEFAULT_THRESHOLDS, workers=SEGMENT_WORKERS):
+    """The observer table of each segment of `ds` (e.g. by checkin_type, or checkin_type and car_id).
+
+    A tidy long table: the `by` columns, then one row per threshold with the observer columns.
+    With workers > 1 the segments are split in contiguous blocks scored in a process pool.
+    """
+
+    by = list(by)
+    thresholds = np.sort(np.asarray(thresholds))
+    k = len(thresholds)
+
+    grouped = ds.groupby(by, observed=True, sort=True)
+    groups = grouped.ngroup().to_numpy()
+    keys = grouped.size().index
+    n_groups = len(keys)
+
+    # the rentals with an empty segment key (group -1) belong to no segment
+    keep = groups >= 0
+    groups = groups[keep]
+    delay = ds['delay_of_previous'].to_numpy(dtype=np.float64)[keep]
+    delta = ds['time_delta_with_previous_rental_in_minutes'].to_numpy(dtype=np.float64)[keep]
+    classification = ds['classification'].astype(object).to_numpy()[keep]
+    problematic = classification == 'Problematic'
+    non_problematic = classification == 'Non_Problematic'
+
+    if workers and workers > 1 and n_groups > workers:
+        # contiguous blocks of segments, each worker gets only the rentals of its block
+        bounds = np.linspace(0, n_groups, workers + 1).astype(np.int64)
+        tasks = []
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            rows = (groups >= lo) & (groups < hi)
+            tasks.append((delay[rows], delta[rows], problematic[rows], non_problematic[rows],
+                          groups[rows] - lo, int(hi - lo), thresholds))
+        with ProcessPoolExecutor(workers) as pool:
+            parts = list(pool.map(_partition_counts, tasks))
+        counts = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    else:
+        counts = segment_counts(delay, delta, problematic, non_problematic, groups, n_groups, thresholds)
+
+    def per_segment(name):
+        return np.repeat(counts[name], k)
+
+    solved = counts['solved_cases'].ravel()
+    affected = counts['affected_cases'].ravel()
+    problematic_cases = per_segment('problematic_cases')
+    non_problematic_cases = per_segment('non_problematic_cases')
+    total = per_segment('total cases')
+
+    segments = keys.to_frame(index=False).loc[np.repeat(np.arange(n_groups), k)].reset_index(drop=True)
+    table = pd.DataFrame({
+        'proposed_safety_margin': np.tile(thresholds, n_groups),
+        'problematic_cases': problematic_cases,
+        'non_problematic_cases': non_problematic_cases,
+        'solved_cases': solved,
+        'unsolved_cases': problematic_cases - solved,
+        'affected_cases': affected,
+        'not_affected_cases': non_problematic_cases - affected,
+        'affected_minutes': counts['affected_minutes'].ravel(),
+        'problematic_cases_percent': _percent(problematic_cases, total),
+        'non_problematic_cases_percent': _percent(non_problematic_cases, total),
+        'solved_percent': _percent(solved, problematic_cases),
+        'un_solved_percent': _percent(problematic_cases - solved, problematic_cases),
+        'affected_cases_percent': _percent(affected, non_problematic_cases),
+        'not_affected_cases_percent': _percent(non_problematic_cases - affected, non_problematic_cases),
+        'total cases': total,
+    }, columns=SEGMENT_COLUMNS)
+    return pd.concat([segments, table], axis=1)
@@ -0,0 +1,152 @@
+"""Synthetic delay analysis data, shaped like the workbook, from 10k to 100M rows.
+
+The rentals are made chunk by chunk (each chunk is its own slice of the fleet) so that the
+big sizes never need more than one chunk in memory when written to a file:
+  - the rental ids follow the chronological order, the cars are rented more or less often
+  - the previous rental of a rental is the one before it of the same car, when it ended and
+    the car was rented again within 12 hours: these references make chains, like in the data
+  - a few references point at rentals that are not in the data (they were not exported)
+  - the delays: early returns (more often with connect), late ones with a long tail, a few
+    extreme outliers, and no delay for the canceled rentals
+
+The same seed (and chunk size) always gives the same rows.
+
+    python synthetic.py --rows 1000000 --out data/synthetic-1m.feather
+    DELAY_DATA_PATH=data/synthetic-1m.feather streamlit run Main.py
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from ingest import DTYPES
+
+
+COLUMNS = list(DTYPES)
+CHUNK_SIZE = 5_000_000
+FIRST_RENTAL_ID = 500_000
+
+CHECKIN_TYPES = ['mobile', 'connect']
+STATES = ['ended', 'canceled']
+
+# roughly the proportions of the workbook (21k rentals, 8k cars)
+RENTALS_PER_CAR = 2.6
+CAR_SKEW = 2.0              # car = n_cars * u**CAR_SKEW: a few cars get many rentals
+CONNECT_RATE = 0.2
+CANCELED_RATE = 0.15
+MISSING_DELAY_RATE = 0.03   # ended rentals without a checkout delay
+EARLY_RATE = {'mobile': 0.40, 'connect': 0.55}
+OUTLIER_RATE = 0.002
+LINK_RATE = 0.17            # of the rentals following an ended one of the same car, ~9% of the rows
+DANGLING_RATE = 0.01        # of the references, to a rental missing from the data
+
+# the time deltas are multiples of 30 minutes up to 12 hours, the short ones more frequent
+DELTAS = np.arange(0, 750, 30, dtype=np.float64)
+DELTA_WEIGHTS = 0.9 ** np.arange(len(DELTAS))
+DELTA_WEIGHTS /= DELTA_WEIGHTS.sum()
+
+
+def _cars(n):
+    return max(1, int(round(n / RENTALS_PER_CAR)))
+
+
+def make_chunk(n, rng, first_id=FIRST_RENTAL_ID, first_car=0):
+    """`n` rentals with the ids first_id.. and the cars first_car.. first_car + _cars(n) - 1."""
+
+    n_cars = _cars(n)
+    rental_id = first_id + np.arange(n, dtype=np.int64)
+    car_id = first_car + np.minimum((n_cars * rng.random(n) ** CAR_SKEW).astype(np.int64), n_cars - 1)
+    connect = rng.random(n) < CONNECT_RATE
+    canceled = rng.random(n) < CANCELED_RATE
+
+    # the checkout delays
+    early = rng.random(n) < np.where(connect, EARLY_RATE['connect'], EARLY_RATE['mobile'])
+    delay = np.where(early, -rng.exponential(45.0, n), rng.lognormal(np.log(35.0), 1.3, n))
+    outliers = rng.random(n) < OUTLIER_RATE
+    delay[outliers] = rng.uniform(-20_000, 70_000, outliers.sum())
+    delay = np.round(delay)
+    delay[canceled | (rng.random(n) < MISSING_DELAY_RATE)] = np.nan
+
+    # the previous rental of the same car (the rows are in chronological order)
+    order = np.argsort(car_id, kind='stable')
+    same_car = car_id[order[1:]] == car_id[order[:-1]]
+    previous = np.full(n, -1, dtype=np.int64)
+    previous[order[1:][same_car]] = order[:-1][same_car]
+
+    has_previous = previous >= 0
+    linked = has_previous & ~canceled[np.maximum(previous, 0)] & (rng.random(n) < LINK_RATE)
+    previous_id = np.where(linked, rental_id[np.maximum(previous, 0)], np.nan).astype(np.float64)
+    dangling = linked & (rng.random(n) < DANGLING_RATE)
+    # below the first rental id: no chunk ever holds them, and they stay positive
+    previous_id[dangling] = rng.integers(0, FIRST_RENTAL_ID, dangling.sum())
+    delta = np.where(linked, rng.choice(DELTAS, n, p=DELTA_WEIGHTS), np.nan)
+
+    return pd.DataFrame({'rental_id': rental_id,
+                         'car_id': car_id,
+                         'checkin_type': pd.Categorical.from_codes(connect.astype(np.int8), CHECKIN_TYPES),
+                         'state': pd.Categorical.from_codes(canceled.astype(np.int8), STATES),
+                         'delay_at_checkout_in_minutes': delay,
+                         'previous_ended_rental_id': previous_id,
+                         'time_delta_with_previous_rental_in_minutes': delta})
+
+
+def iter_chunks(n, seed=0, chunk_size=CHUNK_SIZE):
+    """The `n` rentals as dataframes of at most `chunk_size` rows."""
+
+    sizes = [min(chunk_size, n - start) for start in range(0, n, chunk_size)]
+    first_id, first_car = FIRST_RENTAL_ID, 0
+    for size, child in zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))):
+        yield make_chunk(size, np.random.default_rng(child), first_id, first_car)
+        first_id += size
+        first_car += _cars(size)
+
+
+def generate(n, seed=0, chunk_size=CHUNK_SIZE):
+    """The `n` rentals in one dataframe."""
+
+    chunks = list(iter_chunks(n, seed, chunk_size))
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def write(n, path, seed=0, chunk_size=CHUNK_SIZE):
+    """Write the `n` rentals to a Feather or Parquet file (see ingest.py), one chunk at a time."""
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in iter_chunks(n, seed, chunk_size):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                if path.lower().endswith(('.parquet', '.pq')):
+                    writer = pq.ParquetWriter(path, table.schema)
+                else:
+                    # uncompressed, so that it can be memory-mapped like the snapshots
+                    writer = pa.ipc.new_file(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--out', required=True, help='a .feather or .parquet file')
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    start = time.perf_counter()
+    write(args.rows, args.out, args.seed, args.chunk_size)
+    print(f"{args.rows:,} rentals written to {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()